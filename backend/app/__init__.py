@@ -25,12 +25,22 @@ def create_app(config_class=Config, test_config=None):
         app.config.from_object(config_class)
     else:
         app.config.from_mapping(test_config)
-    CORS(app) # Initialize CORS
+    CORS(app, expose_headers=['Link', 'X-Next-Cursor', 'X-RateLimit-Limit', 'X-RateLimit-Remaining', 'X-RateLimit-Reset', 'Retry-After']) # Initialize CORS
 
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
 
+    from . import database, cache, token_cache, circuit, ratelimit, passwords, metrics, profiler
+    database.init_app(app)
+    cache.init_app(app)
+    token_cache.init_app(app)
+    circuit.init_app(app)
+    ratelimit.init_app(app)
+    passwords.init_app(app)
+    metrics.init_app(app)
+    profiler.init_app(app)
+
     with app.app_context():
         from . import routes, models
         app.register_blueprint(routes.bp)
@@ -0,0 +1,105 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from flask import current_app
+
+
+class MemoryStore:
+    """Thread-safe in-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {} # key -> [lock, holders and waiters], dropped when unused
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    @contextmanager
+    def lock(self, key, timeout=10):
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        key_lock = entry[0]
+        acquired = key_lock.acquire(timeout=timeout)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                key_lock.release()
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[key]
+
+
+class RedisStore:
+    """Shared store for multi-worker deployments. Values are stored as JSON."""
+
+    def __init__(self, url, prefix='mpesaprompt:'):
+        import redis  # Only needed when REDIS_URL is configured
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None):
+        ttl_ms = int(ttl * 1000) if ttl else None
+        self.client.set(self.prefix + key, json.dumps(value), px=ttl_ms)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    @contextmanager
+    def lock(self, key, timeout=10):
+        lock = self.client.lock(self.prefix + 'lock:' + key, timeout=timeout, blocking_timeout=timeout)
+        acquired = lock.acquire()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    lock.release()
+                except Exception:
+                    # The lock already expired; another worker may hold it now
+                    pass
+
+
+def init_app(app):
+    redis_url = app.config.get('REDIS_URL')
+    if redis_url:
+        app.extensions['cache_store'] = RedisStore(redis_url)
+    else:
+        app.extensions['cache_store'] = MemoryStore(app.config.get('CACHE_MAX_ENTRIES', 1024))
+
+
+def get_store():
+    return current_app.extensions['cache_store']
@@ -0,0 +1,198 @@
+import datetime
+import json
+import time
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from flask import current_app
+
+from . import db
+from .metrics import CALLBACK_INBOX_DELAY, observe_callback_lag
+from .models import CallbackInbox, Customer, ProcessedCallback, Transaction
+from .rollups import record_status_changes
+from .webhooks import enqueue_transaction_events
+
+
+def dialect_insert(model):
+    # INSERT ... ON CONFLICT is dialect-specific in SQLAlchemy
+    if db.engine.dialect.name == 'postgresql':
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+def upsert_customers(totals, now):
+    """Creates customers or adds to their totals in one statement.
+
+    `totals` maps (business_id, phone_number) to (amount, count). Returns a map
+    from the same keys to customer ids.
+    """
+    rows = [
+        {
+            'business_id': business_id,
+            'phone_number': phone_number,
+            'total_amount_requested': amount,
+            'transaction_count': count,
+            'first_transaction_date': now,
+            'last_transaction_date': now,
+        }
+        for (business_id, phone_number), (amount, count) in totals.items()
+    ]
+    stmt = dialect_insert(Customer).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['business_id', 'phone_number'],
+        set_={
+            'total_amount_requested': db.func.coalesce(Customer.total_amount_requested, 0) + stmt.excluded.total_amount_requested,
+            'transaction_count': db.func.coalesce(Customer.transaction_count, 0) + stmt.excluded.transaction_count,
+            'last_transaction_date': stmt.excluded.last_transaction_date,
+        }
+    ).returning(Customer.id, Customer.business_id, Customer.phone_number)
+    return {(row.business_id, row.phone_number): row.id for row in db.session.execute(stmt)}
+
+def apply_stk_results(results):
+    """Applies (checkout_request_id, result_code) pairs in the current session, without committing.
+
+    Each CheckoutRequestID is applied at most once, however many times it is
+    delivered: the ledger insert decides which delivery wins, transactions only
+    move out of 'pending', and customer totals are incremented inside the
+    database. Daily rollups and webhook outbox events are written with the
+    transactions. Returns the transactions that were finalized.
+    """
+    result_codes = {}
+    for checkout_request_id, result_code in results:
+        if checkout_request_id and checkout_request_id not in result_codes:
+            result_codes[checkout_request_id] = result_code
+    if not result_codes:
+        return []
+
+    now = datetime.datetime.utcnow()
+
+    ledger = dialect_insert(ProcessedCallback).values([
+        {'checkout_request_id': checkout_request_id, 'result_code': result_code, 'processed_at': now}
+        for checkout_request_id, result_code in result_codes.items()
+    ]).on_conflict_do_nothing(index_elements=['checkout_request_id']).returning(ProcessedCallback.checkout_request_id)
+    claimed = set(db.session.execute(ledger).scalars())
+    if not claimed:
+        return []
+
+    # One IN (...) lookup for the whole batch
+    query = Transaction.query.filter(Transaction.checkout_request_id.in_(claimed), Transaction.status == 'pending')
+    if db.engine.dialect.name == 'postgresql':
+        query = query.with_for_update()
+    transactions = query.all()
+
+    unknown = claimed - {transaction.checkout_request_id for transaction in transactions}
+    if unknown:
+        # Unknown or already final. Drop the ledger rows so a redelivery after the
+        # transaction is committed can still be applied.
+        db.session.execute(db.delete(ProcessedCallback).where(ProcessedCallback.checkout_request_id.in_(unknown)))
+
+    totals = {}
+    for transaction in transactions:
+        if result_codes[transaction.checkout_request_id] == 0:
+            transaction.status = 'success'
+            key = (transaction.business_id, transaction.phone_number)
+            amount, count = totals.get(key, (0, 0))
+            totals[key] = (amount + transaction.amount, count + 1)
+        else:
+            transaction.status = 'failed'
+
+    record_status_changes(
+        (transaction.business_id, transaction.timestamp, 'pending', transaction.status, transaction.amount)
+        for transaction in transactions
+    )
+
+    if totals:
+        customer_ids = upsert_customers(totals, now)
+        for transaction in transactions:
+            if transaction.status == 'success':
+                transaction.customer_id = customer_ids[(transaction.business_id, transaction.phone_number)]
+
+    db.session.flush()
+    enqueue_transaction_events(transactions)
+    observe_callback_lag(transactions, now)
+    return transactions
+
+def process_stk_callback(stk_callback):
+    """Applies one stkCallback payload and commits. Returns the number of transactions finalized."""
+    finalized = apply_stk_results([(stk_callback.get('CheckoutRequestID'), stk_callback.get('ResultCode'))])
+    db.session.commit()
+    return len(finalized)
+
+def store_callback(raw_payload):
+    """Appends a raw callback body to the inbox. This is all the /callback request does in inbox mode."""
+    db.session.execute(db.insert(CallbackInbox).values(payload=raw_payload, received_at=datetime.datetime.utcnow()))
+    db.session.commit()
+
+def parse_stk_callback(raw_payload):
+    try:
+        data = json.loads(raw_payload)
+        stk_callback = data['Body']['stkCallback']
+        return stk_callback.get('CheckoutRequestID'), stk_callback.get('ResultCode')
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+def committed_checkout_ids(checkout_request_ids):
+    if not checkout_request_ids:
+        return set()
+    return set(db.session.execute(
+        db.select(Transaction.checkout_request_id).where(Transaction.checkout_request_id.in_(checkout_request_ids))
+    ).scalars())
+
+def process_callback_inbox(batch_size=500):
+    """Drains one micro-batch of the inbox in a single commit. Returns the number of entries handled.
+
+    A callback whose CheckoutRequestID has no transaction yet may have overtaken
+    the commit that stores it. Such entries stay unprocessed and are retried
+    until they are CALLBACK_UNMATCHED_MAX_AGE seconds old.
+    """
+    now = datetime.datetime.utcnow()
+    query = CallbackInbox.query.filter(
+        CallbackInbox.processed_at == None,
+        db.or_(CallbackInbox.retry_at == None, CallbackInbox.retry_at <= now)
+    ).order_by(CallbackInbox.id).limit(batch_size)
+    if db.engine.dialect.name == 'postgresql':
+        # Lets several processors drain the inbox side by side
+        query = query.with_for_update(skip_locked=True)
+    entries = query.all()
+    if not entries:
+        db.session.rollback()
+        return 0
+
+    parsed = {}
+    for entry in entries:
+        parsed[entry.id] = parse_stk_callback(entry.payload)
+        if parsed[entry.id] is None:
+            print(f"Callback Inbox: ignoring malformed payload {entry.id}")
+
+    known = committed_checkout_ids({result[0] for result in parsed.values() if result and result[0]})
+    retry_interval = datetime.timedelta(seconds=current_app.config.get('CALLBACK_UNMATCHED_RETRY_INTERVAL', 2))
+    max_age = datetime.timedelta(seconds=current_app.config.get('CALLBACK_UNMATCHED_MAX_AGE', 600))
+    results = []
+    for entry in entries:
+        result = parsed[entry.id]
+        if result and result[0] and result[0] not in known:
+            if entry.received_at and now - entry.received_at < max_age:
+                entry.retry_at = now + retry_interval
+                continue
+            print(f"Callback Inbox: no transaction for {result[0]}, leaving it to the reconciler")
+        elif result:
+            results.append(result)
+        entry.processed_at = now
+        if entry.received_at:
+            CALLBACK_INBOX_DELAY.observe(max((now - entry.received_at).total_seconds(), 0))
+
+    apply_stk_results(results)
+    db.session.commit()
+    return len(entries)
+
+def run_callback_processor(batch_size, poll_interval, once=False):
+    while True:
+        try:
+            processed = process_callback_inbox(batch_size)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Callback Processor Error: {e}")
+            processed = 0
+        if once:
+            return processed
+        if processed < batch_size:
+            time.sleep(poll_interval)
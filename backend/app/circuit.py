@@ -0,0 +1,164 @@
+import threading
+import time
+from collections import deque
+
+from flask import current_app
+
+from .metrics import DARAJA_CIRCUIT_STATE, tenant_label
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, breaker):
+        self.breaker = breaker
+        self.retry_after = breaker.retry_after()
+        super().__init__(f"Circuit for {breaker.name} is open, retry in {self.retry_after:.0f}s")
+
+
+class CircuitBreaker:
+    """Tracks the outcomes of calls to one Daraja endpoint for one shortcode.
+
+    Closed: calls go through and their outcomes are kept for `window` seconds.
+    Once at least `min_calls` are in the window and too many failed or were
+    slow, the breaker opens and calls fail fast for `open_seconds`. It then
+    lets `half_open_probes` calls through: a success closes it again, a
+    failure reopens it.
+    """
+
+    def __init__(self, name, window=60, min_calls=10, failure_rate=0.5, slow_call_seconds=10,
+                 slow_call_rate=0.8, open_seconds=30, half_open_probes=1, on_change=None):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.on_change = on_change
+        self.state = CLOSED
+        self.opened_at = None
+        self.probes = 0
+        self.calls = deque() # (finished_at, failed, slow)
+        self.lock = threading.Lock()
+
+    def _set_state(self, state, now):
+        self.state = state
+        self.probes = 0
+        if state == OPEN:
+            self.opened_at = now
+        elif state == CLOSED:
+            self.opened_at = None
+            self.calls.clear()
+        if self.on_change:
+            self.on_change(self)
+
+    def _trim(self, now):
+        while self.calls and self.calls[0][0] < now - self.window:
+            self.calls.popleft()
+
+    def retry_after(self):
+        if self.opened_at is None:
+            return 0
+        return max(self.opened_at + self.open_seconds - time.monotonic(), 0)
+
+    def acquire(self):
+        """Raises CircuitOpenError unless a call may go through now."""
+        with self.lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                if now - self.opened_at < self.open_seconds:
+                    raise CircuitOpenError(self)
+                self._set_state(HALF_OPEN, now)
+            if self.state == HALF_OPEN:
+                if self.probes >= self.half_open_probes:
+                    raise CircuitOpenError(self)
+                self.probes += 1
+
+    def release(self):
+        """Gives back a slot taken by acquire() for a call whose outcome is unknown, e.g. one that raised locally."""
+        with self.lock:
+            if self.state == HALF_OPEN and self.probes > 0:
+                self.probes -= 1
+
+    def record(self, duration, failed):
+        with self.lock:
+            now = time.monotonic()
+            slow = duration >= self.slow_call_seconds
+            if self.state == HALF_OPEN:
+                self._set_state(OPEN if failed or slow else CLOSED, now)
+                return
+            if self.state == OPEN:
+                return
+
+            self.calls.append((now, failed, slow))
+            self._trim(now)
+            total = len(self.calls)
+            if total < self.min_calls:
+                return
+            failures = sum(1 for call in self.calls if call[1])
+            slow_calls = sum(1 for call in self.calls if call[2])
+            if failures / total >= self.failure_rate or slow_calls / total >= self.slow_call_rate:
+                print(f"Circuit Breaker: opening {self.name} ({failures} failed, {slow_calls} slow of {total} calls)")
+                self._set_state(OPEN, now)
+
+    def snapshot(self):
+        with self.lock:
+            now = time.monotonic()
+            self._trim(now)
+            return {
+                'name': self.name,
+                'state': self.state,
+                'calls': len(self.calls),
+                'failures': sum(1 for call in self.calls if call[1]),
+                'slow_calls': sum(1 for call in self.calls if call[2]),
+                'retry_after': round(self.retry_after(), 1) if self.state == OPEN else None,
+            }
+
+
+class BreakerRegistry:
+    """One CircuitBreaker per (operation, shortcode) in this process."""
+
+    def __init__(self, **settings):
+        self.settings = settings
+        self.breakers = {}
+        self.lock = threading.Lock()
+
+    def get(self, operation, shortcode=None):
+        key = (operation, shortcode)
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            with self.lock:
+                breaker = self.breakers.get(key)
+                if breaker is None:
+                    name = f"{operation}:{shortcode}" if shortcode else operation
+                    breaker = self.breakers[key] = CircuitBreaker(name, on_change=self._report, **self.settings)
+        return breaker
+
+    def _report(self, breaker):
+        operation, _, shortcode = breaker.name.partition(':')
+        DARAJA_CIRCUIT_STATE.labels(operation, tenant_label(shortcode or None)).set(STATE_VALUES[breaker.state])
+
+    def snapshot(self):
+        with self.lock:
+            breakers = list(self.breakers.values())
+        return [breaker.snapshot() for breaker in breakers]
+
+
+def init_app(app):
+    app.extensions['daraja_breakers'] = BreakerRegistry(
+        window=app.config.get('DARAJA_BREAKER_WINDOW', 60),
+        min_calls=app.config.get('DARAJA_BREAKER_MIN_CALLS', 10),
+        failure_rate=app.config.get('DARAJA_BREAKER_FAILURE_RATE', 0.5),
+        slow_call_seconds=app.config.get('DARAJA_BREAKER_SLOW_CALL_SECONDS', 10),
+        slow_call_rate=app.config.get('DARAJA_BREAKER_SLOW_CALL_RATE', 0.8),
+        open_seconds=app.config.get('DARAJA_BREAKER_OPEN_SECONDS', 30),
+        half_open_probes=app.config.get('DARAJA_BREAKER_HALF_OPEN_PROBES', 1),
+    )
+
+def get_breakers():
+    return current_app.extensions['daraja_breakers']
@@ -0,0 +1,66 @@
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+
+def is_sqlite_memory(engine):
+    return engine.dialect.name == 'sqlite' and engine.url.database in (None, '', ':memory:')
+
+def _sqlite_pragmas(busy_timeout):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers run alongside the single writer; NORMAL is durable in WAL
+        # mode except for the last transactions before a power loss
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout * 1000)}')
+        cursor.close()
+    return on_connect
+
+def _lift_statement_timeout(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('SET statement_timeout = 0')
+    cursor.close()
+    dbapi_connection.commit()
+
+def disable_statement_timeout(engine):
+    """Lifts DB_STATEMENT_TIMEOUT_MS for the rest of this process.
+
+    For migrations and maintenance commands, whose index builds and backfills
+    scan whole tables and can legitimately run for minutes.
+    """
+    if engine.dialect.name != 'postgresql':
+        return
+    if not event.contains(engine, 'connect', _lift_statement_timeout):
+        event.listen(engine, 'connect', _lift_statement_timeout)
+    # Connections opened before this point still carry the timeout
+    engine.dispose()
+
+def pool_report(engine, app):
+    """One line describing the pool this process will use."""
+    pool = engine.pool
+    options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    parts = [f"{engine.dialect.name} {type(pool).__name__}"]
+    if isinstance(pool, QueuePool):
+        parts.append(f"size={pool.size()} max_overflow={options.get('max_overflow', 10)} "
+                     f"timeout={options.get('pool_timeout', 30)}s")
+    parts.append(f"pre_ping={options.get('pool_pre_ping', False)} recycle={options.get('pool_recycle', -1)}s")
+    statement_timeout = (options.get('connect_args') or {}).get('options', '').partition('statement_timeout=')[2]
+    if statement_timeout:
+        parts.append(f"statement_timeout={statement_timeout}ms")
+    if engine.dialect.name == 'sqlite' and not is_sqlite_memory(engine):
+        parts.append(f"wal={app.config.get('SQLITE_WAL', True)}")
+    concurrency = app.config.get('WORKER_CONCURRENCY', 1)
+    parts.append(f"worker_concurrency={concurrency}")
+    report = 'Database Pool: ' + ', '.join(parts)
+    if isinstance(pool, QueuePool) and pool.size() + options.get('max_overflow', 10) < concurrency:
+        report += ' (smaller than the worker concurrency; requests will queue for connections)'
+    return report
+
+def init_app(app):
+    from . import db
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name == 'sqlite' and not is_sqlite_memory(engine) and app.config.get('SQLITE_WAL', True):
+            event.listen(engine, 'connect', _sqlite_pragmas(app.config.get('SQLITE_BUSY_TIMEOUT', 15)))
+        if app.config.get('DB_POOL_REPORT', True) and not app.testing:
+            print(pool_report(engine, app))
@@ -0,0 +1,89 @@
+from . import db
+from .models import Business, Customer, Transaction, TransactionDailyRollup
+from .pagination import PaginationError, parse_limit
+
+
+def business_page(args, limit):
+    """The page of businesses as a CTE, newest first, filtered by the search and cursor parameters."""
+    query = db.select(Business.id, Business.phone_number, Business.email, Business.created_at, Business.is_active)
+    if args.get('search'):
+        term = args['search'].strip()
+        query = query.where(db.or_(
+            Business.email.icontains(term, autoescape=True),
+            Business.phone_number.contains(term, autoescape=True)
+        ))
+    if args.get('cursor'):
+        try:
+            query = query.where(Business.id < int(args['cursor']))
+        except ValueError:
+            raise PaginationError('Invalid cursor')
+    return query.order_by(Business.id.desc()).limit(limit + 1).cte('page')
+
+def business_directory(args):
+    """Returns one page of businesses with their transaction and customer totals, and the next cursor.
+
+    Everything comes from one statement: the page is selected first, and the
+    totals are grouped over the rollups and customers of those businesses
+    only. Last activity is one index lookup per business.
+    """
+    limit = parse_limit(args)
+    page = business_page(args, limit)
+    page_ids = db.select(page.c.id)
+
+    def count_status(status):
+        return db.func.sum(db.case((TransactionDailyRollup.status == status, TransactionDailyRollup.count), else_=0))
+
+    totals = (
+        db.select(
+            TransactionDailyRollup.business_id,
+            db.func.sum(TransactionDailyRollup.count).label('transaction_count'),
+            count_status('success').label('success_count'),
+            count_status('failed').label('failed_count'),
+            db.func.sum(db.case(
+                (TransactionDailyRollup.status == 'success', TransactionDailyRollup.amount), else_=0
+            )).label('amount_collected'),
+        )
+        .where(TransactionDailyRollup.business_id.in_(page_ids))
+        .group_by(TransactionDailyRollup.business_id)
+        .subquery('totals')
+    )
+    customers = (
+        db.select(Customer.business_id, db.func.count(Customer.id).label('customer_count'))
+        .where(Customer.business_id.in_(page_ids))
+        .group_by(Customer.business_id)
+        .subquery('customers')
+    )
+    last_activity = (
+        db.select(db.func.max(Transaction.timestamp))
+        .where(Transaction.business_id == page.c.id)
+        .scalar_subquery()
+    )
+
+    query = (
+        db.select(page, totals, customers.c.customer_count, last_activity.label('last_activity'))
+        .outerjoin(totals, totals.c.business_id == page.c.id)
+        .outerjoin(customers, customers.c.business_id == page.c.id)
+        .order_by(page.c.id.desc())
+    )
+    rows = db.session.execute(query).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = str(rows[-1].id)
+    return [business_summary(row) for row in rows], next_cursor
+
+def business_summary(row):
+    finalized = (row.success_count or 0) + (row.failed_count or 0)
+    return {
+        'id': row.id,
+        'phone_number': row.phone_number,
+        'email': row.email,
+        'created_at': row.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'is_active': row.is_active,
+        'transaction_count': row.transaction_count or 0,
+        'success_rate': round(row.success_count / finalized, 4) if finalized else None,
+        'amount_collected': row.amount_collected or 0,
+        'last_activity': row.last_activity.strftime('%Y-%m-%d %H:%M:%S') if row.last_activity else None,
+        'customer_count': row.customer_count or 0,
+    }
@@ -0,0 +1,205 @@
+import datetime
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from . import db
+from .models import Customer, ExportJob, Transaction
+from .exports import (
+    CUSTOMER_HEADERS, TRANSACTION_HEADERS, customer_row, admin_customer_row,
+    transaction_row, admin_transaction_row, iter_customer_rows, iter_transaction_rows,
+    write_csv, write_xlsx
+)
+
+EXPORT_KINDS = ('customers', 'transactions')
+EXPORT_FORMATS = ('xlsx', 'csv')
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    # Created on first use so each gunicorn worker gets its own threads after fork
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config.get('EXPORT_WORKERS', 2),
+                thread_name_prefix='export'
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+def export_dir():
+    path = current_app.config.get('EXPORT_DIR') or os.path.join(current_app.instance_path, 'exports')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def export_query(job):
+    model = Customer if job.kind == 'customers' else Transaction
+    query = model.query
+    if job.business_id is not None:
+        query = query.filter_by(business_id=job.business_id)
+    return query
+
+def export_layout(job):
+    """Returns (headers, row_fn) for a job. Platform-wide exports get a Business ID column."""
+    platform_wide = job.business_id is None
+    if job.kind == 'customers':
+        if platform_wide:
+            return ["Business ID"] + CUSTOMER_HEADERS, admin_customer_row
+        return CUSTOMER_HEADERS, customer_row
+    if platform_wide:
+        return ["Business ID"] + TRANSACTION_HEADERS, admin_transaction_row
+    return TRANSACTION_HEADERS, transaction_row
+
+def create_export_job(owner, business_id, kind, export_format):
+    purge_expired_exports()
+
+    job = ExportJob(
+        id=uuid.uuid4().hex,
+        owner=owner,
+        business_id=business_id,
+        kind=kind,
+        format=export_format,
+        status='queued',
+        rows_written=0,
+        heartbeat_at=datetime.datetime.utcnow()
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    get_executor().submit(_run_in_context, app, job.id)
+    return job
+
+def _run_in_context(app, job_id):
+    with app.app_context():
+        try:
+            run_export_job(job_id)
+        except Exception as e:
+            db.session.rollback()
+            ttl = app.config.get('EXPORT_TTL_SECONDS', 24 * 60 * 60)
+            _update_job(
+                job_id,
+                status='failed',
+                error=str(e),
+                expires_at=datetime.datetime.utcnow() + datetime.timedelta(seconds=ttl)
+            )
+            print(f"Export Job Error for {job_id}: {e}")
+
+def _update_job(job_id, **values):
+    # Progress is written on its own connection so the export's streaming
+    # read cursor on the session stays open
+    with db.engine.begin() as conn:
+        conn.execute(db.update(ExportJob).where(ExportJob.id == job_id).values(heartbeat_at=datetime.datetime.utcnow(), **values))
+
+def _start_job(job_id):
+    # A job already failed as stale is not run after all
+    with db.engine.begin() as conn:
+        result = conn.execute(
+            db.update(ExportJob)
+            .where(ExportJob.id == job_id, ExportJob.status == 'queued')
+            .values(status='running', heartbeat_at=datetime.datetime.utcnow())
+        )
+    return result.rowcount == 1
+
+def run_export_job(job_id):
+    if not _start_job(job_id):
+        return
+    job = db.session.get(ExportJob, job_id)
+    query = export_query(job)
+    headers, row_fn = export_layout(job)
+    iter_fn = iter_customer_rows if job.kind == 'customers' else iter_transaction_rows
+
+    _update_job(job_id, total_rows=query.count())
+
+    progress_every = current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+
+    def counted(rows):
+        written = 0
+        for row in rows:
+            yield row
+            written += 1
+            if written % progress_every == 0:
+                _update_job(job_id, rows_written=written)
+        _update_job(job_id, rows_written=written)
+
+    path = os.path.join(export_dir(), f"{job.id}.{job.format}")
+    partial_path = path + '.part'
+    rows = counted(iter_fn(query, row_fn))
+    if job.format == 'csv':
+        with open(partial_path, 'w', newline='', encoding='utf-8') as fileobj:
+            write_csv(fileobj, headers, rows)
+    else:
+        with open(partial_path, 'wb') as fileobj:
+            write_xlsx(fileobj, job.kind.capitalize(), headers, rows)
+    os.replace(partial_path, path)
+
+    now = datetime.datetime.utcnow()
+    ttl = current_app.config.get('EXPORT_TTL_SECONDS', 24 * 60 * 60)
+    db.session.rollback()
+    _update_job(
+        job_id,
+        status='completed',
+        file_path=path,
+        completed_at=now,
+        expires_at=now + datetime.timedelta(seconds=ttl)
+    )
+
+def fail_stale_exports(now):
+    """Fails queued or running jobs that stopped making progress. Returns how many.
+
+    Jobs run on the web worker's own threads, so a worker restart or timeout
+    loses them; without this they would show as queued or running forever.
+    """
+    cutoff = now - datetime.timedelta(seconds=current_app.config.get('EXPORT_STALE_SECONDS', 15 * 60))
+    ttl = current_app.config.get('EXPORT_TTL_SECONDS', 24 * 60 * 60)
+    stale = ExportJob.query.filter(
+        ExportJob.status.in_(('queued', 'running')),
+        db.func.coalesce(ExportJob.heartbeat_at, ExportJob.created_at) < cutoff
+    ).all()
+    for job in stale:
+        partial_path = os.path.join(export_dir(), f"{job.id}.{job.format}.part")
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        job.status = 'failed'
+        job.error = 'The export was interrupted by a server restart. Please request it again.'
+        job.expires_at = now + datetime.timedelta(seconds=ttl)
+    if stale:
+        db.session.commit()
+    return len(stale)
+
+def purge_expired_exports():
+    """Fails stale jobs and deletes finished export files past their TTL. Returns the number of jobs purged."""
+    now = datetime.datetime.utcnow()
+    fail_stale_exports(now)
+    expired = ExportJob.query.filter(ExportJob.expires_at != None, ExportJob.expires_at < now).all()
+    for job in expired:
+        if job.file_path and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+        db.session.delete(job)
+    if expired:
+        db.session.commit()
+    return len(expired)
+
+def export_job_json(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'format': job.format,
+        'status': job.status,
+        'rows_written': job.rows_written,
+        'total_rows': job.total_rows,
+        'error': job.error,
+        'created_at': job.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'expires_at': job.expires_at.strftime('%Y-%m-%d %H:%M:%S') if job.expires_at else None,
+    }
+
+def export_filename(job):
+    scope = 'all_' if job.business_id is None else ''
+    return f"{scope}{job.kind}_{job.created_at.strftime('%Y%m%d%H%M%S')}.{job.format}"
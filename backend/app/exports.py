@@ -0,0 +1,155 @@
+import csv
+import io
+import json
+import tempfile
+import zlib
+
+import openpyxl
+from flask import Response, current_app, request, send_file, stream_with_context
+
+from .models import Customer, Transaction
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+STREAM_MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+CHUNK_SIZE = 64 * 1024
+
+TRANSACTION_HEADERS = ["ID", "Amount", "Phone Number", "Status", "Checkout Request ID", "Timestamp", "Customer ID"]
+
+CUSTOMER_HEADERS = ["Name", "Phone Number", "Total Amount Requested", "Transaction Count", "First Transaction Date", "Last Transaction Date"]
+
+
+def format_datetime(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+
+def customer_row(customer):
+    return [
+        customer.name,
+        customer.phone_number,
+        customer.total_amount_requested,
+        customer.transaction_count,
+        format_datetime(customer.first_transaction_date),
+        format_datetime(customer.last_transaction_date)
+    ]
+
+def admin_customer_row(customer):
+    return [customer.business_id] + customer_row(customer)
+
+def transaction_row(transaction):
+    return [
+        transaction.id,
+        transaction.amount,
+        transaction.phone_number,
+        transaction.status,
+        transaction.checkout_request_id,
+        format_datetime(transaction.timestamp),
+        transaction.customer_id
+    ]
+
+def admin_transaction_row(transaction):
+    return [transaction.business_id] + transaction_row(transaction)
+
+def iter_rows(query, row_fn, order_by):
+    # yield_per streams rows in batches (a server-side cursor on Postgres)
+    # instead of loading the whole result set
+    batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+    for row in query.order_by(order_by).yield_per(batch_size):
+        yield row_fn(row)
+
+def iter_customer_rows(query, row_fn=customer_row):
+    return iter_rows(query, row_fn, Customer.id)
+
+def iter_transaction_rows(query, row_fn=transaction_row):
+    return iter_rows(query, row_fn, Transaction.id)
+
+def write_csv(fileobj, headers, rows):
+    writer = csv.writer(fileobj)
+    writer.writerow(headers)
+    for row in rows:
+        writer.writerow(row)
+
+def write_xlsx(fileobj, title, headers, rows):
+    # Write-only workbooks keep each row on disk instead of building a cell graph in memory
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append(headers)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(fileobj)
+
+def xlsx_response(title, headers, rows, download_name):
+    """Builds the workbook into a spooled file and streams it back in chunks.
+
+    Small exports stay in memory; above EXPORT_SPOOL_MAX_SIZE bytes the spool
+    rolls over to a temporary file, so memory stays flat for large tenants.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=current_app.config.get('EXPORT_SPOOL_MAX_SIZE', 5 * 1024 * 1024))
+    try:
+        write_xlsx(spool, title, headers, rows)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+
+    return send_file(
+        spool,
+        as_attachment=True,
+        download_name=download_name,
+        mimetype=XLSX_MIMETYPE
+    )
+
+def iter_csv_chunks(headers, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+def iter_ndjson_chunks(headers, rows):
+    keys = [header.lower().replace(' ', '_') for header in headers]
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps(dict(zip(keys, row))) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+            size = 0
+    yield ''.join(lines).encode('utf-8')
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) # wbits=31 writes a gzip header
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def stream_response(export_format, headers, rows, download_name):
+    """Streams CSV or NDJSON chunk by chunk as rows come off the database cursor.
+
+    The body is gzip-encoded when the client accepts it.
+    """
+    chunks = iter_csv_chunks(headers, rows) if export_format == 'csv' else iter_ndjson_chunks(headers, rows)
+    response_headers = {'Content-Disposition': f'attachment; filename={download_name}', 'Vary': 'Accept-Encoding'}
+
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        chunks = gzip_chunks(chunks)
+        response_headers['Content-Encoding'] = 'gzip'
+
+    return Response(stream_with_context(chunks), mimetype=STREAM_MIMETYPES[export_format], headers=response_headers)
+
+def export_response(title, headers, rows, basename, default_format='xlsx'):
+    """Responds with the export in the format named by the `format` query parameter."""
+    export_format = request.args.get('format', default_format)
+    if export_format == 'xlsx':
+        return xlsx_response(title, headers, rows, f"{basename}.xlsx")
+    if export_format in STREAM_MIMETYPES:
+        return stream_response(export_format, headers, rows, f"{basename}.{export_format}")
+    return {'message': 'Invalid format. Use one of: xlsx, csv, ndjson'}, 400
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+
+from flask import Response, current_app, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+    start_http_server
+)
+
+# With several gunicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty
+# directory before start-up; every worker then writes its samples there and
+# /metrics aggregates them. gunicorn.conf.py cleans up after dead workers.
+# The `flask` CLI workers run as separate services, so they serve their own
+# samples on WORKER_METRICS_PORT instead (see start_worker_metrics_server).
+
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency',
+    ['method', 'route', 'status']
+)
+DARAJA_REQUEST_DURATION = Histogram(
+    'daraja_request_duration_seconds', 'Outbound Daraja request latency',
+    ['operation', 'tenant'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+)
+DARAJA_RESULTS = Counter(
+    'daraja_results_total', 'Daraja responses by result code',
+    ['operation', 'tenant', 'result']
+)
+TOKEN_FETCHES = Counter(
+    'mpesa_token_fetches_total', 'OAuth token requests sent to Daraja (token cache misses)',
+    ['outcome']
+)
+CALLBACK_LAG = Histogram(
+    'callback_lag_seconds', 'Time from sending an STK push to applying its callback',
+    buckets=(1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1800)
+)
+CALLBACK_INBOX_DELAY = Histogram(
+    'callback_inbox_delay_seconds', 'Time a callback waits in the inbox before it is applied',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+)
+DARAJA_CIRCUIT_STATE = Gauge(
+    'daraja_circuit_state', 'Daraja circuit breaker state (0 closed, 1 half-open, 2 open)',
+    ['operation', 'tenant'],
+    multiprocess_mode='livemax'
+)
+WEBHOOK_DELIVERIES = Counter(
+    'webhook_deliveries_total', 'Webhook events by delivery outcome',
+    ['outcome']
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out_connections', 'Database connections in use',
+    multiprocess_mode='livesum'
+)
+DB_POOL_SIZE = Gauge(
+    'db_pool_size_connections', 'Configured database pool size (excluding overflow)',
+    multiprocess_mode='livesum'
+)
+
+_tenant_labels = set()
+_tenant_labels_lock = threading.Lock()
+
+
+def tenant_label(tenant):
+    """Bounds the tenant label: the first METRICS_MAX_TENANTS tenants seen get their own series, the rest share 'other'."""
+    if tenant is None:
+        return 'none'
+    tenant = str(tenant)
+    with _tenant_labels_lock:
+        if tenant in _tenant_labels:
+            return tenant
+        if len(_tenant_labels) < current_app.config.get('METRICS_MAX_TENANTS', 50):
+            _tenant_labels.add(tenant)
+            return tenant
+    return 'other'
+
+def daraja_result(response):
+    """Short result label for a Daraja response dict (or None)."""
+    if not response:
+        return 'none'
+    for key in ('ResultCode', 'ResponseCode', 'errorCode', 'error'):
+        if response.get(key) is not None:
+            return str(response[key])
+    return 'ok' if response.get('access_token') else 'unknown'
+
+def observe_daraja(operation, tenant, started, response):
+    if not current_app.config.get('METRICS_ENABLED', True):
+        return
+    label = tenant_label(tenant)
+    DARAJA_REQUEST_DURATION.labels(operation, label).observe(time.perf_counter() - started)
+    DARAJA_RESULTS.labels(operation, label, daraja_result(response)).inc()
+
+def observe_callback_lag(transactions, now):
+    for transaction in transactions:
+        if transaction.timestamp:
+            CALLBACK_LAG.observe(max((now - transaction.timestamp).total_seconds(), 0))
+
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+
+def _after_request(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_DURATION.labels(request.method, route, response.status_code).observe(time.perf_counter() - started)
+    return response
+
+def metrics_view():
+    token = current_app.config.get('METRICS_AUTH_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+
+    return Response(generate_latest(_registry()), mimetype=CONTENT_TYPE_LATEST)
+
+def _registry():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+def start_worker_metrics_server(app):
+    """Serves this CLI worker's metrics over HTTP on WORKER_METRICS_PORT. Returns the server, or None if disabled.
+
+    Callback lag, inbox delay, reconciler Daraja calls and webhook deliveries
+    are recorded in the workers, not the web service, so they need scraping here.
+    """
+    port = app.config.get('WORKER_METRICS_PORT')
+    if port is None or not app.config.get('METRICS_ENABLED', True):
+        return None
+    server, _ = start_http_server(int(port), registry=_registry())
+    print(f"Metrics: serving worker metrics on port {server.server_port}")
+    return server
+
+def _track_pool(engine):
+    from sqlalchemy import event
+
+    size = getattr(engine.pool, 'size', None)
+    if callable(size):
+        DB_POOL_SIZE.inc(size())
+
+    @event.listens_for(engine, 'checkout')
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKED_OUT.inc()
+
+    @event.listens_for(engine, 'checkin')
+    def checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.dec()
+
+def init_app(app):
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+    from . import db
+    with app.app_context():
+        _track_pool(db.engine)
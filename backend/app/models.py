@@ -9,6 +9,9 @@ class Business(db.Model):
     password_hash = db.Column(db.String(256))
     is_active = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    webhook_url = db.Column(db.String(500)) # Receives transaction events when set
+    webhook_secret = db.Column(db.String(64)) # Signs webhook bodies
+    rate_limits = db.Column(db.Text) # JSON {route: '<requests>/<seconds>'} set by admins; None uses RATE_LIMITS
     api_keys = db.relationship('APIKeys', backref='business', lazy=True, uselist=False)
     transactions = db.relationship('Transaction', backref='business', lazy=True)
     customers = db.relationship('Customer', backref='business', lazy=True)
@@ -32,11 +35,26 @@ class Transaction(db.Model):
     amount = db.Column(db.Float, nullable=False)
     phone_number = db.Column(db.String(20), nullable=False)
     status = db.Column(db.String(20), default='pending')
-    checkout_request_id = db.Column(db.String(100))
+    checkout_request_id = db.Column(db.String(100), index=True, unique=True)
+    # Only used by the async STK push queue
+    account_reference = db.Column(db.String(100))
+    transaction_desc = db.Column(db.String(100))
+    attempts = db.Column(db.Integer, default=0)
+    claimed_at = db.Column(db.DateTime) # When a worker moved the row to 'submitting'
+    error = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     business_id = db.Column(db.Integer, db.ForeignKey('business.id'), nullable=False)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'))
 
+# The queue worker claims rows with status = 'queued' in id order
+db.Index('ix_transaction_status_id', Transaction.status, Transaction.id)
+# Per-business transaction listings, newest first
+db.Index('ix_transaction_business_id_timestamp', Transaction.business_id, Transaction.timestamp.desc())
+# Platform-wide admin listing, keyset-paginated on (timestamp, id)
+db.Index('ix_transaction_timestamp_id', Transaction.timestamp.desc(), Transaction.id.desc())
+# Reconciliation walks old pending transactions in (timestamp, id) order
+db.Index('ix_transaction_status_timestamp_id', Transaction.status, Transaction.timestamp, Transaction.id)
+
 class Customer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120))
@@ -48,6 +66,80 @@ class Customer(db.Model):
     business_id = db.Column(db.Integer, db.ForeignKey('business.id'), nullable=False)
     transactions = db.relationship('Transaction', backref='customer', lazy=True)
 
+# One customer row per phone number per business; also serves callback lookups
+db.Index('ix_customer_business_id_phone_number', Customer.business_id, Customer.phone_number, unique=True)
+
+class CallbackInbox(db.Model):
+    # Append-only log of raw /callback bodies, drained by `flask process-callbacks`
+    id = db.Column(db.Integer, primary_key=True)
+    payload = db.Column(db.Text, nullable=False)
+    received_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    processed_at = db.Column(db.DateTime)
+    retry_at = db.Column(db.DateTime) # Set while the callback's CheckoutRequestID is not committed yet
+
+# The processor scans unprocessed entries in arrival order
+db.Index('ix_callback_inbox_processed_at_id', CallbackInbox.processed_at, CallbackInbox.id)
+
+class ProcessedCallback(db.Model):
+    # One row per CheckoutRequestID whose callback has been applied
+    checkout_request_id = db.Column(db.String(100), primary_key=True)
+    result_code = db.Column(db.Integer)
+    processed_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+class ExportJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    owner = db.Column(db.String(64), nullable=False) # JWT identity that requested the export
+    business_id = db.Column(db.Integer, db.ForeignKey('business.id')) # None for platform-wide admin exports
+    kind = db.Column(db.String(20), nullable=False)
+    format = db.Column(db.String(10), nullable=False)
+    status = db.Column(db.String(20), default='queued')
+    rows_written = db.Column(db.Integer, default=0)
+    total_rows = db.Column(db.Integer)
+    file_path = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime) # Last progress write; stale jobs were lost with their worker
+    expires_at = db.Column(db.DateTime, index=True)
+
+class TransactionDailyRollup(db.Model):
+    # Transaction counts and amounts per business, creation day and status,
+    # kept up to date as transactions are created and finalized
+    business_id = db.Column(db.Integer, db.ForeignKey('business.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    amount = db.Column(db.Float, nullable=False, default=0)
+
+# Platform-wide stats scan by day across all businesses
+db.Index('ix_transaction_daily_rollup_day', TransactionDailyRollup.day)
+
+class WebhookEvent(db.Model):
+    # Transactional outbox: written with the transaction update, sent by `flask deliver-webhooks`
+    id = db.Column(db.Integer, primary_key=True)
+    business_id = db.Column(db.Integer, db.ForeignKey('business.id'), nullable=False)
+    event_type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='pending')
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    delivered_at = db.Column(db.DateTime)
+
+# The delivery worker claims due events in id order
+db.Index('ix_webhook_event_status_next_attempt_at_id', WebhookEvent.status, WebhookEvent.next_attempt_at, WebhookEvent.id)
+
+class RefreshToken(db.Model):
+    # One row per issued refresh token; a login and all its rotations share a family_id
+    jti = db.Column(db.String(36), primary_key=True)
+    identity = db.Column(db.String(64), nullable=False, index=True)
+    family_id = db.Column(db.String(32), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime)
+    replaced_by = db.Column(db.String(36))
+
 class AdminUser(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -0,0 +1,104 @@
+import base64
+import datetime
+
+from flask import request, url_for
+
+from . import db
+from .models import Transaction
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def encode_cursor(timestamp, row_id):
+    raw = f"{timestamp.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp_str, row_id_str = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.datetime.fromisoformat(timestamp_str), int(row_id_str)
+    except (ValueError, UnicodeDecodeError):
+        raise PaginationError('Invalid cursor')
+
+def parse_limit(args, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    try:
+        limit = int(args.get('limit', default))
+    except ValueError:
+        raise PaginationError('Invalid limit')
+    if limit < 1:
+        raise PaginationError('Invalid limit')
+    return min(limit, maximum)
+
+def parse_business_id(args):
+    """The optional business_id query parameter as an int, or None when it is absent."""
+    value = args.get('business_id')
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise PaginationError('Invalid business_id')
+
+def parse_date(value, name):
+    try:
+        if len(value) == 10:
+            return datetime.datetime.strptime(value, '%Y-%m-%d')
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise PaginationError(f'Invalid {name}. Use YYYY-MM-DD or an ISO 8601 timestamp.')
+
+def filter_transactions(query, args):
+    """Applies the status, phone_number, date_from and date_to query parameters.
+
+    A bare date in date_to includes that whole day.
+    """
+    if args.get('status'):
+        query = query.filter(Transaction.status == args['status'])
+    if args.get('phone_number'):
+        query = query.filter(Transaction.phone_number == args['phone_number'])
+    if args.get('date_from'):
+        query = query.filter(Transaction.timestamp >= parse_date(args['date_from'], 'date_from'))
+    if args.get('date_to'):
+        date_to = parse_date(args['date_to'], 'date_to')
+        if len(args['date_to']) == 10:
+            query = query.filter(Transaction.timestamp < date_to + datetime.timedelta(days=1))
+        else:
+            query = query.filter(Transaction.timestamp <= date_to)
+    return query
+
+def paginate_transactions(query, args):
+    """Returns one page of `query`, newest first, and the cursor for the next page.
+
+    Pages are keyed on (timestamp, id) so each page is an index range scan,
+    however deep into the history it is.
+    """
+    limit = parse_limit(args)
+    query = filter_transactions(query, args)
+
+    if args.get('cursor'):
+        timestamp, row_id = decode_cursor(args['cursor'])
+        query = query.filter(db.tuple_(Transaction.timestamp, Transaction.id) < db.tuple_(timestamp, row_id))
+
+    transactions = query.order_by(Transaction.timestamp.desc(), Transaction.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        last = transactions[-1]
+        next_cursor = encode_cursor(last.timestamp, last.id)
+    return transactions, next_cursor
+
+def add_next_page_headers(response, next_cursor):
+    if next_cursor:
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        next_url = url_for(request.endpoint, _external=True, **request.view_args, **args)
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
@@ -0,0 +1,60 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from werkzeug.security import check_password_hash
+
+
+def _executor(workers):
+    # Under gevent workers `threading` is patched and pool threads would be
+    # greenlets, hashing on the event loop. gevent's own pool uses OS threads.
+    try:
+        from gevent import monkey
+    except ImportError:
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-check')
+    if monkey.is_module_patched('threading'):
+        from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+        return NativeThreadPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-check')
+
+
+class PasswordCheckBusy(Exception):
+    """Too many password checks are already queued; the caller should answer 503."""
+
+
+class PasswordChecker:
+    """Caps how many password hash checks a worker runs at once.
+
+    Checks run on `workers` threads, so a burst of logins uses at most that many
+    cores. The calling request thread still waits for its own check. At most
+    `max_pending` checks are queued or running; beyond that callers wait up to
+    `wait` seconds (by default not at all) for a slot and then get
+    PasswordCheckBusy, so logins are shed with a 503 instead of tying up more
+    request threads.
+    """
+
+    def __init__(self, workers=2, max_pending=8, wait=0):
+        self.executor = _executor(workers)
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.wait = wait
+
+    def check(self, password_hash, password):
+        if not password_hash or not isinstance(password, str):
+            return False
+        if not self.slots.acquire(timeout=self.wait):
+            raise PasswordCheckBusy()
+        try:
+            return self.executor.submit(check_password_hash, password_hash, password).result()
+        finally:
+            self.slots.release()
+
+
+def init_app(app):
+    app.extensions['password_checker'] = PasswordChecker(
+        workers=app.config.get('PASSWORD_HASH_WORKERS', 2),
+        max_pending=app.config.get('PASSWORD_HASH_MAX_PENDING', 8),
+        wait=app.config.get('PASSWORD_HASH_WAIT', 0),
+    )
+
+def check_password(password_hash, password):
+    return current_app.extensions['password_checker'].check(password_hash, password)
@@ -0,0 +1,131 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import current_app, g, request
+from sqlalchemy import event
+
+# Profiles currently collecting queries in this context, innermost last
+_active_profiles = ContextVar('sql_profiles', default=())
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryProfile:
+    """Query count, DB time and per-statement counts for one request or block."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.statements = Counter()
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.total_time += elapsed
+        self.statements[' '.join(statement.split())] += 1
+
+    def repeated(self, threshold=3):
+        """Statements run at least `threshold` times, the usual sign of an N+1 loop."""
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+    def describe(self, threshold=3):
+        lines = [f"{self.count} queries in {self.total_time * 1000:.1f}ms"]
+        for statement, count in self.repeated(threshold):
+            lines.append(f"  x{count}: {statement[:200]}")
+        return '\n'.join(lines)
+
+
+@contextmanager
+def profile_queries():
+    profile = QueryProfile()
+    token = _active_profiles.set(_active_profiles.get() + (profile,))
+    try:
+        yield profile
+    finally:
+        _active_profiles.reset(token)
+
+@contextmanager
+def assert_max_queries(limit, repeat_threshold=3):
+    """Fails with QueryBudgetExceeded if the block runs more than `limit` queries."""
+    with profile_queries() as profile:
+        yield profile
+    if profile.count > limit:
+        raise QueryBudgetExceeded(f"Query budget of {limit} exceeded: {profile.describe(repeat_threshold)}")
+
+def query_budget(limit):
+    """Declares the most queries a route may run. Place it directly under @bp.route."""
+    def wrapper(fn):
+        fn.query_budget = limit
+        return fn
+    return wrapper
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active_profiles.get():
+        conn.info.setdefault('sql_profiler_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profiles = _active_profiles.get()
+    started = conn.info.get('sql_profiler_started')
+    if not profiles or not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    for profile in profiles:
+        profile.record(statement, elapsed)
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get('sql_profiler_started') if exception_context.connection else None
+    if started:
+        started.pop()
+
+def _start_request_profile():
+    g.sql_profile_started = time.perf_counter()
+    g.sql_profile_token = _active_profiles.set(_active_profiles.get() + (QueryProfile(),))
+
+def _finish_request_profile(response):
+    if 'sql_profile_token' not in g:
+        return response
+    profile = _active_profiles.get()[-1]
+    config = current_app.config
+    threshold = config.get('SQL_PROFILER_REPEAT_THRESHOLD', 3)
+    elapsed_ms = (time.perf_counter() - g.sql_profile_started) * 1000
+
+    if current_app.debug or config.get('SQL_PROFILER_HEADERS', False):
+        response.headers['X-DB-Query-Count'] = str(profile.count)
+        response.headers['X-DB-Time-Ms'] = f"{profile.total_time * 1000:.1f}"
+        response.headers['X-DB-Repeated-Statements'] = str(len(profile.repeated(threshold)))
+
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None)
+    if budget is not None and profile.count > budget:
+        message = f"Query budget of {budget} exceeded by {request.method} {request.path}: {profile.describe(threshold)}"
+        if current_app.testing or config.get('SQL_PROFILER_ENFORCE_BUDGETS', False):
+            raise QueryBudgetExceeded(message)
+        print(message)
+
+    slow_ms = config.get('SQL_PROFILER_SLOW_REQUEST_MS', 1000)
+    slow_queries = config.get('SQL_PROFILER_SLOW_QUERY_COUNT', 50)
+    if elapsed_ms >= slow_ms or profile.count >= slow_queries:
+        print(f"Slow Request: {request.method} {request.path} took {elapsed_ms:.0f}ms, {profile.describe(threshold)}")
+    return response
+
+def _reset_request_profile(exc):
+    token = g.pop('sql_profile_token', None)
+    if token is not None:
+        _active_profiles.reset(token)
+
+def init_app(app):
+    # Opt-in outside tests; the listeners cost a little on every query
+    if not (app.config.get('SQL_PROFILER_ENABLED', False) or app.testing):
+        return
+    from . import db
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(db.engine, 'handle_error', _handle_error)
+    app.before_request(_start_request_profile)
+    app.after_request(_finish_request_profile)
+    app.teardown_request(_reset_request_profile)
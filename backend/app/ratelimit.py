@@ -0,0 +1,181 @@
+import math
+import threading
+import time
+from collections import namedtuple
+from functools import wraps
+
+from flask import current_app, jsonify, make_response
+
+from .cache import RedisStore
+from .tenancy import cached_tenant, get_tenant, identity_business_id
+
+# Routes that can be limited, and the names admins use for them
+LIMITED_ROUTES = ('stk_push', 'stk_push_bulk', 'stk_push_status', 'transactions', 'stats', 'customers', 'exports')
+
+RateLimit = namedtuple('RateLimit', ['requests', 'period'])
+BucketResult = namedtuple('BucketResult', ['allowed', 'remaining', 'reset', 'retry_after'])
+
+
+class RateLimitError(ValueError):
+    pass
+
+
+def parse_limit(value):
+    """Parses '<requests>/<seconds>', e.g. '60/60' for 60 requests a minute with bursts of up to 60."""
+    try:
+        requests, period = str(value).split('/')
+        limit = RateLimit(int(requests), float(period))
+    except ValueError:
+        raise RateLimitError(f"Invalid rate limit '{value}', expected <requests>/<seconds>")
+    if limit.requests < 1 or limit.period <= 0:
+        raise RateLimitError(f"Invalid rate limit '{value}', requests and seconds must be positive")
+    return limit
+
+def parse_limits(value):
+    """Parses 'route=<requests>/<seconds>,...' into a dict. 'default' applies to routes not listed."""
+    limits = {}
+    for part in (value or '').split(','):
+        if not part.strip():
+            continue
+        route, _, limit = part.partition('=')
+        limits[route.strip()] = parse_limit(limit.strip())
+    return limits
+
+def format_limit(limit):
+    return f"{limit.requests}/{limit.period:g}"
+
+def bucket_result(allowed, tokens, limit):
+    rate = limit.requests / limit.period
+    return BucketResult(
+        allowed=allowed,
+        remaining=int(tokens),
+        reset=math.ceil((limit.requests - tokens) / rate),
+        retry_after=0 if allowed else math.ceil((1 - tokens) / rate),
+    )
+
+
+class MemoryBuckets:
+    """Token buckets held by this process. Each gunicorn worker enforces the limit on its own."""
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def take(self, key, limit):
+        rate = limit.requests / limit.period
+        with self.lock:
+            now = time.monotonic()
+            tokens, updated = self.buckets.get(key, (limit.requests, now))
+            tokens = min(limit.requests, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.buckets[key] = (tokens, now)
+        return bucket_result(allowed, tokens, limit)
+
+
+# Refill and take in one round trip; Redis' own clock keeps workers on different hosts consistent
+TAKE_SCRIPT = """
+local requests = tonumber(ARGV[1])
+local rate = requests / tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or requests
+local updated = tonumber(state[2]) or now
+tokens = math.min(requests, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(tonumber(ARGV[2]) * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+class RedisBuckets:
+    """Token buckets shared by every worker through Redis."""
+
+    def __init__(self, client, prefix):
+        self.script = client.register_script(TAKE_SCRIPT)
+        self.prefix = prefix
+
+    def take(self, key, limit):
+        allowed, tokens = self.script(keys=[f"{self.prefix}ratelimit:{key}"], args=[limit.requests, limit.period])
+        return bucket_result(bool(allowed), float(tokens), limit)
+
+
+def route_limit(tenant, route):
+    """The tenant's own limit for a route if an admin set one, otherwise the configured default."""
+    overrides = (tenant.rate_limits if tenant else None) or {}
+    if route in overrides:
+        return parse_limit(overrides[route])
+    defaults = current_app.extensions['rate_limits']
+    return defaults.get(route) or defaults.get('default')
+
+def rate_limited(route):
+    """Takes a token from the business's bucket for `route` before running the view.
+
+    Goes above `business_required` and reads the business from the JWT, so a
+    rejected request costs no queries or Daraja calls. The limit comes from
+    the tenant cache; when the business is not cached the default limit is
+    checked first, and the business (with any limit an admin set for it) is
+    only loaded for requests that pass.
+    """
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            if not current_app.config.get('RATE_LIMIT_ENABLED', True):
+                return fn(*args, **kwargs)
+            business_id = identity_business_id()
+            if business_id is None:
+                return fn(*args, **kwargs) # business_required turns the caller away
+
+            buckets = current_app.extensions['rate_limit_buckets']
+            key = f"{business_id}:{route}"
+            tenant = cached_tenant(business_id)
+            limit = route_limit(tenant, route)
+            result = buckets.take(key, limit) if limit else None
+            if tenant is None and (result is None or result.allowed):
+                tenant = get_tenant(business_id)
+                if tenant is not None:
+                    own_limit = route_limit(tenant, route)
+                    if own_limit != limit:
+                        # An admin set this business's own limit; it applies from here on
+                        limit = own_limit
+                        result = buckets.take(key, limit) if limit else None
+            if result is None:
+                return fn(*args, **kwargs)
+
+            if result.allowed:
+                response = make_response(fn(*args, **kwargs))
+            else:
+                response = make_response(jsonify({'message': 'Rate limit exceeded. Please slow down.'}), 429)
+                response.headers['Retry-After'] = str(result.retry_after)
+            response.headers['X-RateLimit-Limit'] = str(limit.requests)
+            response.headers['X-RateLimit-Remaining'] = str(result.remaining)
+            response.headers['X-RateLimit-Reset'] = str(result.reset)
+            return response
+        return decorator
+    return wrapper
+
+def validate_overrides(data):
+    """Checks an admin's {route: '<requests>/<seconds>' | None} body. Returns the overrides to store."""
+    if not isinstance(data, dict):
+        raise RateLimitError('Expected an object of route limits')
+    overrides = {}
+    for route, value in data.items():
+        if route not in LIMITED_ROUTES:
+            raise RateLimitError(f"Unknown route '{route}'")
+        if value is not None:
+            overrides[route] = format_limit(parse_limit(value))
+    return overrides
+
+def init_app(app):
+    app.extensions['rate_limits'] = parse_limits(app.config.get('RATE_LIMITS', 'stk_push=60/60,stk_push_bulk=10/60,default=600/60'))
+    store = app.extensions.get('cache_store')
+    if isinstance(store, RedisStore):
+        app.extensions['rate_limit_buckets'] = RedisBuckets(store.client, store.prefix)
+    else:
+        app.extensions['rate_limit_buckets'] = MemoryBuckets()
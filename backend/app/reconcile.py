@@ -0,0 +1,153 @@
+import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from . import db
+from .callbacks import apply_stk_results
+from .models import Transaction
+from .rollups import record_status_changes
+from .services import stk_push_query
+from .tenancy import get_tenant
+from .webhooks import enqueue_transaction_events
+
+
+class TenantRateLimiter:
+    """Token bucket per tenant; `acquire` blocks until the tenant may send another query."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, tenant):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                tokens, updated = self.buckets.get(tenant, (self.rate, now))
+                tokens = min(self.rate, tokens + (now - updated) * self.rate)
+                if tokens >= 1:
+                    self.buckets[tenant] = (tokens - 1, now)
+                    return
+                self.buckets[tenant] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            time.sleep(wait)
+
+
+def query_result(response):
+    """The final ResultCode from an STK query response, or None while Daraja is still waiting on the customer."""
+    if not response or response.get('ResponseCode') != '0' or response.get('ResultCode') is None:
+        return None
+    try:
+        return int(response['ResultCode'])
+    except (TypeError, ValueError):
+        return None
+
+def stale_pending(older_than, newer_than, after, limit):
+    """Pending transactions created between the two cutoffs, oldest first, after the (timestamp, id) keyset `after`."""
+    query = (
+        db.select(Transaction.id, Transaction.timestamp, Transaction.business_id, Transaction.checkout_request_id)
+        .where(
+            Transaction.status == 'pending',
+            Transaction.timestamp < older_than,
+            Transaction.timestamp >= newer_than,
+            Transaction.checkout_request_id != None
+        )
+        .order_by(Transaction.timestamp, Transaction.id)
+        .limit(limit)
+    )
+    if after is not None:
+        query = query.where(db.tuple_(Transaction.timestamp, Transaction.id) > after)
+    return db.session.execute(query).all()
+
+def query_statuses(rows, executor, limiter):
+    """Queries Daraja for each row concurrently. Returns (checkout_request_id, result_code) pairs for finished pushes."""
+    app = current_app._get_current_object()
+
+    def query(row):
+        with app.app_context():
+            tenant = get_tenant(row.business_id)
+            if tenant is None or not tenant.credentials:
+                return None
+            limiter.acquire(row.business_id)
+            try:
+                response = stk_push_query(row.checkout_request_id, tenant.credentials)
+            except Exception as e:
+                print(f"Reconciliation Error for transaction {row.id}: {e}")
+                return None
+            result_code = query_result(response)
+            return None if result_code is None else (row.checkout_request_id, result_code)
+
+    return [result for result in executor.map(query, rows) if result is not None]
+
+def expire_stale(expire_before, limit):
+    """Marks pending transactions created before `expire_before` as expired, in bulk. Returns how many were expired."""
+    ids = db.select(Transaction.id).where(
+        Transaction.status == 'pending', Transaction.timestamp < expire_before
+    ).order_by(Transaction.id).limit(limit)
+    if db.engine.dialect.name == 'postgresql':
+        ids = ids.with_for_update(skip_locked=True)
+
+    expired = db.session.execute(
+        db.update(Transaction)
+        .where(Transaction.id.in_(ids.scalar_subquery()), Transaction.status == 'pending')
+        .values(status='expired')
+        .returning(
+            Transaction.id, Transaction.business_id, Transaction.status, Transaction.amount,
+            Transaction.phone_number, Transaction.checkout_request_id, Transaction.timestamp
+        )
+    ).all()
+    record_status_changes(
+        (row.business_id, row.timestamp, 'pending', 'expired', row.amount)
+        for row in expired
+    )
+    enqueue_transaction_events(expired)
+    db.session.commit()
+    return len(expired)
+
+def reconcile_pending(executor, limiter, batch_size, older_than_seconds, expire_after_seconds):
+    """One reconciliation pass. Returns a dict of counts."""
+    now = datetime.datetime.utcnow()
+    older_than = now - datetime.timedelta(seconds=older_than_seconds)
+    expire_before = now - datetime.timedelta(seconds=expire_after_seconds)
+    counts = {'queried': 0, 'finalized': 0, 'expired': 0}
+
+    # Query everything still inside Daraja's window, one batch at a time
+    after = None
+    while True:
+        rows = stale_pending(older_than, expire_before, after, batch_size)
+        db.session.rollback()
+        if not rows:
+            break
+        counts['queried'] += len(rows)
+        results = query_statuses(rows, executor, limiter)
+        if results:
+            counts['finalized'] += len(apply_stk_results(results))
+            db.session.commit()
+        if len(rows) < batch_size:
+            break
+        after = (rows[-1].timestamp, rows[-1].id)
+
+    # Anything older can no longer be queried
+    while True:
+        expired = expire_stale(expire_before, batch_size)
+        counts['expired'] += expired
+        if expired < batch_size:
+            break
+    return counts
+
+def run_reconciler(concurrency, batch_size, older_than_seconds, expire_after_seconds, tenant_rate, interval, once=False):
+    limiter = TenantRateLimiter(tenant_rate)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            try:
+                counts = reconcile_pending(executor, limiter, batch_size, older_than_seconds, expire_after_seconds)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Reconciliation Error: {e}")
+                counts = None
+            if once:
+                return counts
+            time.sleep(interval)
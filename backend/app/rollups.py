@@ -0,0 +1,127 @@
+import datetime
+
+from . import db
+from .models import Transaction, TransactionDailyRollup
+
+
+def rollup_status(status):
+    # Rows claimed by the queue worker are still counted as queued until they
+    # are sent, so claiming does not churn the rollups
+    return 'queued' if status == 'submitting' else status
+
+def apply_rollup_changes(changes):
+    """Adds (business_id, timestamp, status, count_delta, amount_delta) changes to the daily rollups.
+
+    Changes are merged per (business, day, status) and written with one upsert,
+    in the caller's database transaction.
+    """
+    merged = {}
+    for business_id, timestamp, status, count_delta, amount_delta in changes:
+        if timestamp is None:
+            continue
+        key = (business_id, timestamp.date(), rollup_status(status))
+        count, amount = merged.get(key, (0, 0))
+        merged[key] = (count + count_delta, amount + amount_delta)
+
+    rows = [
+        {'business_id': business_id, 'day': day, 'status': status, 'count': count, 'amount': amount}
+        for (business_id, day, status), (count, amount) in merged.items()
+        if count or amount
+    ]
+    if not rows:
+        return
+
+    from .callbacks import dialect_insert
+    stmt = dialect_insert(TransactionDailyRollup).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['business_id', 'day', 'status'],
+        set_={
+            'count': TransactionDailyRollup.count + stmt.excluded.count,
+            'amount': TransactionDailyRollup.amount + stmt.excluded.amount,
+        }
+    )
+    db.session.execute(stmt)
+
+def record_created(transactions):
+    """Counts new transactions. Takes (business_id, timestamp, status, amount) tuples."""
+    apply_rollup_changes(
+        (business_id, timestamp, status, 1, amount)
+        for business_id, timestamp, status, amount in transactions
+    )
+
+def record_status_changes(transactions):
+    """Moves transactions between status buckets. Takes (business_id, timestamp, old_status, new_status, amount) tuples."""
+    changes = []
+    for business_id, timestamp, old_status, new_status, amount in transactions:
+        if rollup_status(old_status) == rollup_status(new_status):
+            continue
+        changes.append((business_id, timestamp, old_status, -1, -amount))
+        changes.append((business_id, timestamp, new_status, 1, amount))
+    apply_rollup_changes(changes)
+
+def rebuild_rollups():
+    """Recomputes every rollup row from the transaction table. Returns the number of rows written."""
+    status = db.case((Transaction.status == 'submitting', 'queued'), else_=Transaction.status)
+    day = db.func.date(Transaction.timestamp)
+    grouped = (
+        db.select(
+            Transaction.business_id,
+            day,
+            status,
+            db.func.count(Transaction.id),
+            db.func.coalesce(db.func.sum(Transaction.amount), 0)
+        )
+        .where(Transaction.timestamp != None)
+        .group_by(Transaction.business_id, day, status)
+    )
+
+    db.session.execute(db.delete(TransactionDailyRollup))
+    result = db.session.execute(
+        db.insert(TransactionDailyRollup).from_select(['business_id', 'day', 'status', 'count', 'amount'], grouped)
+    )
+    db.session.commit()
+    return result.rowcount
+
+def rollup_stats(business_id, date_from, date_to):
+    """Totals and a per-day breakdown from the rollups. `business_id=None` covers every business."""
+    query = db.select(
+        TransactionDailyRollup.day,
+        TransactionDailyRollup.status,
+        db.func.sum(TransactionDailyRollup.count),
+        db.func.sum(TransactionDailyRollup.amount)
+    ).where(TransactionDailyRollup.day >= date_from, TransactionDailyRollup.day <= date_to)
+    if business_id is not None:
+        query = query.where(TransactionDailyRollup.business_id == business_id)
+    query = query.group_by(TransactionDailyRollup.day, TransactionDailyRollup.status).order_by(TransactionDailyRollup.day)
+
+    daily = []
+    by_status = {}
+    for day, status, count, amount in db.session.execute(query):
+        if not count:
+            continue
+        daily.append({'date': day.isoformat(), 'status': status, 'count': count, 'amount': amount})
+        totals = by_status.setdefault(status, {'count': 0, 'amount': 0})
+        totals['count'] += count
+        totals['amount'] += amount
+
+    success = by_status.get('success', {'count': 0, 'amount': 0})
+    finalized = success['count'] + by_status.get('failed', {'count': 0})['count']
+    return {
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'transaction_count': sum(s['count'] for s in by_status.values()),
+        'amount_requested': sum(s['amount'] for s in by_status.values()),
+        'amount_collected': success['amount'],
+        'success_rate': round(success['count'] / finalized, 4) if finalized else None,
+        'by_status': by_status,
+        'daily': daily,
+    }
+
+def parse_stats_range(args, default_days=30):
+    """Reads date_from/date_to (YYYY-MM-DD) query parameters. Raises ValueError on bad input."""
+    today = datetime.datetime.utcnow().date()
+    date_to = datetime.date.fromisoformat(args['date_to']) if args.get('date_to') else today
+    date_from = datetime.date.fromisoformat(args['date_from']) if args.get('date_from') else date_to - datetime.timedelta(days=default_days - 1)
+    if date_from > date_to:
+        raise ValueError('date_from must not be after date_to')
+    return date_from, date_to
@@ -1,11 +1,28 @@
-from flask import Blueprint, request, jsonify, send_file, abort
+from flask import Blueprint, request, jsonify, send_file, abort, current_app, g
 from . import db, jwt
-from .models import Business, APIKeys, Transaction, Customer, AdminUser
-from .services import stk_push
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, verify_jwt_in_request
+from .models import Business, APIKeys, Transaction, Customer, AdminUser, ExportJob, RefreshToken
+from .services import stk_push, bulk_stk_push
+from .tenancy import business_required, invalidate_tenant
+from .circuit import get_breakers
+from .passwords import PasswordCheckBusy, check_password
+from .sessions import RefreshTokenInvalid, issue_tokens, revoke_family, revoke_identity, rotate
+from .ratelimit import RateLimitError, format_limit, rate_limited, validate_overrides
+from .stk_queue import enqueue_stk_push
+from .callbacks import process_stk_callback, store_callback
+from .exports import (
+    CUSTOMER_HEADERS, TRANSACTION_HEADERS, XLSX_MIMETYPE, iter_customer_rows, iter_transaction_rows,
+    admin_customer_row, admin_transaction_row, export_response
+)
+from .export_jobs import EXPORT_KINDS, EXPORT_FORMATS, create_export_job, export_job_json, export_filename
+from .profiler import query_budget
+from .pagination import paginate_transactions, add_next_page_headers, parse_business_id, PaginationError
+from .rollups import record_created, rollup_stats, parse_stats_range
+from .directory import business_directory
+from .webhooks import generate_secret, valid_webhook_url
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt, get_jwt_identity, verify_jwt_in_request
 import datetime
-import openpyxl
-from io import BytesIO
+import json
+import os
 from functools import wraps
 
 bp = Blueprint('main', __name__)
@@ -27,6 +44,11 @@ def admin_required():
         return decorator
     return wrapper
 
+def busy_response():
+    response = jsonify({'message': 'Too many login attempts in progress. Please retry shortly.'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @bp.route('/health')
 def health_check():
     return {'status': 'ok'}
@@ -59,11 +81,15 @@ def login():
     if not business:
         return jsonify({'message': 'Business not found. Please sign up.'}), 404
 
-    if not business.check_password(data['password']):
-        return jsonify({'message': 'Invalid credentials'}), 401
+    try:
+        if not check_password(business.password_hash, data['password']):
+            return jsonify({'message': 'Invalid credentials'}), 401
+    except PasswordCheckBusy:
+        return busy_response()
 
-    access_token = create_access_token(identity=f"business_{business.id}")
-    return jsonify(access_token=access_token), 200
+    access_token, refresh_token = issue_tokens(f"business_{business.id}")
+    db.session.commit()
+    return jsonify(access_token=access_token, refresh_token=refresh_token), 200
 
 @bp.route('/admin/login', methods=['POST'])
 def admin_login():
@@ -72,13 +98,37 @@ def admin_login():
         return jsonify({'message': 'Missing data'}), 400
 
     admin = AdminUser.query.filter_by(email=data['email']).first()
-    if not admin or not admin.check_password(data['password']):
-        return jsonify({'message': 'Invalid credentials'}), 401
+    try:
+        if not admin or not check_password(admin.password_hash, data['password']):
+            return jsonify({'message': 'Invalid credentials'}), 401
+    except PasswordCheckBusy:
+        return busy_response()
 
-    access_token = create_access_token(identity=f"admin_{admin.id}")
-    return jsonify(access_token=access_token), 200
+    access_token, refresh_token = issue_tokens(f"admin_{admin.id}")
+    db.session.commit()
+    return jsonify(access_token=access_token, refresh_token=refresh_token), 200
+
+@bp.route('/token/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh_session():
+    # Renews a session without checking the password again; send the refresh token as the Bearer token
+    try:
+        access_token, refresh_token = rotate(get_jwt()['jti'])
+    except RefreshTokenInvalid as e:
+        return jsonify({'message': str(e)}), 401
+    return jsonify(access_token=access_token, refresh_token=refresh_token), 200
+
+@bp.route('/logout', methods=['POST'])
+@jwt_required(refresh=True)
+def logout():
+    token = db.session.get(RefreshToken, get_jwt()['jti'])
+    if token:
+        revoke_family(token.family_id)
+        db.session.commit()
+    return jsonify({'message': 'Logged out'}), 200
 
 @bp.route('/dashboard')
+@query_budget(2)
 @jwt_required()
 def dashboard():
     identity_string = get_jwt_identity()
@@ -99,15 +149,10 @@ def dashboard():
 
 @bp.route('/settings/update', methods=['POST'])
 @jwt_required()
+@business_required('Only businesses can update settings')
 def update_settings():
-    identity_string = get_jwt_identity()
-    role, user_id_str = identity_string.split('_')
-    
-    if role != 'business':
-        return jsonify({'message': 'Only businesses can update settings'}), 403
-    
-    current_business_id = int(user_id_str)
-    business = Business.query.get(current_business_id)
+    current_business_id = g.tenant.business_id
+    business = db.session.get(Business, current_business_id)
     data = request.get_json()
 
     if not data or not 'consumer_key' in data or not 'consumer_secret' in data:
@@ -127,6 +172,7 @@ def update_settings():
 
     db.session.add(api_keys)
     db.session.commit()
+    invalidate_tenant(current_business_id)
 
     # Perform automated test STK push
     test_phone_number = "254708374149" # A test phone number from Safaricom documentation
@@ -136,23 +182,16 @@ def update_settings():
     if stk_push_result and stk_push_result.get("ResponseCode") == "0":
         business.is_active = True
         db.session.commit()
+        invalidate_tenant(current_business_id)
         return jsonify({'message': 'Settings updated and test STK push successful'}), 200
     else:
         return jsonify({'message': 'Settings updated, but test STK push failed', 'error': stk_push_result}), 200
 
 @bp.route('/settings')
 @jwt_required()
+@business_required('Only businesses can access settings')
 def get_settings():
-    identity_string = get_jwt_identity()
-    role, user_id_str = identity_string.split('_')
-
-    if role != 'business':
-        return jsonify({'message': 'Only businesses can access settings'}), 403
-        
-    current_business_id = int(user_id_str)
-    business = Business.query.get(current_business_id)
-    
-    api_keys = business.api_keys
+    api_keys = g.tenant.credentials
     if api_keys:
         return jsonify({
             'consumer_key': api_keys.consumer_key,
@@ -163,22 +202,58 @@ def get_settings():
     else:
         return jsonify({'message': 'API keys not set'}), 404
 
-@bp.route('/stk-push', methods=['POST'])
+@bp.route('/settings/webhook')
 @jwt_required()
-def send_stk_push():
-    identity_string = get_jwt_identity()
-    role, user_id_str = identity_string.split('_')
+@business_required('Only businesses can access settings')
+def get_webhook():
+    business = db.session.get(Business, g.tenant.business_id)
+    if not business.webhook_url:
+        return jsonify({'message': 'Webhook not set'}), 404
+    return jsonify({'webhook_url': business.webhook_url}), 200
+
+@bp.route('/settings/webhook', methods=['POST'])
+@jwt_required()
+@business_required('Only businesses can access settings')
+def update_webhook():
+    business = db.session.get(Business, g.tenant.business_id)
+    data = request.get_json(silent=True) or {}
+
+    if not valid_webhook_url(data.get('webhook_url')):
+        return jsonify({'message': 'webhook_url must be an https URL on a public host'}), 400
+
+    business.webhook_url = data['webhook_url']
+    # The secret is only shown when it is created or rotated
+    new_secret = not business.webhook_secret or bool(data.get('rotate_secret'))
+    if new_secret:
+        business.webhook_secret = generate_secret()
+    db.session.commit()
+
+    response = {'message': 'Webhook updated', 'webhook_url': business.webhook_url}
+    if new_secret:
+        response['webhook_secret'] = business.webhook_secret
+    return jsonify(response), 200
 
-    if role != 'business':
-        return jsonify({'message': 'Only businesses can send STK pushes'}), 403
+@bp.route('/settings/webhook', methods=['DELETE'])
+@jwt_required()
+@business_required('Only businesses can access settings')
+def delete_webhook():
+    business = db.session.get(Business, g.tenant.business_id)
+    business.webhook_url = None
+    business.webhook_secret = None
+    db.session.commit()
+    return jsonify({'message': 'Webhook removed'}), 200
 
-    current_business_id = int(user_id_str)
-    business = Business.query.get(current_business_id)
+@bp.route('/stk-push', methods=['POST'])
+@jwt_required()
+@rate_limited('stk_push')
+@business_required('Only businesses can send STK pushes')
+def send_stk_push():
+    current_business_id = g.tenant.business_id
 
-    if not business.is_active:
+    if not g.tenant.is_active:
         return jsonify({'message': 'Business account is not active. Please complete onboarding.'}), 403
     
-    if not business.api_keys:
+    if not g.tenant.credentials:
         return jsonify({'message': 'M-Pesa API keys are not configured. Please configure them in settings.'}), 400
 
     data = request.get_json()
@@ -191,7 +266,16 @@ def send_stk_push():
     account_reference = data.get('account_reference', 'Customer Payment')
     transaction_desc = data.get('transaction_desc', 'Payment for services')
 
-    stk_push_result = stk_push(phone_number, amount, business.api_keys, account_reference, transaction_desc)
+    if current_app.config.get('STK_PUSH_MODE', 'sync') == 'async':
+        # Hand the Daraja round trips to the queue worker and return straight away
+        transaction = enqueue_stk_push(current_business_id, phone_number, amount, account_reference, transaction_desc)
+        return jsonify({
+            'message': 'STK push queued',
+            'transaction_id': transaction.id,
+            'status': transaction.status
+        }), 202
+
+    stk_push_result = stk_push(phone_number, amount, g.tenant.credentials, account_reference, transaction_desc)
 
     if stk_push_result and stk_push_result.get("ResponseCode") == "0":
         # Log the transaction
@@ -199,65 +283,151 @@ def send_stk_push():
             amount=amount,
             phone_number=phone_number,
             checkout_request_id=stk_push_result['CheckoutRequestID'],
-            business_id=current_business_id
+            business_id=current_business_id,
+            timestamp=datetime.datetime.utcnow()
         )
         db.session.add(new_transaction)
+        record_created([(current_business_id, new_transaction.timestamp, 'pending', amount)])
         db.session.commit()
         return jsonify({
             'message': 'STK push sent successfully',
             'checkout_request_id': stk_push_result['CheckoutRequestID']
         }), 200
+    elif stk_push_result and stk_push_result.get('error') == 'circuit-open':
+        # Daraja is failing for this shortcode; tell the client when to come back instead of queueing up requests
+        response = jsonify({'message': 'M-Pesa is currently unavailable. Please retry later.', 'error': stk_push_result})
+        response.headers['Retry-After'] = str(stk_push_result['retry_after'])
+        return response, 503
     else:
         return jsonify({'message': 'STK push failed', 'error': stk_push_result}), 400
 
+@bp.route('/stk-push/<int:transaction_id>')
+@query_budget(3)
+@jwt_required()
+@rate_limited('stk_push_status')
+@business_required('Only businesses can view STK pushes')
+def get_stk_push_status(transaction_id):
+    transaction = Transaction.query.filter_by(id=transaction_id, business_id=g.tenant.business_id).first()
+    if not transaction:
+        return jsonify({'message': 'Transaction not found'}), 404
+
+    return jsonify({
+        'transaction_id': transaction.id,
+        'status': transaction.status,
+        'checkout_request_id': transaction.checkout_request_id,
+        'amount': transaction.amount,
+        'phone_number': transaction.phone_number,
+        'attempts': transaction.attempts,
+        'error': json.loads(transaction.error) if transaction.error else None,
+        'timestamp': transaction.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+    }), 200
+
+def validate_stk_push_item(item):
+    if not isinstance(item, dict) or 'phone_number' not in item or 'amount' not in item:
+        return 'Missing phone number or amount'
+    if not str(item['phone_number']).isdigit():
+        return 'Invalid phone number'
+    amount = item['amount']
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)) or amount <= 0:
+        return 'Invalid amount'
+    return None
+
+@bp.route('/stk-push/bulk', methods=['POST'])
+@jwt_required()
+@rate_limited('stk_push_bulk')
+@business_required('Only businesses can send STK pushes')
+def send_bulk_stk_push():
+    current_business_id = g.tenant.business_id
+
+    if not g.tenant.is_active:
+        return jsonify({'message': 'Business account is not active. Please complete onboarding.'}), 403
+
+    if not g.tenant.credentials:
+        return jsonify({'message': 'M-Pesa API keys are not configured. Please configure them in settings.'}), 400
+
+    data = request.get_json()
+    items = data.get('items') if isinstance(data, dict) else None
+
+    if not isinstance(items, list) or not items:
+        return jsonify({'message': 'Missing items'}), 400
+
+    max_items = current_app.config.get('BULK_STK_PUSH_MAX_ITEMS', 500)
+    if len(items) > max_items:
+        return jsonify({'message': f'Too many items. At most {max_items} are allowed per request.'}), 400
+
+    # Reject the whole batch before sending anything
+    errors = []
+    for index, item in enumerate(items):
+        error = validate_stk_push_item(item)
+        if error:
+            errors.append({'index': index, 'message': error})
+    if errors:
+        return jsonify({'message': 'Invalid items', 'errors': errors}), 400
+
+    stk_push_results = bulk_stk_push(items, g.tenant.credentials, current_business_id)
+
+    now = datetime.datetime.utcnow()
+    results = []
+    new_transactions = []
+    for index, (item, stk_push_result) in enumerate(zip(items, stk_push_results)):
+        result = {'index': index, 'phone_number': item['phone_number'], 'amount': item['amount']}
+        if stk_push_result and stk_push_result.get("ResponseCode") == "0":
+            result['status'] = 'sent'
+            result['checkout_request_id'] = stk_push_result['CheckoutRequestID']
+            new_transactions.append({
+                'amount': item['amount'],
+                'phone_number': item['phone_number'],
+                'checkout_request_id': stk_push_result['CheckoutRequestID'],
+                'business_id': current_business_id,
+                'timestamp': now
+            })
+        else:
+            result['status'] = 'failed'
+            result['error'] = stk_push_result
+        results.append(result)
+
+    if new_transactions:
+        # One multi-row INSERT for the whole batch
+        db.session.execute(db.insert(Transaction), new_transactions)
+        record_created((current_business_id, now, 'pending', t['amount']) for t in new_transactions)
+        db.session.commit()
+
+    return jsonify({
+        'message': 'Bulk STK push processed',
+        'sent': len(new_transactions),
+        'failed': len(results) - len(new_transactions),
+        'results': results
+    }), 200
+
 @bp.route('/callback', methods=['POST'])
 def callback():
+    if current_app.config.get('CALLBACK_PROCESSING_MODE', 'inline') == 'inbox':
+        # Ack Safaricom as soon as the raw body is stored; `flask process-callbacks` applies it
+        raw_payload = request.get_data(as_text=True)
+        if raw_payload:
+            store_callback(raw_payload)
+        return jsonify({'message': 'Callback received'}), 200
+
     data = request.get_json()
 
     if data and data.get('Body') and data['Body'].get('stkCallback'):
-        stk_callback = data['Body']['stkCallback']
-        result_code = stk_callback.get('ResultCode')
-        checkout_request_id = stk_callback.get('CheckoutRequestID')
-
-        transaction = Transaction.query.filter_by(checkout_request_id=checkout_request_id).first()
-
-        if transaction:
-            if result_code == 0:
-                transaction.status = 'success'
-                
-                # Update or create customer
-                customer = Customer.query.filter_by(phone_number=transaction.phone_number, business_id=transaction.business_id).first()
-                if not customer:
-                    customer = Customer(
-                        phone_number=transaction.phone_number,
-                        business_id=transaction.business_id
-                    )
-                    db.session.add(customer)
-                
-                customer.total_amount_requested += transaction.amount
-                customer.transaction_count += 1
-                customer.last_transaction_date = datetime.datetime.utcnow()
-                transaction.customer_id = customer.id
-
-            else:
-                transaction.status = 'failed'
-            
-            db.session.commit()
+        process_stk_callback(data['Body']['stkCallback'])
 
     return jsonify({'message': 'Callback received'}), 200
 
 @bp.route('/transactions', methods=['GET'])
+@query_budget(3)
 @jwt_required()
+@rate_limited('transactions')
+@business_required('Only businesses can view transactions')
 def get_transactions():
-    identity_string = get_jwt_identity()
-    role, user_id_str = identity_string.split('_')
-
-    if role != 'business':
-        return jsonify({'message': 'Only businesses can view transactions'}), 403
-
-    current_business_id = int(user_id_str)
+    current_business_id = g.tenant.business_id
 
-    transactions = Transaction.query.filter_by(business_id=current_business_id).order_by(Transaction.timestamp.desc()).all()
+    try:
+        transactions, next_cursor = paginate_transactions(
+            Transaction.query.filter_by(business_id=current_business_id), request.args)
+    except PaginationError as e:
+        return jsonify({'message': str(e)}), 400
 
     transaction_list = []
     for transaction in transactions:
@@ -270,18 +440,28 @@ def get_transactions():
             'timestamp': transaction.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
         })
 
-    return jsonify(transaction_list), 200
+    return add_next_page_headers(jsonify(transaction_list), next_cursor), 200
 
-@bp.route('/customers')
+@bp.route('/stats')
+@query_budget(3)
 @jwt_required()
-def get_customers():
-    identity_string = get_jwt_identity()
-    role, user_id_str = identity_string.split('_')
+@rate_limited('stats')
+@business_required('Only businesses can view stats')
+def get_stats():
+    try:
+        date_from, date_to = parse_stats_range(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
 
-    if role != 'business':
-        return jsonify({'message': 'Only businesses can have customers'}), 403
+    return jsonify(rollup_stats(g.tenant.business_id, date_from, date_to)), 200
 
-    current_business_id = int(user_id_str)
+@bp.route('/customers')
+@query_budget(3)
+@jwt_required()
+@rate_limited('customers')
+@business_required('Only businesses can have customers')
+def get_customers():
+    current_business_id = g.tenant.business_id
     customers = Customer.query.filter_by(business_id=current_business_id).all()
     
     customer_list = []
@@ -299,64 +479,112 @@ def get_customers():
 
 @bp.route('/customers/export-excel')
 @jwt_required()
+@rate_limited('exports')
+@business_required('Only businesses can export customers')
 def export_customers_excel():
-    identity_string = get_jwt_identity()
-    role, user_id_str = identity_string.split('_')
+    current_business_id = g.tenant.business_id
 
-    if role != 'business':
-        return jsonify({'message': 'Only businesses can export customers'}), 403
+    if request.args.get('background') == 'true':
+        job = create_export_job(get_jwt_identity(), current_business_id, 'customers', 'xlsx')
+        return jsonify(export_job_json(job)), 202
 
-    current_business_id = int(user_id_str)
-    customers = Customer.query.filter_by(business_id=current_business_id).all()
+    customers = Customer.query.filter_by(business_id=current_business_id)
 
-    workbook = openpyxl.Workbook()
-    sheet = workbook.active
-    sheet.title = "Customers"
+    return export_response("Customers", CUSTOMER_HEADERS, iter_customer_rows(customers), "customers")
 
-    # Add headers
-    headers = ["Name", "Phone Number", "Total Amount Requested", "Transaction Count", "First Transaction Date", "Last Transaction Date"]
-    sheet.append(headers)
+@bp.route('/transactions/export')
+@jwt_required()
+@rate_limited('exports')
+@business_required('Only businesses can export transactions')
+def export_transactions():
+    transactions = Transaction.query.filter_by(business_id=g.tenant.business_id)
+
+    return export_response("Transactions", TRANSACTION_HEADERS, iter_transaction_rows(transactions), "transactions", default_format='csv')
+
+def export_options(data):
+    """Reads kind and format from an export request. Returns (kind, format, error response)."""
+    kind = data.get('kind', 'customers')
+    export_format = data.get('format', 'xlsx')
+    if kind not in EXPORT_KINDS:
+        return None, None, (jsonify({'message': f"Invalid kind. Use one of: {', '.join(EXPORT_KINDS)}"}), 400)
+    if export_format not in EXPORT_FORMATS:
+        return None, None, (jsonify({'message': f"Invalid format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400)
+    return kind, export_format, None
+
+@bp.route('/exports', methods=['POST'])
+@jwt_required()
+def create_export():
+    role = get_jwt_identity().split('_')[0]
+    if role == 'admin':
+        return create_admin_export()
+    return create_business_export()
+
+@rate_limited('exports')
+@business_required('Only businesses and admins can create exports')
+def create_business_export():
+    kind, export_format, error = export_options(request.get_json(silent=True) or {})
+    if error:
+        return error
+    job = create_export_job(get_jwt_identity(), g.tenant.business_id, kind, export_format)
+    return jsonify(export_job_json(job)), 202
 
-    # Add data
-    for customer in customers:
-        sheet.append([
-            customer.name,
-            customer.phone_number,
-            customer.total_amount_requested,
-            customer.transaction_count,
-            customer.first_transaction_date.strftime('%Y-%m-%d %H:%M:%S') if customer.first_transaction_date else None,
-            customer.last_transaction_date.strftime('%Y-%m-%d %H:%M:%S') if customer.last_transaction_date else None
-        ])
-
-    # Save the workbook to a BytesIO object
-    excel_file = BytesIO()
-    workbook.save(excel_file)
-    excel_file.seek(0)
+@admin_required()
+def create_admin_export():
+    data = request.get_json(silent=True) or {}
+    kind, export_format, error = export_options(data)
+    if error:
+        return error
+
+    # Admins export every business unless they pick one
+    business_id = data.get('business_id')
+    if business_id is not None:
+        if not isinstance(business_id, int) or isinstance(business_id, bool):
+            return jsonify({'message': 'business_id must be an integer'}), 400
+        if db.session.get(Business, business_id) is None:
+            return jsonify({'message': 'Business not found'}), 404
+
+    job = create_export_job(get_jwt_identity(), business_id, kind, export_format)
+    return jsonify(export_job_json(job)), 202
+
+@bp.route('/exports/<job_id>')
+@jwt_required()
+def get_export(job_id):
+    job = ExportJob.query.filter_by(id=job_id, owner=get_jwt_identity()).first()
+    if not job:
+        return jsonify({'message': 'Export not found'}), 404
+    return jsonify(export_job_json(job)), 200
 
+@bp.route('/exports/<job_id>/download')
+@jwt_required()
+def download_export(job_id):
+    job = ExportJob.query.filter_by(id=job_id, owner=get_jwt_identity()).first()
+    if not job:
+        return jsonify({'message': 'Export not found'}), 404
+    if job.status != 'completed':
+        return jsonify({'message': 'Export is not ready', 'status': job.status}), 409
+    if job.expires_at < datetime.datetime.utcnow() or not os.path.exists(job.file_path):
+        return jsonify({'message': 'Export has expired'}), 410
+
+    # conditional=True adds ETag and HTTP Range support for resumable downloads
     return send_file(
-        excel_file,
+        job.file_path,
         as_attachment=True,
-        download_name="customers.xlsx",
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        download_name=export_filename(job),
+        mimetype=XLSX_MIMETYPE if job.format == 'xlsx' else 'text/csv',
+        conditional=True
     )
 
 @bp.route('/admin/businesses')
+@query_budget(3)
 @jwt_required()
 @admin_required()
 def get_all_businesses():
-    businesses = Business.query.all()
-    
-    business_list = []
-    for business in businesses:
-        business_list.append({
-            'id': business.id,
-            'phone_number': business.phone_number,
-            'email': business.email,
-            'created_at': business.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'is_active': business.is_active
-        })
+    try:
+        businesses, next_cursor = business_directory(request.args)
+    except PaginationError as e:
+        return jsonify({'message': str(e)}), 400
 
-    return jsonify(business_list), 200
+    return add_next_page_headers(jsonify(businesses), next_cursor), 200
 
 @bp.route('/admin/suspend/<int:business_id>', methods=['POST'])
 @jwt_required()
@@ -366,7 +594,9 @@ def suspend_business(business_id):
     if not business:
         return jsonify({'message': 'Business not found'}), 404
     business.is_active = False
+    revoke_identity(f"business_{business_id}")
     db.session.commit()
+    invalidate_tenant(business_id)
     return jsonify({'message': 'Business suspended successfully'}), 200
 
 @bp.route('/admin/reactivate/<int:business_id>', methods=['POST'])
@@ -378,13 +608,22 @@ def reactivate_business(business_id):
         return jsonify({'message': 'Business not found'}), 404
     business.is_active = True
     db.session.commit()
+    invalidate_tenant(business_id)
     return jsonify({'message': 'Business reactivated successfully'}), 200
 
 @bp.route('/admin/transactions')
+@query_budget(3)
 @jwt_required()
 @admin_required()
 def get_all_transactions():
-    transactions = Transaction.query.all()
+    query = Transaction.query
+    try:
+        business_id = parse_business_id(request.args)
+        if business_id is not None:
+            query = query.filter_by(business_id=business_id)
+        transactions, next_cursor = paginate_transactions(query, request.args)
+    except PaginationError as e:
+        return jsonify({'message': str(e)}), 400
     
     transaction_list = []
     for transaction in transactions:
@@ -399,7 +638,64 @@ def get_all_transactions():
             'customer_id': transaction.customer_id
         })
 
-    return jsonify(transaction_list), 200
+    return add_next_page_headers(jsonify(transaction_list), next_cursor), 200
+
+@bp.route('/admin/stats')
+@query_budget(3)
+@jwt_required()
+@admin_required()
+def get_platform_stats():
+    try:
+        date_from, date_to = parse_stats_range(request.args)
+        business_id = parse_business_id(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    return jsonify(rollup_stats(business_id, date_from, date_to)), 200
+
+@bp.route('/admin/rate-limits/<int:business_id>')
+@jwt_required()
+@admin_required()
+def get_rate_limits(business_id):
+    business = db.session.get(Business, business_id)
+    if not business:
+        return jsonify({'message': 'Business not found'}), 404
+    defaults = current_app.extensions['rate_limits']
+    overrides = json.loads(business.rate_limits) if business.rate_limits else {}
+    return jsonify({
+        'defaults': {route: format_limit(limit) for route, limit in defaults.items()},
+        'overrides': overrides
+    }), 200
+
+@bp.route('/admin/rate-limits/<int:business_id>', methods=['POST'])
+@jwt_required()
+@admin_required()
+def update_rate_limits(business_id):
+    business = db.session.get(Business, business_id)
+    if not business:
+        return jsonify({'message': 'Business not found'}), 404
+    # Merged into the existing overrides; a null value goes back to the default
+    data = request.get_json(silent=True)
+    try:
+        changes = validate_overrides(data)
+    except RateLimitError as e:
+        return jsonify({'message': str(e)}), 400
+
+    overrides = json.loads(business.rate_limits) if business.rate_limits else {}
+    for route in data:
+        overrides.pop(route, None)
+    overrides.update(changes)
+    business.rate_limits = json.dumps(overrides) if overrides else None
+    db.session.commit()
+    invalidate_tenant(business_id)
+    return jsonify({'message': 'Rate limits updated', 'overrides': overrides}), 200
+
+@bp.route('/admin/circuit-breakers')
+@jwt_required()
+@admin_required()
+def get_circuit_breakers():
+    # State of the Daraja circuit breakers in the worker process that served this request
+    return jsonify({'breakers': get_breakers().snapshot()}), 200
 
 @bp.route('/admin/impersonate/<int:business_id>', methods=['GET'])
 @jwt_required()
@@ -416,36 +712,25 @@ def impersonate_business(business_id):
 @jwt_required()
 @admin_required()
 def export_all_customers_excel():
-    customers = Customer.query.all()
-
-    workbook = openpyxl.Workbook()
-    sheet = workbook.active
-    sheet.title = "All Customers"
-
-    # Add headers
-    headers = ["Business ID", "Name", "Phone Number", "Total Amount Requested", "Transaction Count", "First Transaction Date", "Last Transaction Date"]
-    sheet.append(headers)
-
-    # Add data
-    for customer in customers:
-        sheet.append([
-            customer.business_id,
-            customer.name,
-            customer.phone_number,
-            customer.total_amount_requested,
-            customer.transaction_count,
-            customer.first_transaction_date.strftime('%Y-%m-%d %H:%M:%S') if customer.first_transaction_date else None,
-            customer.last_transaction_date.strftime('%Y-%m-%d %H:%M:%S') if customer.last_transaction_date else None
-        ])
-
-    # Save the workbook to a BytesIO object
-    excel_file = BytesIO()
-    workbook.save(excel_file)
-    excel_file.seek(0)
+    if request.args.get('background') == 'true':
+        job = create_export_job(get_jwt_identity(), None, 'customers', 'xlsx')
+        return jsonify(export_job_json(job)), 202
+
+    return export_response(
+        "All Customers",
+        ["Business ID"] + CUSTOMER_HEADERS,
+        iter_customer_rows(Customer.query, admin_customer_row),
+        "all_customers"
+    )
 
-    return send_file(
-        excel_file,
-        as_attachment=True,
-        download_name="all_customers.xlsx",
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
\ No newline at end of file
+@bp.route('/admin/transactions/export')
+@jwt_required()
+@admin_required()
+def export_all_transactions():
+    return export_response(
+        "All Transactions",
+        ["Business ID"] + TRANSACTION_HEADERS,
+        iter_transaction_rows(Transaction.query, admin_transaction_row),
+        "all_transactions",
+        default_format='csv'
+    )
@@ -2,10 +2,105 @@ import requests
 from flask import current_app
 import datetime
 import base64
+import hashlib
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib3.exceptions import NewConnectionError
+from . import transport
+from .circuit import CircuitOpenError, get_breakers
+from .metrics import TOKEN_FETCHES, observe_daraja
+from .token_cache import get_token_cache
+
+# Daraja's errorCode for an access token it no longer accepts
+INVALID_ACCESS_TOKEN = '404.001.03'
+
+# Plain copy of a business's APIKeys row, safe to hand to worker threads
+DarajaCredentials = namedtuple('DarajaCredentials', ['consumer_key', 'consumer_secret', 'till_number', 'paybill_number'])
+
+_tenant_semaphores = {}
+_tenant_semaphores_lock = threading.Lock()
+
+def snapshot_credentials(api_keys):
+    return DarajaCredentials(
+        consumer_key=api_keys.consumer_key,
+        consumer_secret=api_keys.consumer_secret,
+        till_number=api_keys.till_number,
+        paybill_number=api_keys.paybill_number
+    )
+
+# Statuses that count against the circuit breaker and may be retried
+UPSTREAM_FAILURE_STATUSES = (429, 500, 502, 503, 504)
+RETRYABLE_STATUSES = (502, 503, 504)
+
+def transport_error(exc):
+    if isinstance(exc, CircuitOpenError):
+        return {"error": "circuit-open", "text": str(exc), "retry_after": int(exc.retry_after) + 1}
+    if isinstance(exc, requests.exceptions.Timeout):
+        return {"error": "timeout", "text": str(exc)}
+    return {"error": "connection-error", "text": str(exc)}
+
+def request_not_sent(exc):
+    """True when the connection failed before any of the request reached Daraja, so resending cannot duplicate it."""
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(exc, requests.exceptions.ConnectionError) and exc.args:
+        return isinstance(getattr(exc.args[0], 'reason', None), NewConnectionError)
+    return False
+
+def daraja_request(operation, shortcode, send, idempotent=False, failure_statuses=UPSTREAM_FAILURE_STATUSES):
+    """Calls `send()` for one Daraja request through the (operation, shortcode) circuit breaker.
+
+    Idempotent calls are retried on any transport error or a 502/503/504.
+    Others are only retried when the connection was never made. Retries use
+    full jitter and stop as soon as the breaker opens. Raises CircuitOpenError
+    or the last requests exception.
+    """
+    breaker = get_breakers().get(operation, shortcode)
+    retries = current_app.config.get('DARAJA_RETRY_ATTEMPTS', 2)
+    backoff = current_app.config.get('DARAJA_RETRY_BACKOFF', 0.2)
+    attempt = 0
+    while True:
+        breaker.acquire()
+        started = time.perf_counter()
+        try:
+            response = send()
+        except requests.exceptions.RequestException as e:
+            breaker.record(time.perf_counter() - started, failed=True)
+            if attempt >= retries or not (idempotent or request_not_sent(e)):
+                raise
+        except BaseException:
+            # Not Daraja's doing, but a half-open breaker must not lose its probe slot
+            breaker.release()
+            raise
+        else:
+            breaker.record(time.perf_counter() - started, failed=response.status_code in failure_statuses)
+            if attempt >= retries or not idempotent or response.status_code not in RETRYABLE_STATUSES:
+                return response
+        attempt += 1
+        time.sleep(random.uniform(0, backoff * 2 ** attempt))
+
+def credentials_fingerprint(consumer_key):
+    # Keys the OAuth breaker per set of Daraja credentials without exposing the consumer key
+    return hashlib.sha256(consumer_key.encode()).hexdigest()[:12]
 
 def get_mpesa_access_token(consumer_key, consumer_secret):
+    started = time.perf_counter()
+    token_response = _fetch_mpesa_access_token(consumer_key, consumer_secret)
+    observe_daraja('oauth', None, started, token_response)
+    TOKEN_FETCHES.labels('success' if token_response.get('access_token') else 'error').inc()
+    return token_response
+
+def _fetch_mpesa_access_token(consumer_key, consumer_secret):
     api_url = f"{current_app.config['MPESA_API_BASE_URL']}/oauth/v1/generate?grant_type=client_credentials"
-    response = requests.get(api_url, auth=(consumer_key, consumer_secret))
+    try:
+        response = daraja_request('oauth', credentials_fingerprint(consumer_key),
+                                  lambda: transport.get(api_url, auth=(consumer_key, consumer_secret)), idempotent=True)
+    except (requests.exceptions.RequestException, CircuitOpenError) as e:
+        print(f"M-Pesa Auth Error: {e}")
+        return transport_error(e)
     if response.status_code == 200:
         return response.json()
     else:
@@ -15,10 +110,58 @@ def get_mpesa_access_token(consumer_key, consumer_secret):
         except requests.exceptions.JSONDecodeError:
             return {"error": "non-json-response", "text": response.text}
 
+def get_access_token(consumer_key, consumer_secret):
+    # Served from the token cache; only misses and near-expiry tokens hit Daraja
+    return get_token_cache().get(
+        consumer_key,
+        consumer_secret,
+        current_app.config['MPESA_API_BASE_URL'],
+        get_mpesa_access_token
+    )
+
+def token_rejected(response):
+    """True if Daraja refused the access token itself, e.g. because it was revoked before expires_in."""
+    if response.status_code == 401:
+        return True
+    if response.status_code == 200:
+        return False
+    try:
+        return response.json().get('errorCode') == INVALID_ACCESS_TOKEN
+    except (ValueError, AttributeError):
+        return False
+
+def post_with_token(operation, shortcode, business_keys, api_url, payload, **options):
+    """POSTs `payload` through daraja_request with the business's cached access token.
+
+    A rejected token is evicted and the request sent once more with a fresh
+    one; Daraja refuses such requests before acting on them, so this is safe
+    for STK pushes too. Returns (response, None), or (None, token error dict).
+    """
+    for attempt in range(2):
+        token_response = get_access_token(business_keys.consumer_key, business_keys.consumer_secret)
+        access_token = token_response.get('access_token')
+        if not access_token:
+            print(f"M-Pesa Token Generation Error: {token_response}")
+            return None, token_response
+
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json"
+        }
+        response = daraja_request(operation, shortcode, lambda: transport.post(api_url, json=payload, headers=headers), **options)
+        if attempt or not token_rejected(response):
+            return response, None
+        print(f"M-Pesa Auth Error: access token rejected for {operation}, fetching a new one")
+        get_token_cache().invalidate(business_keys.consumer_key, current_app.config['MPESA_API_BASE_URL'])
+
 def stk_push(phone_number, amount, business_keys, account_reference, transaction_desc):
-    consumer_key = business_keys.consumer_key
-    consumer_secret = business_keys.consumer_secret
-    
+    started = time.perf_counter()
+    result = _send_stk_push(phone_number, amount, business_keys, account_reference, transaction_desc)
+    # Labelled by shortcode, which identifies the tenant without a lookup
+    observe_daraja('stk_push', business_keys.paybill_number or business_keys.till_number, started, result)
+    return result
+
+def _send_stk_push(phone_number, amount, business_keys, account_reference, transaction_desc):
     if business_keys.paybill_number:
         shortcode = business_keys.paybill_number
         transaction_type = "CustomerPayBillOnline"
@@ -31,17 +174,7 @@ def stk_push(phone_number, amount, business_keys, account_reference, transaction
 
     passkey = current_app.config['MPESA_PASSKEY'] # Passkey might still be global for sandbox
 
-    token_response = get_mpesa_access_token(consumer_key, consumer_secret)
-    access_token = token_response.get('access_token')
-    if not access_token:
-        print(f"M-Pesa Token Generation Error: {token_response}")
-        return token_response # Return the full error response from token generation
-
     api_url = f"{current_app.config['MPESA_API_BASE_URL']}/mpesa/stkpush/v1/processrequest"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
 
     timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
     password = base64.b64encode(f"{shortcode}{passkey}{timestamp}".encode()).decode()
@@ -60,7 +193,13 @@ def stk_push(phone_number, amount, business_keys, account_reference, transaction
         "TransactionDesc": transaction_desc
     }
 
-    response = requests.post(api_url, json=payload, headers=headers)
+    try:
+        response, token_error = post_with_token('stk_push', shortcode, business_keys, api_url, payload)
+    except (requests.exceptions.RequestException, CircuitOpenError) as e:
+        print(f"M-Pesa API Error: {e}")
+        return transport_error(e)
+    if token_error:
+        return token_error # Return the full error response from token generation
 
     if response.status_code == 200:
         return response.json()
@@ -71,3 +210,77 @@ def stk_push(phone_number, amount, business_keys, account_reference, transaction
             return response.json()
         except requests.exceptions.JSONDecodeError:
             return {"error": "non-json-response", "text": response.text}
+
+def stk_push_query(checkout_request_id, business_keys):
+    started = time.perf_counter()
+    result = _send_stk_push_query(checkout_request_id, business_keys)
+    observe_daraja('stk_query', business_keys.paybill_number or business_keys.till_number, started, result)
+    return result
+
+def _send_stk_push_query(checkout_request_id, business_keys):
+    shortcode = business_keys.paybill_number or business_keys.till_number
+    if not shortcode:
+        return None
+
+    passkey = current_app.config['MPESA_PASSKEY']
+
+    api_url = f"{current_app.config['MPESA_API_BASE_URL']}/mpesa/stkpushquery/v1/query"
+
+    timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+    password = base64.b64encode(f"{shortcode}{passkey}{timestamp}".encode()).decode()
+
+    payload = {
+        "BusinessShortCode": shortcode,
+        "Password": password,
+        "Timestamp": timestamp,
+        "CheckoutRequestID": checkout_request_id
+    }
+
+    try:
+        # A query only reads state, so it is safe to retry. Its 500s mean "still waiting" and are not failures.
+        response, token_error = post_with_token('stk_query', shortcode, business_keys, api_url, payload,
+                                                idempotent=True, failure_statuses=(429, 502, 503, 504))
+    except (requests.exceptions.RequestException, CircuitOpenError) as e:
+        print(f"M-Pesa STK Query Error: {e}")
+        return transport_error(e)
+    if token_error:
+        return token_error
+
+    # Daraja answers 500 with an errorCode while the customer has not responded yet
+    try:
+        return response.json()
+    except requests.exceptions.JSONDecodeError:
+        print(f"M-Pesa STK Query Error: {response.text}")
+        return {"error": "non-json-response", "text": response.text}
+
+
+def _tenant_semaphore(business_id, limit):
+    # Shared by every bulk request of the same business in this process
+    with _tenant_semaphores_lock:
+        semaphore = _tenant_semaphores.get(business_id)
+        if semaphore is None:
+            semaphore = _tenant_semaphores[business_id] = threading.BoundedSemaphore(limit)
+        return semaphore
+
+def bulk_stk_push(items, business_keys, business_id):
+    """Sends one STK push per item concurrently and returns the results in item order."""
+    app = current_app._get_current_object()
+    limit = app.config.get('BULK_STK_PUSH_CONCURRENCY', 10)
+    semaphore = _tenant_semaphore(business_id, limit)
+
+    def push(item):
+        with semaphore, app.app_context():
+            try:
+                return stk_push(
+                    item['phone_number'],
+                    item['amount'],
+                    business_keys,
+                    item.get('account_reference', 'Customer Payment'),
+                    item.get('transaction_desc', 'Payment for services')
+                )
+            except Exception as e:
+                print(f"M-Pesa Bulk STK Push Error: {e}")
+                return {"error": "exception", "text": str(e)}
+
+    with ThreadPoolExecutor(max_workers=min(limit, len(items))) as executor:
+        return list(executor.map(push, items))
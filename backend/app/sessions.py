@@ -0,0 +1,85 @@
+import datetime
+import uuid
+
+from flask import current_app
+from flask_jwt_extended import create_access_token, create_refresh_token, decode_token
+
+from . import db
+from .models import RefreshToken
+
+
+class RefreshTokenInvalid(Exception):
+    pass
+
+
+def issue_tokens(identity, family_id=None):
+    """Creates an access token and a refresh token, and records the refresh token. Does not commit."""
+    family_id = family_id or uuid.uuid4().hex
+    access_token = create_access_token(identity=identity)
+    refresh_token = create_refresh_token(identity=identity)
+    claims = decode_token(refresh_token)
+    db.session.add(RefreshToken(
+        jti=claims['jti'],
+        identity=identity,
+        family_id=family_id,
+        created_at=datetime.datetime.utcnow(),
+        expires_at=datetime.datetime.utcfromtimestamp(claims['exp'])
+    ))
+    return access_token, refresh_token
+
+def rotate(jti):
+    """Exchanges the refresh token `jti` for a new pair and commits. Raises RefreshTokenInvalid.
+
+    Each refresh token works once. Presenting one that was already rotated
+    means it leaked, so the whole session (every token descended from the
+    same login) is revoked. A repeat within REFRESH_TOKEN_REUSE_GRACE seconds
+    is taken to be two tabs refreshing at once and is only rejected.
+    """
+    now = datetime.datetime.utcnow()
+    token = db.session.get(RefreshToken, jti)
+    if token is None or token.expires_at <= now:
+        raise RefreshTokenInvalid('Unknown or expired refresh token')
+
+    # Conditional UPDATE so that only one of several concurrent refreshes wins
+    claimed = db.session.execute(
+        db.update(RefreshToken)
+        .where(RefreshToken.jti == jti, RefreshToken.revoked_at == None)
+        .values(revoked_at=now)
+    ).rowcount == 1
+    if not claimed:
+        db.session.refresh(token)
+        grace = datetime.timedelta(seconds=current_app.config.get('REFRESH_TOKEN_REUSE_GRACE', 10))
+        if token.replaced_by is not None and now - token.revoked_at > grace:
+            revoke_family(token.family_id)
+            db.session.commit()
+            print(f"Refresh token reuse detected for {token.identity}, session revoked")
+        else:
+            db.session.rollback()
+        raise RefreshTokenInvalid('Refresh token has already been used or was revoked')
+
+    access_token, refresh_token = issue_tokens(token.identity, token.family_id)
+    token.replaced_by = decode_token(refresh_token)['jti']
+    db.session.commit()
+    return access_token, refresh_token
+
+def revoke_family(family_id):
+    db.session.execute(
+        db.update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at == None)
+        .values(revoked_at=datetime.datetime.utcnow())
+    )
+
+def revoke_identity(identity):
+    """Ends every session of an identity, e.g. a suspended business. Does not commit."""
+    db.session.execute(
+        db.update(RefreshToken)
+        .where(RefreshToken.identity == identity, RefreshToken.revoked_at == None)
+        .values(revoked_at=datetime.datetime.utcnow())
+    )
+
+def purge_expired_refresh_tokens():
+    purged = db.session.execute(
+        db.delete(RefreshToken).where(RefreshToken.expires_at <= datetime.datetime.utcnow())
+    ).rowcount
+    db.session.commit()
+    return purged
@@ -0,0 +1,166 @@
+import datetime
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from . import db
+from .models import Transaction
+from .rollups import record_created, record_status_changes
+from .services import stk_push
+from .tenancy import get_tenant
+
+
+def enqueue_stk_push(business_id, phone_number, amount, account_reference, transaction_desc):
+    now = datetime.datetime.utcnow()
+    transaction = Transaction(
+        amount=amount,
+        phone_number=phone_number,
+        status='queued',
+        account_reference=account_reference,
+        transaction_desc=transaction_desc,
+        attempts=0,
+        business_id=business_id,
+        timestamp=now
+    )
+    db.session.add(transaction)
+    record_created([(business_id, now, 'queued', amount)])
+    db.session.commit()
+    return transaction
+
+def claim_queued_transactions(limit):
+    """Moves up to `limit` queued transactions to 'submitting' and returns their ids.
+
+    claimed_at starts the claim's lease; see expire_stale_claims.
+
+    On Postgres, workers lock rows with FOR UPDATE SKIP LOCKED so they never wait on
+    each other. SQLite has no row locks, so each row is claimed with a conditional
+    UPDATE instead and rows another worker got to first are skipped.
+    """
+    now = datetime.datetime.utcnow()
+    query = Transaction.query.filter_by(status='queued').order_by(Transaction.id).limit(limit)
+
+    if db.engine.dialect.name == 'postgresql':
+        transactions = query.with_for_update(skip_locked=True).all()
+        for transaction in transactions:
+            transaction.status = 'submitting'
+            transaction.attempts = (transaction.attempts or 0) + 1
+            transaction.claimed_at = now
+        claimed = [transaction.id for transaction in transactions]
+    else:
+        claimed = []
+        for (transaction_id,) in query.with_entities(Transaction.id).all():
+            result = db.session.execute(
+                db.update(Transaction)
+                .where(Transaction.id == transaction_id, Transaction.status == 'queued')
+                .values(status='submitting', attempts=db.func.coalesce(Transaction.attempts, 0) + 1, claimed_at=now)
+            )
+            if result.rowcount == 1:
+                claimed.append(transaction_id)
+
+    db.session.commit()
+    return claimed
+
+def expire_stale_claims(lease_seconds):
+    """Fails pushes left in 'submitting' for longer than the lease. Returns how many.
+
+    Their worker died or hung somewhere around the Daraja call, so the push may
+    or may not have reached the customer. Sending it again could charge them
+    twice; the business can retry a failed push knowingly.
+    """
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=lease_seconds)
+    error = json.dumps({'message': 'The STK push worker stopped before Daraja answered; the push may have been sent'})
+    ids = db.select(Transaction.id).where(Transaction.status == 'submitting', Transaction.claimed_at < cutoff)
+    if db.engine.dialect.name == 'postgresql':
+        ids = ids.with_for_update(skip_locked=True)
+
+    expired = db.session.execute(
+        db.update(Transaction)
+        .where(Transaction.id.in_(ids.scalar_subquery()), Transaction.status == 'submitting')
+        .values(status='failed', error=error)
+        .returning(Transaction.business_id, Transaction.timestamp, Transaction.amount)
+    ).all()
+    # Claimed rows are still counted as queued in the rollups
+    record_status_changes((row.business_id, row.timestamp, 'queued', 'failed', row.amount) for row in expired)
+    db.session.commit()
+    return len(expired)
+
+def fail_claimed_transaction(transaction_id, error):
+    """Records a submission that raised, so the row does not stay in 'submitting'."""
+    transaction = db.session.get(Transaction, transaction_id)
+    if transaction is None or transaction.status != 'submitting':
+        return
+    transaction.status = 'failed'
+    transaction.error = json.dumps({'message': f'STK push could not be submitted: {error}'})
+    record_transition(transaction)
+    db.session.commit()
+
+def record_transition(transaction):
+    # Claimed rows are still counted as queued in the rollups
+    record_status_changes([(transaction.business_id, transaction.timestamp, 'queued', transaction.status, transaction.amount)])
+
+def submit_transaction(transaction_id):
+    transaction = db.session.get(Transaction, transaction_id)
+    tenant = get_tenant(transaction.business_id)
+
+    if not tenant.is_active or not tenant.credentials:
+        transaction.status = 'failed'
+        transaction.error = json.dumps({'message': 'Business is not active or has no M-Pesa API keys'})
+        record_transition(transaction)
+        db.session.commit()
+        return
+
+    stk_push_result = stk_push(
+        transaction.phone_number,
+        transaction.amount,
+        tenant.credentials,
+        transaction.account_reference or 'Customer Payment',
+        transaction.transaction_desc or 'Payment for services'
+    )
+
+    if stk_push_result and stk_push_result.get("ResponseCode") == "0":
+        transaction.status = 'pending'
+        transaction.checkout_request_id = stk_push_result['CheckoutRequestID']
+    else:
+        transaction.status = 'failed'
+        transaction.error = json.dumps(stk_push_result)
+    record_transition(transaction)
+    db.session.commit()
+
+def process_queued_batch(executor, batch_size):
+    """Claims one batch of queued pushes and submits them on the executor. Returns the batch size."""
+    app = current_app._get_current_object()
+    claimed = claim_queued_transactions(batch_size)
+
+    def run(transaction_id):
+        with app.app_context():
+            try:
+                submit_transaction(transaction_id)
+            except Exception as e:
+                db.session.rollback()
+                print(f"STK Push Worker Error for transaction {transaction_id}: {e}")
+                try:
+                    fail_claimed_transaction(transaction_id, e)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"STK Push Worker Error recording failure of transaction {transaction_id}: {e}")
+
+    list(executor.map(run, claimed))
+    return len(claimed)
+
+def run_worker(concurrency, batch_size, poll_interval, once=False):
+    lease_seconds = current_app.config.get('STK_PUSH_CLAIM_LEASE', 300)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            try:
+                expire_stale_claims(lease_seconds)
+                processed = process_queued_batch(executor, batch_size)
+            except Exception as e:
+                db.session.rollback()
+                print(f"STK Push Worker Error: {e}")
+                processed = 0
+            if once:
+                return processed
+            if not processed:
+                time.sleep(poll_interval)
@@ -0,0 +1,123 @@
+import json
+from dataclasses import dataclass
+from functools import wraps
+from typing import Optional
+
+from flask import abort, current_app, g, jsonify
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+from . import db
+from .cache import get_store
+from .models import Business
+from .services import DarajaCredentials, snapshot_credentials
+
+
+@dataclass(frozen=True)
+class TenantContext:
+    """Immutable snapshot of the business fields the hot paths need."""
+    business_id: int
+    is_active: bool
+    shortcode: Optional[str]
+    credentials: Optional[DarajaCredentials]
+    rate_limits: Optional[dict] = None
+
+    def to_dict(self):
+        return {
+            'business_id': self.business_id,
+            'is_active': self.is_active,
+            'shortcode': self.shortcode,
+            'credentials': self.credentials._asdict() if self.credentials else None,
+            'rate_limits': self.rate_limits,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        credentials = data['credentials']
+        return cls(
+            business_id=data['business_id'],
+            is_active=data['is_active'],
+            shortcode=data['shortcode'],
+            credentials=DarajaCredentials(**credentials) if credentials else None,
+            rate_limits=data.get('rate_limits'),
+        )
+
+
+def tenant_cache_key(business_id):
+    return f"tenant:{business_id}"
+
+def load_tenant(business_id):
+    business = db.session.execute(
+        db.select(Business).options(db.joinedload(Business.api_keys)).where(Business.id == business_id)
+    ).scalar_one_or_none()
+    if business is None:
+        return None
+
+    api_keys = business.api_keys
+    return TenantContext(
+        business_id=business.id,
+        is_active=bool(business.is_active),
+        shortcode=(api_keys.paybill_number or api_keys.till_number) if api_keys else None,
+        credentials=snapshot_credentials(api_keys) if api_keys else None,
+        rate_limits=json.loads(business.rate_limits) if business.rate_limits else None,
+    )
+
+def cache_ttl():
+    # Same default as Config.TENANT_CACHE_TTL, for apps built from a bare test config
+    return current_app.config.get('TENANT_CACHE_TTL', 5)
+
+def get_tenant(business_id):
+    """Returns the cached TenantContext for a business, loading it on a miss."""
+    ttl = cache_ttl()
+    if ttl <= 0:
+        return load_tenant(business_id)
+
+    store = get_store()
+    cached = store.get(tenant_cache_key(business_id))
+    if cached is not None:
+        return TenantContext.from_dict(cached)
+
+    tenant = load_tenant(business_id)
+    if tenant is not None:
+        store.set(tenant_cache_key(business_id), tenant.to_dict(), ttl)
+    return tenant
+
+def cached_tenant(business_id):
+    """The cached TenantContext of a business, or None on a miss. Never queries."""
+    if cache_ttl() <= 0:
+        return None
+    cached = get_store().get(tenant_cache_key(business_id))
+    return TenantContext.from_dict(cached) if cached is not None else None
+
+def identity_business_id():
+    """The business id in the verified JWT, or None for admins and malformed identities."""
+    try:
+        role, user_id_str = get_jwt_identity().split('_')
+        return int(user_id_str) if role == 'business' else None
+    except (ValueError, AttributeError):
+        return None
+
+def invalidate_tenant(business_id):
+    # Called after any write to the fields held in TenantContext
+    get_store().delete(tenant_cache_key(business_id))
+
+def business_required(message='Only businesses can access this resource'):
+    """Resolves the calling business once per request and exposes it as `g.tenant`."""
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            verify_jwt_in_request()
+            try:
+                role, user_id_str = get_jwt_identity().split('_')
+                business_id = int(user_id_str)
+            except (ValueError, AttributeError):
+                abort(403) # Forbidden
+            if role != 'business':
+                return jsonify({'message': message}), 403
+
+            tenant = get_tenant(business_id)
+            if tenant is None:
+                return jsonify({'message': 'Business not found'}), 404
+            g.tenant = tenant
+            return fn(*args, **kwargs)
+        return decorator
+    return wrapper
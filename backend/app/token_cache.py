@@ -0,0 +1,101 @@
+import hashlib
+import time
+
+from flask import current_app
+
+from .cache import MemoryStore
+
+
+class AccessTokenCache:
+    """Caches Daraja OAuth tokens per (consumer_key, API base URL).
+
+    Lookups go to an in-process LRU first and then to the shared store, if one
+    is configured. Refreshes are single-flight: concurrent callers for the same
+    key wait on one fetch instead of each doing their own OAuth handshake.
+    """
+
+    def __init__(self, shared_store=None, max_entries=256, refresh_margin=60):
+        self.local = MemoryStore(max_entries)
+        self.shared = shared_store
+        self.refresh_margin = refresh_margin
+
+    @staticmethod
+    def cache_key(consumer_key, base_url):
+        digest = hashlib.sha256(f"{consumer_key}|{base_url}".encode()).hexdigest()
+        return f"mpesa-token:{digest}"
+
+    def _fresh(self, entry):
+        return entry is not None and entry['expires_at'] - self.refresh_margin > time.time()
+
+    def _lookup(self, key):
+        entry = self.local.get(key)
+        if self._fresh(entry):
+            return entry
+        if self.shared is not None:
+            entry = self.shared.get(key)
+            if self._fresh(entry):
+                self.local.set(key, entry, entry['expires_at'] - self.refresh_margin - time.time())
+                return entry
+        return None
+
+    def get(self, consumer_key, consumer_secret, base_url, fetch):
+        """Returns a token response dict, calling `fetch` only when no fresh token is cached.
+
+        Error responses from `fetch` are returned as-is and never cached.
+        """
+        key = self.cache_key(consumer_key, base_url)
+        entry = self._lookup(key)
+        if entry:
+            return {'access_token': entry['access_token']}
+
+        with self.local.lock(key):
+            entry = self._lookup(key)
+            if entry:
+                return {'access_token': entry['access_token']}
+
+            if self.shared is None:
+                return self._refresh(key, consumer_key, consumer_secret, fetch)
+
+            with self.shared.lock(key):
+                entry = self._lookup(key)
+                if entry:
+                    return {'access_token': entry['access_token']}
+                return self._refresh(key, consumer_key, consumer_secret, fetch)
+
+    def _refresh(self, key, consumer_key, consumer_secret, fetch):
+        token_response = fetch(consumer_key, consumer_secret)
+        access_token = token_response.get('access_token')
+        if not access_token:
+            return token_response
+
+        try:
+            expires_in = int(token_response.get('expires_in', 3599))
+        except (TypeError, ValueError):
+            expires_in = 3599
+
+        entry = {'access_token': access_token, 'expires_at': time.time() + expires_in}
+        ttl = expires_in - self.refresh_margin
+        if ttl > 0:
+            self.local.set(key, entry, ttl)
+            if self.shared is not None:
+                self.shared.set(key, entry, ttl)
+        return token_response
+
+    def invalidate(self, consumer_key, base_url):
+        key = self.cache_key(consumer_key, base_url)
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+
+def init_app(app):
+    store = app.extensions.get('cache_store')
+    app.extensions['mpesa_token_cache'] = AccessTokenCache(
+        shared_store=None if isinstance(store, MemoryStore) else store,
+        max_entries=app.config.get('MPESA_TOKEN_CACHE_SIZE', 256),
+        refresh_margin=app.config.get('MPESA_TOKEN_REFRESH_MARGIN', 60),
+    )
+
+
+def get_token_cache():
+    return current_app.extensions['mpesa_token_cache']
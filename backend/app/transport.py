@@ -0,0 +1,86 @@
+import os
+import threading
+from urllib.parse import urlparse
+
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+
+# One pooled session per process and name. Sessions are created lazily on first
+# use and dropped in forked children, so gunicorn workers never share sockets
+# with the master process.
+_sessions = {}
+_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    global _lock
+    _lock = threading.Lock()
+    _sessions.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class PinnedAddressAdapter(HTTPAdapter):
+    """For requests sent to an IP address the caller has checked, with the real hostname in `Host`.
+
+    TLS still sends SNI for, and verifies the certificate against, that hostname,
+    so the connection goes to the checked address without a second DNS lookup.
+    """
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        hostname = urlparse(f"//{request.headers.get('Host', '')}").hostname
+        if host_params['scheme'] == 'https' and hostname:
+            pool_kwargs['server_hostname'] = hostname
+            pool_kwargs['assert_hostname'] = hostname
+        return host_params, pool_kwargs
+
+
+# Sessions whose callers pin the address they connect to
+PINNED_SESSIONS = ('webhooks',)
+
+
+def _build_session(pool_size, adapter_class=HTTPAdapter):
+    session = requests.Session()
+    adapter = adapter_class(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Connection'] = 'keep-alive'
+    return session
+
+
+def get_session(name='daraja'):
+    session = _sessions.get(name)
+    if session is None:
+        with _lock:
+            session = _sessions.get(name)
+            if session is None:
+                session = _build_session(
+                    current_app.config.get('MPESA_HTTP_POOL_SIZE', 10),
+                    PinnedAddressAdapter if name in PINNED_SESSIONS else HTTPAdapter,
+                )
+                _sessions[name] = session
+    return session
+
+
+def get_timeout():
+    return (
+        current_app.config.get('MPESA_HTTP_CONNECT_TIMEOUT', 5),
+        current_app.config.get('MPESA_HTTP_READ_TIMEOUT', 30),
+    )
+
+
+def request(method, url, session_name='daraja', **kwargs):
+    kwargs.setdefault('timeout', get_timeout())
+    return get_session(session_name).request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
@@ -0,0 +1,328 @@
+import datetime
+import hashlib
+import hmac
+import ipaddress
+import json
+import random
+import secrets
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from flask import current_app
+
+from . import db, transport
+from .metrics import WEBHOOK_DELIVERIES
+from .models import Business, WebhookEvent
+
+EVENT_TYPES = {
+    'success': 'transaction.success',
+    'failed': 'transaction.failed',
+    'expired': 'transaction.expired',
+}
+
+
+def generate_secret():
+    return secrets.token_hex(32)
+
+def allow_private_urls():
+    # Local development only: plain http and hosts on this machine or network
+    return current_app.config.get('WEBHOOK_ALLOW_PRIVATE_URLS', False)
+
+def public_address(address):
+    """True for addresses on the public internet, False for loopback, link-local, private and reserved ones."""
+    try:
+        ip = ipaddress.ip_address(address.split('%')[0])
+    except ValueError:
+        return False
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global
+
+def valid_webhook_url(url):
+    if not isinstance(url, str) or len(url) > 500:
+        return False
+    parsed = urlparse(url)
+    try:
+        parsed.port
+    except ValueError:
+        return False
+    host = (parsed.hostname or '').rstrip('.').lower()
+    if not host:
+        return False
+    if allow_private_urls():
+        return parsed.scheme in ('http', 'https')
+    if parsed.scheme != 'https' or host == 'localhost' or host.endswith('.localhost'):
+        return False
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return True # A hostname; its addresses are checked before each delivery
+    return public_address(host)
+
+def resolve_host(host, port):
+    return {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+
+def resolve_destination(url):
+    """Returns (address, None) with a public address to connect to, or (None, error).
+
+    The URL was validated when it was saved, but its DNS records can point
+    anywhere by the time the event is sent. The POST goes to the address
+    checked here, so the records cannot change in between either. The
+    address is None when WEBHOOK_ALLOW_PRIVATE_URLS is set.
+    """
+    if allow_private_urls():
+        return None, None
+    if not valid_webhook_url(url):
+        return None, 'Webhook URL is not allowed'
+    parsed = urlparse(url)
+    try:
+        addresses = resolve_host(parsed.hostname, parsed.port or 443)
+    except (OSError, ValueError) as e:
+        return None, f"Could not resolve {parsed.hostname}: {e}"
+    if not addresses or not all(public_address(address) for address in addresses):
+        return None, f"{parsed.hostname} resolves to a non-public address"
+    return sorted(addresses)[0], None
+
+def pinned_url(url, address):
+    """The URL with its host replaced by `address`, and the Host header to send with it."""
+    parsed = urlparse(url)
+    host = f"[{address}]" if ':' in address else address
+    port = f":{parsed.port}" if parsed.port else ''
+    host_header = parsed.netloc.rpartition('@')[2]
+    return parsed._replace(netloc=f"{host}{port}").geturl(), host_header
+
+def transaction_event_data(transaction):
+    return {
+        'id': transaction.id,
+        'status': transaction.status,
+        'amount': transaction.amount,
+        'phone_number': transaction.phone_number,
+        'checkout_request_id': transaction.checkout_request_id,
+        'timestamp': transaction.timestamp.isoformat() if transaction.timestamp else None,
+    }
+
+def enqueue_transaction_events(transactions):
+    """Adds one outbox event per finalized transaction to the current session, without committing.
+
+    `transactions` are Transaction objects or rows with the same attributes. Only
+    businesses with a webhook URL get events. Returns the number of events added.
+    """
+    transactions = [t for t in transactions if t.status in EVENT_TYPES]
+    if not transactions:
+        return 0
+
+    subscribed = set(db.session.execute(
+        db.select(Business.id).where(
+            Business.id.in_({t.business_id for t in transactions}), Business.webhook_url != None
+        )
+    ).scalars())
+    now = datetime.datetime.utcnow()
+    rows = [
+        {
+            'business_id': t.business_id,
+            'event_type': EVENT_TYPES[t.status],
+            'payload': json.dumps(transaction_event_data(t)),
+            'status': 'pending',
+            'attempts': 0,
+            'next_attempt_at': now,
+            'created_at': now,
+        }
+        for t in transactions if t.business_id in subscribed
+    ]
+    if rows:
+        db.session.execute(db.insert(WebhookEvent), rows)
+    return len(rows)
+
+def claim_due_events(limit, lease_seconds):
+    """Leases up to `limit` due events and returns their ids.
+
+    Claimed events move to 'delivering' with next_attempt_at pushed out by the
+    lease, so events held by a worker that died are picked up again once it
+    runs out. Same locking strategy as the STK push queue.
+    """
+    now = datetime.datetime.utcnow()
+    lease_until = now + datetime.timedelta(seconds=lease_seconds)
+    query = WebhookEvent.query.filter(
+        WebhookEvent.status.in_(('pending', 'delivering')), WebhookEvent.next_attempt_at <= now
+    ).order_by(WebhookEvent.id).limit(limit)
+
+    if db.engine.dialect.name == 'postgresql':
+        events = query.with_for_update(skip_locked=True).all()
+        for event in events:
+            event.status = 'delivering'
+            event.attempts = (event.attempts or 0) + 1
+            event.next_attempt_at = lease_until
+        claimed = [event.id for event in events]
+    else:
+        claimed = []
+        for (event_id,) in query.with_entities(WebhookEvent.id).all():
+            result = db.session.execute(
+                db.update(WebhookEvent)
+                .where(
+                    WebhookEvent.id == event_id,
+                    WebhookEvent.status.in_(('pending', 'delivering')),
+                    WebhookEvent.next_attempt_at <= now
+                )
+                .values(status='delivering', attempts=db.func.coalesce(WebhookEvent.attempts, 0) + 1, next_attempt_at=lease_until)
+            )
+            if result.rowcount == 1:
+                claimed.append(event_id)
+
+    db.session.commit()
+    return claimed
+
+def sign(secret, timestamp, body):
+    return hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+
+def event_json(event):
+    return {
+        'id': event.id,
+        'type': event.event_type,
+        'created_at': event.created_at.isoformat() if event.created_at else None,
+        'data': json.loads(event.payload),
+    }
+
+def backoff_seconds(attempts, base, maximum):
+    # Exponential with jitter, so a recovering endpoint is not hit by every retry at once
+    delay = min(base * 2 ** max(attempts - 1, 0), maximum)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def post_events(url, secret, events):
+    """POSTs a batch of events to one endpoint. Returns None on a 2xx, otherwise an error string."""
+    body = json.dumps({'events': [event_json(event) for event in events]}).encode()
+    timestamp = str(int(time.time()))
+    headers = {
+        'Content-Type': 'application/json',
+        'User-Agent': 'mpesaprompt-webhooks',
+        'X-Webhook-Timestamp': timestamp,
+        'X-Webhook-Signature': f"sha256={sign(secret or '', timestamp, body)}",
+    }
+    timeout = (current_app.config.get('MPESA_HTTP_CONNECT_TIMEOUT', 5), current_app.config.get('WEBHOOK_TIMEOUT', 10))
+    address, error = resolve_destination(url)
+    if error is not None:
+        return error
+    if address is not None:
+        url, headers['Host'] = pinned_url(url, address)
+    try:
+        # Redirects are not followed, they could lead to an address resolve_destination would refuse
+        response = transport.post(url, session_name='webhooks', data=body, headers=headers, timeout=timeout,
+                                  allow_redirects=False)
+    except requests.exceptions.RequestException as e:
+        return str(e) or e.__class__.__name__
+    if 200 <= response.status_code < 300:
+        return None
+    return f"HTTP {response.status_code}: {response.text[:200]}"
+
+def record_outcome(events, error, now):
+    if error is None:
+        db.session.execute(
+            db.update(WebhookEvent)
+            .where(WebhookEvent.id.in_([event.id for event in events]))
+            .values(status='delivered', delivered_at=now, last_error=None)
+        )
+        WEBHOOK_DELIVERIES.labels('delivered').inc(len(events))
+        return
+
+    max_attempts = current_app.config.get('WEBHOOK_MAX_ATTEMPTS', 8)
+    base = current_app.config.get('WEBHOOK_BACKOFF_BASE', 30)
+    maximum = current_app.config.get('WEBHOOK_BACKOFF_MAX', 6 * 60 * 60)
+    for event in events:
+        if event.attempts >= max_attempts:
+            values = {'status': 'failed', 'last_error': error}
+            WEBHOOK_DELIVERIES.labels('failed').inc()
+        else:
+            retry_at = now + datetime.timedelta(seconds=backoff_seconds(event.attempts, base, maximum))
+            values = {'status': 'pending', 'next_attempt_at': retry_at, 'last_error': error}
+            WEBHOOK_DELIVERIES.labels('retried').inc()
+        db.session.execute(db.update(WebhookEvent).where(WebhookEvent.id == event.id).values(**values))
+
+def deliver_events(event_ids, executor):
+    """Sends claimed events, grouped per endpoint and batched, and records the outcomes. Returns the number delivered."""
+    if not event_ids:
+        return 0
+    app = current_app._get_current_object()
+    batch_size = max(app.config.get('WEBHOOK_BATCH_SIZE', 1), 1)
+    concurrency = app.config.get('WEBHOOK_ENDPOINT_CONCURRENCY', 2)
+
+    rows = db.session.execute(
+        db.select(WebhookEvent, Business.webhook_url, Business.webhook_secret)
+        .join(Business, Business.id == WebhookEvent.business_id)
+        .where(WebhookEvent.id.in_(event_ids))
+        .order_by(WebhookEvent.id)
+    ).all()
+
+    endpoints = {}
+    orphaned = []
+    for event, url, secret in rows:
+        db.session.expunge(event)
+        if url:
+            endpoints.setdefault((url, secret), []).append(event)
+        else:
+            orphaned.append(event)
+    db.session.rollback()
+
+    batches = [
+        (url, secret, events[i:i + batch_size])
+        for (url, secret), events in endpoints.items()
+        for i in range(0, len(events), batch_size)
+    ]
+
+    # One per endpoint in this run, shared by its batches
+    semaphores = {url: threading.BoundedSemaphore(concurrency) for url, _ in endpoints}
+
+    def send(batch):
+        url, secret, events = batch
+        with semaphores[url], app.app_context():
+            return post_events(url, secret, events)
+
+    errors = list(executor.map(send, batches))
+
+    now = datetime.datetime.utcnow()
+    delivered = 0
+    for (url, secret, events), error in zip(batches, errors):
+        if error is not None:
+            print(f"Webhook Delivery Error for {url}: {error}")
+        else:
+            delivered += len(events)
+        record_outcome(events, error, now)
+    if orphaned:
+        # The business removed its webhook after these events were written
+        db.session.execute(
+            db.update(WebhookEvent)
+            .where(WebhookEvent.id.in_([event.id for event in orphaned]))
+            .values(status='failed', last_error='Webhook URL removed')
+        )
+    db.session.commit()
+    return delivered
+
+def process_due_events(executor, batch_size):
+    """Claims and delivers one batch of due events. Returns how many were claimed."""
+    claimed = claim_due_events(batch_size, current_app.config.get('WEBHOOK_LEASE_SECONDS', 300))
+    deliver_events(claimed, executor)
+    return len(claimed)
+
+def purge_delivered_events(older_than_seconds):
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=older_than_seconds)
+    purged = db.session.execute(
+        db.delete(WebhookEvent).where(WebhookEvent.status == 'delivered', WebhookEvent.delivered_at < cutoff)
+    ).rowcount
+    db.session.commit()
+    return purged
+
+def run_webhook_worker(concurrency, batch_size, poll_interval, once=False):
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            try:
+                processed = process_due_events(executor, batch_size)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Webhook Worker Error: {e}")
+                processed = 0
+            if once:
+                return processed
+            if processed < batch_size:
+                time.sleep(poll_interval)
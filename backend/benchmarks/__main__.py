@@ -0,0 +1,109 @@
+import json
+import os
+import sys
+import tempfile
+
+import click
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+
+@click.group()
+def cli():
+    """End-to-end benchmarks against gunicorn and the local Daraja simulator."""
+
+@cli.command()
+@click.option('--tenants', type=int, default=10, show_default=True)
+@click.option('--customers', type=int, default=100, show_default=True, help='Customers per tenant.')
+@click.option('--transactions', type=int, default=10, show_default=True, help='Transactions per customer.')
+@click.option('--pending', type=int, default=100, show_default=True, help='Pending transactions per tenant, for callbacks.')
+@click.option('--seed', type=int, default=0, show_default=True)
+@click.option('--pending-file', type=click.Path(), default=None, help='Write the pending CheckoutRequestIDs here.')
+def seed(tenants, customers, transactions, pending, seed, pending_file):
+    """Seeds the database at DATABASE_URL with a synthetic dataset."""
+    from backend.app import create_app, db
+    from backend.benchmarks.seed import seed_dataset
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        checkout_request_ids = seed_dataset(tenants, customers, transactions, pending, seed)
+
+    if pending_file:
+        with open(pending_file, 'w') as f:
+            f.write('\n'.join(checkout_request_ids))
+    click.echo(f"Seeded {tenants} tenants, {tenants * customers} customers and "
+               f"{tenants * customers * transactions + len(checkout_request_ids)} transactions.")
+
+@cli.command()
+@click.option('--tenants', type=int, default=10, show_default=True)
+@click.option('--customers', type=int, default=100, show_default=True, help='Customers per tenant.')
+@click.option('--transactions', type=int, default=10, show_default=True, help='Transactions per customer.')
+@click.option('--pending', type=int, default=100, show_default=True, help='Pending transactions per tenant, for callbacks.')
+@click.option('--seed', type=int, default=0, show_default=True)
+@click.option('--requests', 'request_count', type=int, default=500, show_default=True, help='Requests per endpoint.')
+@click.option('--export-requests', type=int, default=10, show_default=True, help='Requests per export endpoint.')
+@click.option('--concurrency', type=int, default=8, show_default=True)
+@click.option('--workers', type=int, default=2, show_default=True, help='gunicorn workers.')
+@click.option('--threads', type=int, default=4, show_default=True, help='gunicorn threads per worker.')
+@click.option('--simulator-latency', default='lognormal:80:0.4', show_default=True, help='Daraja simulator latency spec.')
+@click.option('--database-url', default=None, help='Benchmark database. Defaults to a fresh SQLite file.')
+@click.option('--only', multiple=True, help='Run only these scenarios.')
+@click.option('--output', type=click.Path(), default='benchmark-results.json', show_default=True)
+@click.option('--baseline', type=click.Path(exists=True), default=None, help='Compare against this results file.')
+@click.option('--threshold', type=float, default=0.1, show_default=True, help='Allowed regression, as a fraction.')
+def run(tenants, customers, transactions, pending, seed, request_count, export_requests, concurrency, workers, threads,
+        simulator_latency, database_url, only, output, baseline, threshold):
+    """Runs every scenario and writes the results as JSON."""
+    from backend.benchmarks.runner import run_benchmarks
+
+    with tempfile.TemporaryDirectory(prefix='mpesaprompt-bench-') as workdir:
+        results = run_benchmarks({
+            'tenants': tenants,
+            'customers': customers,
+            'transactions': transactions,
+            'pending': pending,
+            'seed': seed,
+            'requests': request_count,
+            'export_requests': export_requests,
+            'concurrency': concurrency,
+            'workers': workers,
+            'threads': threads,
+            'simulator_latency': simulator_latency,
+            'database_url': database_url,
+            'only': list(only),
+            'workdir': workdir,
+        })
+
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    click.echo(f"Results written to {output}")
+
+    if baseline:
+        sys.exit(report_regressions(results, baseline, threshold))
+
+@cli.command()
+@click.argument('current', type=click.Path(exists=True))
+@click.argument('baseline', type=click.Path(exists=True))
+@click.option('--threshold', type=float, default=0.1, show_default=True, help='Allowed regression, as a fraction.')
+def compare(current, baseline, threshold):
+    """Compares two results files. Exits with status 1 on any regression."""
+    with open(current) as f:
+        results = json.load(f)
+    sys.exit(report_regressions(results, baseline, threshold))
+
+def report_regressions(results, baseline_path, threshold):
+    from backend.benchmarks.runner import compare_results
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = compare_results(results, baseline, threshold)
+    for regression in regressions:
+        click.echo(f"REGRESSION {regression['scenario']} {regression['metric']}: "
+                   f"{regression['baseline']} -> {regression['current']}")
+    if not regressions:
+        click.echo(f"No regressions beyond {threshold:.0%} against {baseline_path}.")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    cli()
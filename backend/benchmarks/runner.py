@@ -0,0 +1,281 @@
+import contextlib
+import datetime
+import math
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .seed import PASSWORD, tenant_email
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PROJECT_DIR = os.path.dirname(BACKEND_DIR)
+
+# Metrics where a higher value is worse
+HIGHER_IS_WORSE = ('p50_ms', 'p95_ms', 'p99_ms', 'peak_rss_mb', 'error_rate')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_until_up(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{url} exited with code {process.returncode}')
+        try:
+            requests.get(url, timeout=2)
+            return
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f'{url} did not start within {timeout}s')
+
+@contextlib.contextmanager
+def running(args, env, cwd, health_url):
+    process = subprocess.Popen(args, env=env, cwd=cwd)
+    try:
+        wait_until_up(health_url, process)
+        yield process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+def process_tree(pid):
+    """The pid and all its descendants, read from /proc (Linux only)."""
+    pids = [pid]
+    for current in pids:
+        try:
+            with open(f'/proc/{current}/task/{current}/children') as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+def rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+class RssSampler:
+    """Tracks the largest RSS of any single gunicorn process while running."""
+
+    def __init__(self, pid, interval=0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stopped.is_set():
+            for pid in process_tree(self.pid):
+                rss = rss_mb(pid)
+                if rss is not None and (self.peak is None or rss > self.peak):
+                    self.peak = rss
+            self.stopped.wait(self.interval)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+
+
+def run_scenario(name, make_request, total, concurrency):
+    """Sends `total` requests from `concurrency` threads and summarizes their latencies."""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+    session.mount('http://', adapter)
+
+    def one(index):
+        started = time.perf_counter()
+        try:
+            response = make_request(session, index)
+            ok = response.status_code < 400
+            # Drain streamed bodies so the timing covers the whole response
+            for _ in response.iter_content(64 * 1024):
+                pass
+        except requests.exceptions.RequestException:
+            ok = False
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors.append(index)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(total)))
+    duration = time.perf_counter() - started
+
+    return {
+        'requests': total,
+        'errors': len(errors),
+        'error_rate': round(len(errors) / total, 4) if total else 0,
+        'throughput_rps': round(total / duration, 2) if duration else None,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+    }
+
+def callback_body(checkout_request_id):
+    return {'Body': {'stkCallback': {
+        'MerchantRequestID': 'bench',
+        'CheckoutRequestID': checkout_request_id,
+        'ResultCode': 0,
+        'ResultDesc': 'The service request is processed successfully.',
+    }}}
+
+def scenarios(base_url, tokens, pending, options):
+    """Benchmarked endpoints, in run order: name -> (request function, request count)."""
+    def auth(index):
+        return {'Authorization': f'Bearer {tokens[index % len(tokens)]}'}
+
+    return {
+        'stk_push': (
+            lambda session, i: session.post(f'{base_url}/stk-push', headers=auth(i),
+                                            json={'phone_number': f'2547{i:08d}', 'amount': 10}),
+            options['requests'],
+        ),
+        'callback': (
+            lambda session, i: session.post(f'{base_url}/callback', json=callback_body(pending[i % len(pending)] if pending else f'ws_CO_unknown_{i}')),
+            options['requests'],
+        ),
+        'transactions': (
+            lambda session, i: session.get(f'{base_url}/transactions?limit=50', headers=auth(i)),
+            options['requests'],
+        ),
+        'customers_export': (
+            lambda session, i: session.get(f'{base_url}/customers/export-excel', headers=auth(i), stream=True),
+            options['export_requests'],
+        ),
+        'transactions_export': (
+            lambda session, i: session.get(f'{base_url}/transactions/export?format=csv', headers=auth(i), stream=True),
+            options['export_requests'],
+        ),
+    }
+
+def run_benchmarks(options):
+    """Seeds a database, starts the simulator and gunicorn, and benchmarks each endpoint."""
+    workdir = options['workdir']
+    os.makedirs(workdir, exist_ok=True)
+    database_url = options['database_url'] or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    app_port, simulator_port = free_port(), free_port()
+    base_url = f'http://127.0.0.1:{app_port}'
+    simulator_url = f'http://127.0.0.1:{simulator_port}'
+
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': database_url,
+        'MPESA_API_BASE_URL': simulator_url,
+        'MPESA_CALLBACK_URL': f'{base_url}/callback',
+        'MPESA_PASSKEY': 'benchmark-passkey',
+        'EXPORT_DIR': os.path.join(workdir, 'exports'),
+        'PYTHONPATH': PROJECT_DIR,
+        'FLASK_APP': 'manage.py',
+        'DARAJA_SIM_LATENCY': options['simulator_latency'],
+        'DARAJA_SIM_SEED': str(options['seed']),
+        # A few tenants send every request, so the per-business limits would turn most of them into 429s
+        'RATE_LIMIT_ENABLED': 'false',
+    })
+    env.update(options.get('extra_env') or {})
+
+    # Seeded in a child process so the app config is read from `env`
+    pending_file = os.path.join(workdir, 'pending.txt')
+    subprocess.run([
+        sys.executable, '-m', 'backend.benchmarks', 'seed',
+        '--tenants', str(options['tenants']),
+        '--customers', str(options['customers']),
+        '--transactions', str(options['transactions']),
+        '--pending', str(options['pending']),
+        '--seed', str(options['seed']),
+        '--pending-file', pending_file,
+    ], env=env, cwd=PROJECT_DIR, check=True)
+    with open(pending_file) as f:
+        pending = f.read().split()
+
+    gunicorn = [
+        sys.executable, '-m', 'gunicorn', 'manage:app',
+        '--bind', f'127.0.0.1:{app_port}',
+        '--workers', str(options['workers']),
+        '--threads', str(options['threads']),
+        '--log-level', 'warning',
+    ]
+    simulator = [sys.executable, '-m', 'backend.simulator', '--port', str(simulator_port)]
+
+    results = {}
+    # The simulator stops first so it does not post callbacks to a stopped app
+    with running(gunicorn, env, BACKEND_DIR, f'{base_url}/health') as app_process, \
+            running(simulator, env, PROJECT_DIR, f'{simulator_url}/simulator/stats'):
+        tokens = [
+            requests.post(f'{base_url}/login', json={'email': tenant_email(i), 'password': PASSWORD}).json()['access_token']
+            for i in range(min(options['tenants'], options['concurrency']))
+        ]
+        for name, (make_request, total) in scenarios(base_url, tokens, pending, options).items():
+            if options['only'] and name not in options['only']:
+                continue
+            with RssSampler(app_process.pid) as sampler:
+                results[name] = run_scenario(name, make_request, total, options['concurrency'])
+            results[name]['peak_rss_mb'] = round(sampler.peak, 1) if sampler.peak else None
+            print(f"{name}: {results[name]['throughput_rps']} req/s, p50 {results[name]['p50_ms']}ms, "
+                  f"p95 {results[name]['p95_ms']}ms, p99 {results[name]['p99_ms']}ms, errors {results[name]['errors']}")
+
+    return {
+        'meta': {
+            'created_at': datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'database': database_url.split(':', 1)[0],
+            'options': {key: value for key, value in options.items() if key not in ('workdir', 'database_url', 'extra_env')},
+        },
+        'scenarios': results,
+    }
+
+def compare_results(current, baseline, threshold):
+    """Returns a list of regressions of `current` against `baseline`.
+
+    Latency, error rate and RSS regress when they grow by more than `threshold`
+    (a fraction), so any errors regress against an error-free baseline.
+    Throughput regresses when it drops by more than `threshold`.
+    """
+    regressions = []
+    for name, base in baseline.get('scenarios', {}).items():
+        result = current.get('scenarios', {}).get(name)
+        if result is None:
+            continue
+        for metric in HIGHER_IS_WORSE:
+            old, new = base.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            if new > old * (1 + threshold):
+                regressions.append({'scenario': name, 'metric': metric, 'baseline': old, 'current': new})
+        old, new = base.get('throughput_rps'), result.get('throughput_rps')
+        if old and new is not None and new < old * (1 - threshold):
+            regressions.append({'scenario': name, 'metric': 'throughput_rps', 'baseline': old, 'current': new})
+    return regressions
@@ -0,0 +1,104 @@
+import datetime
+import random
+
+from werkzeug.security import generate_password_hash
+
+from backend.app import db
+from backend.app.models import APIKeys, Business, Customer, Transaction
+from backend.app.rollups import rebuild_rollups
+
+PASSWORD = 'benchmark-password'
+INSERT_CHUNK_SIZE = 5000
+
+
+def tenant_email(index):
+    return f'tenant{index}@bench.local'
+
+def insert_chunked(model, rows):
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        db.session.execute(db.insert(model), rows[start:start + INSERT_CHUNK_SIZE])
+
+def seed_dataset(tenants, customers_per_tenant, transactions_per_customer, pending_per_tenant=0, seed=0):
+    """Creates active businesses with API keys, customers and transactions.
+
+    Returns the CheckoutRequestIDs of the pending transactions, for replaying
+    callbacks. Run it against an empty database.
+    """
+    rng = random.Random(seed)
+    now = datetime.datetime.utcnow()
+    password_hash = generate_password_hash(PASSWORD)
+
+    insert_chunked(Business, [
+        {'email': tenant_email(i), 'phone_number': f'2547{i:08d}', 'password_hash': password_hash, 'is_active': True, 'created_at': now}
+        for i in range(tenants)
+    ])
+    business_ids = dict(db.session.execute(
+        db.select(Business.email, Business.id).where(Business.email.like('%@bench.local'))
+    ).all())
+    business_ids = [business_ids[tenant_email(i)] for i in range(tenants)]
+
+    insert_chunked(APIKeys, [
+        {'consumer_key': f'bench_key_{i}', 'consumer_secret': f'bench_secret_{i}', 'till_number': f'{100000 + i}', 'business_id': business_id}
+        for i, business_id in enumerate(business_ids)
+    ])
+
+    customers = []
+    samples = []
+    for i, business_id in enumerate(business_ids):
+        for j in range(customers_per_tenant):
+            history = [
+                (rng.choices(['success', 'failed', 'pending'], weights=[80, 15, 5])[0],
+                 rng.randint(10, 5000),
+                 now - datetime.timedelta(seconds=rng.randint(0, 90 * 24 * 60 * 60)))
+                for _ in range(transactions_per_customer)
+            ]
+            successful = [amount for status, amount, _ in history if status == 'success']
+            customers.append({
+                'business_id': business_id,
+                'phone_number': f'2541{i:04d}{j:04d}',
+                'total_amount_requested': sum(successful),
+                'transaction_count': len(successful),
+                'first_transaction_date': now - datetime.timedelta(days=90),
+                'last_transaction_date': now,
+            })
+            samples.append(history)
+    insert_chunked(Customer, customers)
+    customer_ids = {
+        (business_id, phone_number): customer_id
+        for customer_id, business_id, phone_number in db.session.execute(
+            db.select(Customer.id, Customer.business_id, Customer.phone_number)
+        )
+    }
+
+    transactions = []
+    for customer, history in zip(customers, samples):
+        customer_id = customer_ids[(customer['business_id'], customer['phone_number'])]
+        for status, amount, timestamp in history:
+            transactions.append({
+                'business_id': customer['business_id'],
+                'phone_number': customer['phone_number'],
+                'amount': amount,
+                'status': status,
+                'checkout_request_id': f'ws_CO_bench_{len(transactions)}',
+                'timestamp': timestamp,
+                'customer_id': customer_id if status == 'success' else None,
+            })
+
+    pending = []
+    for i, business_id in enumerate(business_ids):
+        for k in range(pending_per_tenant):
+            checkout_request_id = f'ws_CO_bench_pending_{i}_{k}'
+            pending.append(checkout_request_id)
+            transactions.append({
+                'business_id': business_id,
+                'phone_number': f'2541{i:04d}{k % max(customers_per_tenant, 1):04d}',
+                'amount': rng.randint(10, 5000),
+                'status': 'pending',
+                'checkout_request_id': checkout_request_id,
+                'timestamp': now,
+                'customer_id': None,
+            })
+    insert_chunked(Transaction, transactions)
+    db.session.commit()
+    rebuild_rollups()
+    return pending
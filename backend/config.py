@@ -1,15 +1,76 @@
+import datetime
 import os
 from dotenv import load_dotenv
+from sqlalchemy.pool import NullPool
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 load_dotenv(os.path.join(basedir, '.env'))
 
+def engine_options(database_uri, pool_size, max_overflow, pool_timeout, pre_ping=True, recycle=300,
+                   statement_timeout_ms=0, connect_timeout=10, pgbouncer=False, sqlite_busy_timeout=15):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database."""
+    if database_uri.startswith('sqlite'):
+        # In-memory SQLite uses a single shared connection and takes no pool settings
+        if database_uri in ('sqlite://', 'sqlite:///:memory:'):
+            return {}
+        # Writers wait for the lock instead of failing with "database is locked"; the
+        # WAL pragmas are applied on connect by backend.app.database
+        return {'pool_size': pool_size, 'max_overflow': max_overflow, 'pool_timeout': pool_timeout,
+                'connect_args': {'timeout': sqlite_busy_timeout}}
+
+    options = {'pool_pre_ping': pre_ping, 'pool_recycle': recycle}
+    connect_args = {'connect_timeout': connect_timeout, 'application_name': 'mpesaprompt'}
+    if pgbouncer:
+        # PgBouncer in transaction mode pools the server connections itself and rejects
+        # startup parameters such as statement_timeout; set that on the database role instead
+        options['poolclass'] = NullPool
+    else:
+        options.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout)
+        if statement_timeout_ms:
+            connect_args['options'] = f'-c statement_timeout={statement_timeout_ms}'
+    options['connect_args'] = connect_args
+    return options
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'you-will-never-guess'
+    # Requests each gunicorn worker serves at once, exported by gunicorn.conf.py
+    WORKER_CONCURRENCY = int(os.environ.get('WORKER_CONCURRENCY') or 1)
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # One connection per concurrent request, capped so that many gevent workers do not exhaust
+    # Postgres; requests beyond the pool wait up to DB_POOL_TIMEOUT seconds for a connection
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or min(max(WORKER_CONCURRENCY, 5), 20))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 5)
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT') or 30)
+    # Checks connections before use and replaces them after DB_POOL_RECYCLE seconds, so connections
+    # the server dropped while idle are never handed to a request
+    DB_POOL_PRE_PING = (os.environ.get('DB_POOL_PRE_PING') or 'true').lower() == 'true'
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE') or 300)
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS') or 30000) # 0 disables it
+    DB_CONNECT_TIMEOUT = int(os.environ.get('DB_CONNECT_TIMEOUT') or 10)
+    # Set when DATABASE_URL points at PgBouncer in transaction pooling mode
+    DB_PGBOUNCER = (os.environ.get('DB_PGBOUNCER') or 'false').lower() == 'true'
+    # SQLite (development): journal_mode=WAL lets readers run while a write is in progress
+    SQLITE_WAL = (os.environ.get('SQLITE_WAL') or 'true').lower() == 'true'
+    SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT') or 15)
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(
+        SQLALCHEMY_DATABASE_URI, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+        pre_ping=DB_POOL_PRE_PING, recycle=DB_POOL_RECYCLE, statement_timeout_ms=DB_STATEMENT_TIMEOUT_MS,
+        connect_timeout=DB_CONNECT_TIMEOUT, pgbouncer=DB_PGBOUNCER, sqlite_busy_timeout=SQLITE_BUSY_TIMEOUT
+    )
+    # Logs the effective pool settings when each process starts
+    DB_POOL_REPORT = (os.environ.get('DB_POOL_REPORT') or 'true').lower() == 'true'
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'your-jwt-secret-key'
+    # Short-lived access tokens are renewed through POST /token/refresh with a single-use refresh token
+    JWT_ACCESS_TOKEN_EXPIRES = datetime.timedelta(minutes=int(os.environ.get('JWT_ACCESS_TOKEN_MINUTES') or 15))
+    JWT_REFRESH_TOKEN_EXPIRES = datetime.timedelta(days=int(os.environ.get('JWT_REFRESH_TOKEN_DAYS') or 30))
+    REFRESH_TOKEN_REUSE_GRACE = int(os.environ.get('REFRESH_TOKEN_REUSE_GRACE') or 10)
+    # Password checks run on a bounded pool and the login request waits for its own check. Logins
+    # beyond PASSWORD_HASH_MAX_PENDING wait up to PASSWORD_HASH_WAIT seconds (0: none) and then get a 503
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING') or 8)
+    PASSWORD_HASH_WAIT = float(os.environ.get('PASSWORD_HASH_WAIT') or 0)
     # M-Pesa
     MPESA_CONSUMER_KEY = os.environ.get('MPESA_CONSUMER_KEY')
     MPESA_CONSUMER_SECRET = os.environ.get('MPESA_CONSUMER_SECRET')
@@ -17,3 +78,101 @@ class Config:
     MPESA_PASSKEY = os.environ.get('MPESA_PASSKEY')
     MPESA_CALLBACK_URL = os.environ.get('MPESA_CALLBACK_URL')
     MPESA_API_BASE_URL = os.environ.get('MPESA_API_BASE_URL') or 'https://sandbox.safaricom.co.ke'
+    # Kept at least as large as the worker concurrency so no request opens a throwaway connection
+    MPESA_HTTP_POOL_SIZE = int(os.environ.get('MPESA_HTTP_POOL_SIZE') or max(WORKER_CONCURRENCY, 10))
+    MPESA_HTTP_CONNECT_TIMEOUT = float(os.environ.get('MPESA_HTTP_CONNECT_TIMEOUT') or 5)
+    MPESA_HTTP_READ_TIMEOUT = float(os.environ.get('MPESA_HTTP_READ_TIMEOUT') or 30)
+    # 'sync' sends STK pushes inside the request, 'async' queues them for `flask stk-push-worker`
+    STK_PUSH_MODE = os.environ.get('STK_PUSH_MODE') or 'sync'
+    STK_PUSH_WORKER_CONCURRENCY = int(os.environ.get('STK_PUSH_WORKER_CONCURRENCY') or 8)
+    STK_PUSH_WORKER_BATCH_SIZE = int(os.environ.get('STK_PUSH_WORKER_BATCH_SIZE') or 50)
+    STK_PUSH_WORKER_POLL_INTERVAL = float(os.environ.get('STK_PUSH_WORKER_POLL_INTERVAL') or 1)
+    # Rows left in 'submitting' this long by a worker that died are marked failed, never resent
+    STK_PUSH_CLAIM_LEASE = int(os.environ.get('STK_PUSH_CLAIM_LEASE') or 300)
+    # 'inline' (default) applies each callback inside the request. 'inbox' stores callbacks and
+    # acks immediately; only set it when a `flask process-callbacks` worker is running.
+    CALLBACK_PROCESSING_MODE = os.environ.get('CALLBACK_PROCESSING_MODE') or 'inline'
+    CALLBACK_BATCH_SIZE = int(os.environ.get('CALLBACK_BATCH_SIZE') or 500)
+    CALLBACK_POLL_INTERVAL = float(os.environ.get('CALLBACK_POLL_INTERVAL') or 0.2)
+    # A callback can overtake the commit of its CheckoutRequestID; such entries are retried every
+    # CALLBACK_UNMATCHED_RETRY_INTERVAL seconds until CALLBACK_UNMATCHED_MAX_AGE, then left to the reconciler
+    CALLBACK_UNMATCHED_RETRY_INTERVAL = float(os.environ.get('CALLBACK_UNMATCHED_RETRY_INTERVAL') or 2)
+    CALLBACK_UNMATCHED_MAX_AGE = int(os.environ.get('CALLBACK_UNMATCHED_MAX_AGE') or 600)
+    BULK_STK_PUSH_MAX_ITEMS = int(os.environ.get('BULK_STK_PUSH_MAX_ITEMS') or 500)
+    BULK_STK_PUSH_CONCURRENCY = int(os.environ.get('BULK_STK_PUSH_CONCURRENCY') or 10)
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE') or 1000)
+    EXPORT_SPOOL_MAX_SIZE = int(os.environ.get('EXPORT_SPOOL_MAX_SIZE') or 5 * 1024 * 1024)
+    EXPORT_DIR = os.environ.get('EXPORT_DIR') or os.path.join(basedir, 'exports')
+    EXPORT_TTL_SECONDS = int(os.environ.get('EXPORT_TTL_SECONDS') or 24 * 60 * 60)
+    EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS') or 2)
+    # Queued or running jobs with no progress for this long died with their gunicorn worker
+    EXPORT_STALE_SECONDS = int(os.environ.get('EXPORT_STALE_SECONDS') or 15 * 60)
+    MPESA_TOKEN_CACHE_SIZE = int(os.environ.get('MPESA_TOKEN_CACHE_SIZE') or 256)
+    MPESA_TOKEN_REFRESH_MARGIN = int(os.environ.get('MPESA_TOKEN_REFRESH_MARGIN') or 60)
+    # Shared cache (optional). Without it each gunicorn worker keeps its own cache.
+    REDIS_URL = os.environ.get('REDIS_URL')
+    # Seconds a business snapshot is cached. Settings changes, suspensions and
+    # reactivations invalidate it explicitly, but without REDIS_URL that only
+    # reaches the current process, so other workers can see the old snapshot for
+    # up to this long. Kept short for that reason; 0 disables the cache.
+    TENANT_CACHE_TTL = int(os.environ.get('TENANT_CACHE_TTL') or 5)
+    # Prometheus /metrics. Set PROMETHEUS_MULTIPROC_DIR when running several gunicorn workers.
+    METRICS_ENABLED = (os.environ.get('METRICS_ENABLED') or 'true').lower() == 'true'
+    # Tenants (by shortcode) that get their own Daraja series per process; the rest are grouped as 'other'
+    METRICS_MAX_TENANTS = int(os.environ.get('METRICS_MAX_TENANTS') or 50)
+    # When set, /metrics requires `Authorization: Bearer <token>`
+    METRICS_AUTH_TOKEN = os.environ.get('METRICS_AUTH_TOKEN')
+    # `flask process-callbacks`, `reconcile-pending`, `deliver-webhooks` and `stk-push-worker` serve
+    # their own metrics on this port when set; scrape them over the private network
+    WORKER_METRICS_PORT = int(os.environ['WORKER_METRICS_PORT']) if os.environ.get('WORKER_METRICS_PORT') else None
+    # SQL profiler (always on under TESTING). Logs requests slower than SQL_PROFILER_SLOW_REQUEST_MS
+    # or running at least SQL_PROFILER_SLOW_QUERY_COUNT queries, and routes over their @query_budget.
+    SQL_PROFILER_ENABLED = (os.environ.get('SQL_PROFILER_ENABLED') or 'false').lower() == 'true'
+    SQL_PROFILER_HEADERS = (os.environ.get('SQL_PROFILER_HEADERS') or 'false').lower() == 'true'
+    SQL_PROFILER_ENFORCE_BUDGETS = (os.environ.get('SQL_PROFILER_ENFORCE_BUDGETS') or 'false').lower() == 'true'
+    SQL_PROFILER_SLOW_REQUEST_MS = int(os.environ.get('SQL_PROFILER_SLOW_REQUEST_MS') or 1000)
+    SQL_PROFILER_SLOW_QUERY_COUNT = int(os.environ.get('SQL_PROFILER_SLOW_QUERY_COUNT') or 50)
+    SQL_PROFILER_REPEAT_THRESHOLD = int(os.environ.get('SQL_PROFILER_REPEAT_THRESHOLD') or 3)
+    # `flask reconcile-pending` queries Daraja for pushes still pending after RECONCILE_AFTER_SECONDS
+    # and expires those older than RECONCILE_EXPIRE_AFTER_SECONDS without querying them. Daraja
+    # times an STK prompt out after about a minute, so older pushes only cost query quota.
+    RECONCILE_AFTER_SECONDS = int(os.environ.get('RECONCILE_AFTER_SECONDS') or 120)
+    RECONCILE_EXPIRE_AFTER_SECONDS = int(os.environ.get('RECONCILE_EXPIRE_AFTER_SECONDS') or 10 * 60)
+    RECONCILE_BATCH_SIZE = int(os.environ.get('RECONCILE_BATCH_SIZE') or 200)
+    RECONCILE_CONCURRENCY = int(os.environ.get('RECONCILE_CONCURRENCY') or 8)
+    RECONCILE_TENANT_RATE = float(os.environ.get('RECONCILE_TENANT_RATE') or 5) # STK queries per second per business
+    RECONCILE_INTERVAL = float(os.environ.get('RECONCILE_INTERVAL') or 60)
+    # `flask deliver-webhooks` sends transaction events to each business's webhook URL.
+    # WEBHOOK_BATCH_SIZE > 1 sends several events per POST to the same endpoint.
+    WEBHOOK_CONCURRENCY = int(os.environ.get('WEBHOOK_CONCURRENCY') or 8)
+    WEBHOOK_ENDPOINT_CONCURRENCY = int(os.environ.get('WEBHOOK_ENDPOINT_CONCURRENCY') or 2)
+    WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE') or 1)
+    WEBHOOK_CLAIM_SIZE = int(os.environ.get('WEBHOOK_CLAIM_SIZE') or 200)
+    WEBHOOK_POLL_INTERVAL = float(os.environ.get('WEBHOOK_POLL_INTERVAL') or 1)
+    WEBHOOK_TIMEOUT = float(os.environ.get('WEBHOOK_TIMEOUT') or 10)
+    WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS') or 8)
+    WEBHOOK_BACKOFF_BASE = float(os.environ.get('WEBHOOK_BACKOFF_BASE') or 30)
+    WEBHOOK_BACKOFF_MAX = float(os.environ.get('WEBHOOK_BACKOFF_MAX') or 6 * 60 * 60)
+    WEBHOOK_LEASE_SECONDS = int(os.environ.get('WEBHOOK_LEASE_SECONDS') or 300)
+    # Webhook URLs must be https and resolve to public addresses. Set to true only in local
+    # development to deliver to http://localhost and other private hosts.
+    WEBHOOK_ALLOW_PRIVATE_URLS = (os.environ.get('WEBHOOK_ALLOW_PRIVATE_URLS') or 'false').lower() == 'true'
+    WEBHOOK_RETENTION_SECONDS = int(os.environ.get('WEBHOOK_RETENTION_SECONDS') or 7 * 24 * 60 * 60)
+    # Circuit breaker per Daraja endpoint and shortcode, per process. It opens when, out of at least
+    # DARAJA_BREAKER_MIN_CALLS calls in the last DARAJA_BREAKER_WINDOW seconds, the failure rate or the
+    # share of calls slower than DARAJA_BREAKER_SLOW_CALL_SECONDS reaches its threshold.
+    DARAJA_BREAKER_WINDOW = float(os.environ.get('DARAJA_BREAKER_WINDOW') or 60)
+    DARAJA_BREAKER_MIN_CALLS = int(os.environ.get('DARAJA_BREAKER_MIN_CALLS') or 10)
+    DARAJA_BREAKER_FAILURE_RATE = float(os.environ.get('DARAJA_BREAKER_FAILURE_RATE') or 0.5)
+    DARAJA_BREAKER_SLOW_CALL_SECONDS = float(os.environ.get('DARAJA_BREAKER_SLOW_CALL_SECONDS') or 10)
+    DARAJA_BREAKER_SLOW_CALL_RATE = float(os.environ.get('DARAJA_BREAKER_SLOW_CALL_RATE') or 0.8)
+    DARAJA_BREAKER_OPEN_SECONDS = float(os.environ.get('DARAJA_BREAKER_OPEN_SECONDS') or 30)
+    DARAJA_BREAKER_HALF_OPEN_PROBES = int(os.environ.get('DARAJA_BREAKER_HALF_OPEN_PROBES') or 1)
+    # Retries for token fetches, STK queries and STK pushes whose connection never opened
+    DARAJA_RETRY_ATTEMPTS = int(os.environ.get('DARAJA_RETRY_ATTEMPTS') or 2)
+    DARAJA_RETRY_BACKOFF = float(os.environ.get('DARAJA_RETRY_BACKOFF') or 0.2)
+    # Token-bucket limits per business and route, as route=<requests>/<seconds>. 'default' covers
+    # the other limited routes. Admins can override them per business. Buckets live in Redis when
+    # REDIS_URL is set, otherwise each worker keeps its own.
+    RATE_LIMIT_ENABLED = (os.environ.get('RATE_LIMIT_ENABLED') or 'true').lower() == 'true'
+    RATE_LIMITS = os.environ.get('RATE_LIMITS') or 'stk_push=60/60,stk_push_bulk=10/60,default=600/60'
@@ -0,0 +1,62 @@
+# Loaded automatically by gunicorn when started from the backend directory.
+#
+# Most of a request's life is spent waiting on Daraja, so by default each
+# worker serves several requests at once:
+#   GUNICORN_WORKER_CLASS=gthread  GUNICORN_THREADS requests per worker (default)
+#   GUNICORN_WORKER_CLASS=gevent   GUNICORN_WORKER_CONNECTIONS greenlets per worker
+#   GUNICORN_WORKER_CLASS=sync     one request per worker
+# The resulting per-worker concurrency is exported as WORKER_CONCURRENCY, which
+# Config uses to size the Daraja HTTP pool and the database pool.
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY') or 2)
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS') or 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS') or 8)
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS') or 100)
+# Above the Daraja read timeout, so slow upstream calls time out in the app first
+timeout = int(os.environ.get('GUNICORN_TIMEOUT') or 60)
+graceful_timeout = 30
+keepalive = 5
+
+
+def concurrency_per_worker(cfg):
+    if 'gevent' in cfg.worker_class_str:
+        return cfg.worker_connections
+    if cfg.worker_class_str == 'gthread' or cfg.threads > 1:
+        return cfg.threads
+    return 1
+
+
+def clear_multiproc_dir(path):
+    # Samples left by a previous run (or by `flask db upgrade`) would be added to this run's totals
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith('.db'):
+            os.remove(os.path.join(path, name))
+
+
+def on_starting(server):
+    # Runs in the master once command-line flags are applied; workers inherit the environment
+    os.environ.setdefault('WORKER_CONCURRENCY', str(concurrency_per_worker(server.cfg)))
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        clear_multiproc_dir(os.environ['PROMETHEUS_MULTIPROC_DIR'])
+
+
+def post_fork(server, worker):
+    if 'gevent' in server.cfg.worker_class_str:
+        # gunicorn monkey-patches the standard library for gevent workers, but
+        # psycopg2 is a C extension and needs its own wait callback to yield
+        try:
+            from psycogreen.gevent import patch_psycopg
+        except ImportError:
+            server.log.warning("psycogreen is not installed; Postgres queries will block gevent workers")
+        else:
+            patch_psycopg()
+
+
+def child_exit(server, worker):
+    # Drops the live gauges of workers that have exited from the /metrics totals
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
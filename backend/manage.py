@@ -6,6 +6,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from backend.app import create_app, db
 from backend.app.models import Business, APIKeys, Transaction, Customer, AdminUser
+from backend.app.database import disable_statement_timeout
+from backend.app.metrics import start_worker_metrics_server
 
 app = create_app()
 
@@ -31,5 +33,101 @@ def init_db_command():
     else:
         click.echo(f"Admin user {admin_email} already exists.")
 
+@app.cli.command("stk-push-worker")
+@click.option('--concurrency', type=int, default=None, help='Number of pushes sent in parallel.')
+@click.option('--batch-size', type=int, default=None, help='Queued pushes claimed per batch.')
+@click.option('--once', is_flag=True, help='Process a single batch and exit.')
+def stk_push_worker_command(concurrency, batch_size, once):
+    """Drains the queue of STK pushes created in async mode."""
+    from backend.app.stk_queue import run_worker
+    concurrency = concurrency or app.config['STK_PUSH_WORKER_CONCURRENCY']
+    batch_size = batch_size or app.config['STK_PUSH_WORKER_BATCH_SIZE']
+    click.echo(f"STK push worker started with concurrency {concurrency}.")
+    if not once:
+        start_worker_metrics_server(app)
+    processed = run_worker(concurrency, batch_size, app.config['STK_PUSH_WORKER_POLL_INTERVAL'], once=once)
+    if once:
+        click.echo(f"Processed {processed} queued STK pushes.")
+
+@app.cli.command("process-callbacks")
+@click.option('--batch-size', type=int, default=None, help='Inbox entries applied per commit.')
+@click.option('--once', is_flag=True, help='Process a single batch and exit.')
+def process_callbacks_command(batch_size, once):
+    """Applies M-Pesa callbacks stored in the callback inbox."""
+    from backend.app.callbacks import run_callback_processor
+    batch_size = batch_size or app.config['CALLBACK_BATCH_SIZE']
+    click.echo("Callback processor started.")
+    if not once:
+        start_worker_metrics_server(app)
+    processed = run_callback_processor(batch_size, app.config['CALLBACK_POLL_INTERVAL'], once=once)
+    if once:
+        click.echo(f"Processed {processed} callbacks.")
+
+@app.cli.command("purge-exports")
+def purge_exports_command():
+    """Deletes export files that are past their TTL."""
+    from backend.app.export_jobs import purge_expired_exports
+    disable_statement_timeout(db.engine)
+    purged = purge_expired_exports()
+    click.echo(f"Purged {purged} expired exports.")
+
+@app.cli.command("purge-refresh-tokens")
+def purge_refresh_tokens_command():
+    """Deletes refresh tokens that have expired."""
+    from backend.app.sessions import purge_expired_refresh_tokens
+    disable_statement_timeout(db.engine)
+    purged = purge_expired_refresh_tokens()
+    click.echo(f"Purged {purged} expired refresh tokens.")
+
+@app.cli.command("reconcile-pending")
+@click.option('--once', is_flag=True, help='Run a single pass and exit.')
+def reconcile_pending_command(once):
+    """Resolves STK pushes whose callback never arrived, using the STK Push Query API."""
+    from backend.app.reconcile import run_reconciler
+    click.echo("Reconciler started.")
+    if not once:
+        start_worker_metrics_server(app)
+    counts = run_reconciler(
+        app.config['RECONCILE_CONCURRENCY'],
+        app.config['RECONCILE_BATCH_SIZE'],
+        app.config['RECONCILE_AFTER_SECONDS'],
+        app.config['RECONCILE_EXPIRE_AFTER_SECONDS'],
+        app.config['RECONCILE_TENANT_RATE'],
+        app.config['RECONCILE_INTERVAL'],
+        once=once
+    )
+    if once:
+        click.echo(f"Reconciled: {counts}")
+
+@app.cli.command("deliver-webhooks")
+@click.option('--concurrency', type=int, default=None, help='Number of POSTs sent in parallel.')
+@click.option('--once', is_flag=True, help='Deliver a single batch and exit.')
+def deliver_webhooks_command(concurrency, once):
+    """Sends transaction events from the webhook outbox to business webhook URLs."""
+    from backend.app.webhooks import run_webhook_worker
+    concurrency = concurrency or app.config['WEBHOOK_CONCURRENCY']
+    click.echo(f"Webhook worker started with concurrency {concurrency}.")
+    if not once:
+        start_worker_metrics_server(app)
+    processed = run_webhook_worker(concurrency, app.config['WEBHOOK_CLAIM_SIZE'], app.config['WEBHOOK_POLL_INTERVAL'], once=once)
+    if once:
+        click.echo(f"Processed {processed} webhook events.")
+
+@app.cli.command("purge-webhook-events")
+def purge_webhook_events_command():
+    """Deletes delivered webhook events older than WEBHOOK_RETENTION_SECONDS."""
+    from backend.app.webhooks import purge_delivered_events
+    disable_statement_timeout(db.engine)
+    purged = purge_delivered_events(app.config['WEBHOOK_RETENTION_SECONDS'])
+    click.echo(f"Purged {purged} delivered webhook events.")
+
+@app.cli.command("backfill-rollups")
+def backfill_rollups_command():
+    """Rebuilds the daily transaction rollups from the transaction table."""
+    from backend.app.rollups import rebuild_rollups
+    disable_statement_timeout(db.engine)
+    written = rebuild_rollups()
+    click.echo(f"Wrote {written} rollup rows.")
+
 if __name__ == '__main__':
     app.run()
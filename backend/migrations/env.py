@@ -5,6 +5,8 @@ from flask import current_app
 
 from alembic import context
 
+from backend.app.database import disable_statement_timeout
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
@@ -95,6 +97,8 @@ def run_migrations_online():
         conf_args["process_revision_directives"] = process_revision_directives
 
     connectable = get_engine()
+    # The app's statement_timeout would cut off long index builds and backfills
+    disable_statement_timeout(connectable)
 
     with connectable.connect() as connection:
         context.configure(
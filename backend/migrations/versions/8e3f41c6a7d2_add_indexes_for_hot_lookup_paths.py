@@ -0,0 +1,69 @@
+"""Add indexes for callback and transaction listing lookups
+
+Revision ID: 8e3f41c6a7d2
+Revises: 5c1e7a9d2b40
+Create Date: 2026-10-18 10:03:48.716254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e3f41c6a7d2'
+down_revision = '5c1e7a9d2b40'
+branch_labels = None
+depends_on = None
+
+
+def merge_duplicate_customers():
+    # Concurrent callbacks could create the same customer twice. Fold duplicates
+    # into the oldest row so the unique index can be built.
+    conn = op.get_bind()
+    duplicates = conn.execute(sa.text(
+        "SELECT business_id, phone_number FROM customer "
+        "GROUP BY business_id, phone_number HAVING COUNT(*) > 1"
+    )).fetchall()
+
+    for business_id, phone_number in duplicates:
+        rows = conn.execute(sa.text(
+            "SELECT id, total_amount_requested, transaction_count, first_transaction_date, last_transaction_date "
+            "FROM customer WHERE business_id = :business_id AND phone_number = :phone_number ORDER BY id"
+        ), {'business_id': business_id, 'phone_number': phone_number}).fetchall()
+        keep_id = rows[0][0]
+        duplicate_ids = [row[0] for row in rows[1:]]
+
+        conn.execute(sa.text(
+            "UPDATE customer SET total_amount_requested = :total, transaction_count = :count, "
+            "first_transaction_date = :first, last_transaction_date = :last WHERE id = :id"
+        ), {
+            'id': keep_id,
+            'total': sum(row[1] or 0 for row in rows),
+            'count': sum(row[2] or 0 for row in rows),
+            'first': min((row[3] for row in rows if row[3] is not None), default=None),
+            'last': max((row[4] for row in rows if row[4] is not None), default=None),
+        })
+        for duplicate_id in duplicate_ids:
+            conn.execute(sa.text("UPDATE \"transaction\" SET customer_id = :keep_id WHERE customer_id = :id"),
+                         {'keep_id': keep_id, 'id': duplicate_id})
+            conn.execute(sa.text("DELETE FROM customer WHERE id = :id"), {'id': duplicate_id})
+
+
+def upgrade():
+    merge_duplicate_customers()
+
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_transaction_checkout_request_id'), ['checkout_request_id'], unique=True)
+        batch_op.create_index('ix_transaction_business_id_timestamp', ['business_id', sa.text('timestamp DESC')], unique=False)
+
+    with op.batch_alter_table('customer', schema=None) as batch_op:
+        batch_op.create_index('ix_customer_business_id_phone_number', ['business_id', 'phone_number'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('customer', schema=None) as batch_op:
+        batch_op.drop_index('ix_customer_business_id_phone_number')
+
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.drop_index('ix_transaction_business_id_timestamp')
+        batch_op.drop_index(batch_op.f('ix_transaction_checkout_request_id'))
@@ -0,0 +1,26 @@
+"""Add (timestamp, id) index for admin transaction pagination
+
+Revision ID: c47b90e1f3a8
+Revises: 8e3f41c6a7d2
+Create Date: 2026-10-18 11:26:05.337190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47b90e1f3a8'
+down_revision = '8e3f41c6a7d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.create_index('ix_transaction_timestamp_id', [sa.text('timestamp DESC'), sa.text('id DESC')], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.drop_index('ix_transaction_timestamp_id')
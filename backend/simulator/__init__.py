@@ -0,0 +1 @@
+from .daraja import create_simulator, SimulatorConfig
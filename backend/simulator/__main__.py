@@ -0,0 +1,21 @@
+import os
+import sys
+
+import click
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.simulator import create_simulator
+
+
+@click.command()
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--port', type=int, default=8090, show_default=True)
+def main(host, port):
+    """Runs the local Daraja simulator. Configure it with the DARAJA_SIM_* environment variables."""
+    app = create_simulator()
+    click.echo(f"Daraja simulator listening on http://{host}:{port}")
+    app.run(host=host, port=port, threaded=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+import datetime
+import heapq
+import itertools
+import os
+import random
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from flask import Flask, current_app, jsonify, request
+
+# Result codes Daraja sends in stkCallback, with the descriptions it uses
+RESULT_DESCRIPTIONS = {
+    0: 'The service request is processed successfully.',
+    1: 'The balance is insufficient for the transaction.',
+    1032: 'Request cancelled by user',
+    1037: 'DS timeout user cannot be reached',
+    2001: 'The initiator information is invalid.',
+}
+
+
+class SimulatorConfig:
+    # Latencies are distributions in milliseconds: "fixed:50", "uniform:20:80",
+    # "normal:50:15" or "lognormal:<median>:<sigma>"
+    DARAJA_SIM_LATENCY = os.environ.get('DARAJA_SIM_LATENCY') or 'fixed:0'
+    DARAJA_SIM_OAUTH_LATENCY = os.environ.get('DARAJA_SIM_OAUTH_LATENCY')
+    DARAJA_SIM_STK_LATENCY = os.environ.get('DARAJA_SIM_STK_LATENCY')
+    DARAJA_SIM_QUERY_LATENCY = os.environ.get('DARAJA_SIM_QUERY_LATENCY')
+    # Share of requests answered with a 500 error
+    DARAJA_SIM_ERROR_RATE = float(os.environ.get('DARAJA_SIM_ERROR_RATE') or 0)
+    # Requests per second accepted across all clients before answering 429; 0 disables throttling
+    DARAJA_SIM_RATE_LIMIT = float(os.environ.get('DARAJA_SIM_RATE_LIMIT') or 0)
+    DARAJA_SIM_TOKEN_TTL = int(os.environ.get('DARAJA_SIM_TOKEN_TTL') or 3599)
+    # Delay before the stkCallback is POSTed back, as a latency distribution
+    DARAJA_SIM_CALLBACK_DELAY = os.environ.get('DARAJA_SIM_CALLBACK_DELAY') or 'uniform:1000:3000'
+    # Sends callbacks here instead of the CallBackURL in each request
+    DARAJA_SIM_CALLBACK_URL = os.environ.get('DARAJA_SIM_CALLBACK_URL')
+    # Weighted result codes for callbacks, e.g. "0:0.8,1032:0.15,1037:0.05"
+    DARAJA_SIM_RESULT_CODES = os.environ.get('DARAJA_SIM_RESULT_CODES') or '0:0.85,1032:0.1,1037:0.05'
+    DARAJA_SIM_CALLBACK_WORKERS = int(os.environ.get('DARAJA_SIM_CALLBACK_WORKERS') or 16)
+    DARAJA_SIM_MAX_REQUESTS = int(os.environ.get('DARAJA_SIM_MAX_REQUESTS') or 100000)
+    DARAJA_SIM_SEED = os.environ.get('DARAJA_SIM_SEED')
+
+
+def parse_latency(spec):
+    """Turns a latency spec into a function returning a delay in seconds."""
+    kind, *params = str(spec).split(':')
+    try:
+        params = [float(param) for param in params]
+    except ValueError:
+        raise ValueError(f'Invalid latency spec: {spec}')
+
+    if kind == 'fixed' and len(params) == 1:
+        return lambda rng: params[0] / 1000
+    if kind == 'uniform' and len(params) == 2:
+        return lambda rng: rng.uniform(*params) / 1000
+    if kind == 'normal' and len(params) == 2:
+        return lambda rng: max(rng.gauss(*params), 0) / 1000
+    if kind == 'lognormal' and len(params) == 2:
+        median, sigma = params
+        return lambda rng: median * rng.lognormvariate(0, sigma) / 1000
+    raise ValueError(f'Invalid latency spec: {spec}')
+
+def parse_result_codes(spec):
+    """Parses "code:weight,..." into (codes, weights)."""
+    codes, weights = [], []
+    for part in str(spec).split(','):
+        code, weight = part.split(':')
+        codes.append(int(code))
+        weights.append(float(weight))
+    return codes, weights
+
+
+class RateLimiter:
+    """Token bucket shared by all clients, like Daraja's per-app throttling."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self):
+        if not self.rate:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class CallbackScheduler:
+    """POSTs callbacks once their delay has passed, from one timer thread and a small pool."""
+
+    def __init__(self, workers):
+        self.queue = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.session = requests.Session()
+        self.sent = 0
+        self.failed = 0
+        self.counts_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def schedule(self, delay, url, payload, on_sent=None):
+        with self.condition:
+            heapq.heappush(self.queue, (time.monotonic() + delay, next(self.counter), url, payload, on_sent))
+            self.condition.notify()
+
+    def pending(self):
+        with self.condition:
+            return len(self.queue)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.queue or self.queue[0][0] > time.monotonic():
+                    timeout = self.queue[0][0] - time.monotonic() if self.queue else None
+                    self.condition.wait(timeout)
+                _, _, url, payload, on_sent = heapq.heappop(self.queue)
+            self.executor.submit(self._post, url, payload, on_sent)
+
+    def _post(self, url, payload, on_sent):
+        try:
+            self.session.post(url, json=payload, timeout=10).raise_for_status()
+            with self.counts_lock:
+                self.sent += 1
+        except requests.exceptions.RequestException as e:
+            with self.counts_lock:
+                self.failed += 1
+            print(f"Daraja Simulator Callback Error: {e}")
+        if on_sent:
+            on_sent()
+
+
+class DarajaSimulator:
+    """State shared by the simulator's request handlers."""
+
+    def __init__(self, config):
+        seed = config.get('DARAJA_SIM_SEED')
+        self.rng = random.Random(int(seed) if seed else None)
+        self.rng_lock = threading.Lock()
+        default_latency = config.get('DARAJA_SIM_LATENCY', 'fixed:0')
+        self.latency = {
+            'oauth': parse_latency(config.get('DARAJA_SIM_OAUTH_LATENCY') or default_latency),
+            'stk': parse_latency(config.get('DARAJA_SIM_STK_LATENCY') or default_latency),
+            'query': parse_latency(config.get('DARAJA_SIM_QUERY_LATENCY') or default_latency),
+        }
+        self.callback_delay = parse_latency(config.get('DARAJA_SIM_CALLBACK_DELAY', 'uniform:1000:3000'))
+        self.result_codes = parse_result_codes(config.get('DARAJA_SIM_RESULT_CODES', '0:0.85,1032:0.1,1037:0.05'))
+        self.error_rate = float(config.get('DARAJA_SIM_ERROR_RATE', 0))
+        self.token_ttl = int(config.get('DARAJA_SIM_TOKEN_TTL', 3599))
+        self.callback_url = config.get('DARAJA_SIM_CALLBACK_URL')
+        self.max_requests = int(config.get('DARAJA_SIM_MAX_REQUESTS', 100000))
+        self.limiter = RateLimiter(float(config.get('DARAJA_SIM_RATE_LIMIT', 0)))
+        self.callbacks = CallbackScheduler(int(config.get('DARAJA_SIM_CALLBACK_WORKERS', 16)))
+        self.tokens = set()
+        # CheckoutRequestID -> request state, oldest evicted first
+        self.requests = OrderedDict()
+        self.lock = threading.Lock()
+        self.counts = {'oauth': 0, 'stk': 0, 'query': 0, 'errors': 0, 'throttled': 0}
+
+    def sample(self, fn):
+        with self.rng_lock:
+            return fn(self.rng)
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counts)
+        stats['callbacks_sent'] = self.callbacks.sent
+        stats['callbacks_failed'] = self.callbacks.failed
+        stats['callbacks_pending'] = self.callbacks.pending()
+        return stats
+
+    def remember(self, checkout_request_id, state):
+        with self.lock:
+            self.requests[checkout_request_id] = state
+            while len(self.requests) > self.max_requests:
+                self.requests.popitem(last=False)
+
+    def lookup(self, checkout_request_id):
+        with self.lock:
+            return self.requests.get(checkout_request_id)
+
+
+def get_simulator():
+    return current_app.extensions['daraja_simulator']
+
+def daraja_error(status_code, error_code, message):
+    return jsonify({
+        'requestId': secrets.token_hex(8),
+        'errorCode': error_code,
+        'errorMessage': message,
+    }), status_code
+
+def simulate(kind):
+    """Applies latency, throttling and injected errors. Returns an error response or None."""
+    simulator = get_simulator()
+    simulator.count(kind)
+    time.sleep(simulator.sample(simulator.latency[kind]))
+
+    if not simulator.limiter.allow():
+        simulator.count('throttled')
+        return daraja_error(429, '429.001.01', 'Too many requests')
+    if simulator.error_rate and simulator.sample(lambda rng: rng.random()) < simulator.error_rate:
+        simulator.count('errors')
+        return daraja_error(500, '500.001.1001', 'Unable to lock subscriber, a transaction is already in process for the current subscriber')
+    return None
+
+def bearer_token_error():
+    simulator = get_simulator()
+    header = request.headers.get('Authorization', '')
+    token = header[len('Bearer '):] if header.startswith('Bearer ') else None
+    if token not in simulator.tokens:
+        return daraja_error(401, '404.001.03', 'Invalid Access Token')
+    return None
+
+def callback_payload(state, result_code):
+    stk_callback = {
+        'MerchantRequestID': state['merchant_request_id'],
+        'CheckoutRequestID': state['checkout_request_id'],
+        'ResultCode': result_code,
+        'ResultDesc': RESULT_DESCRIPTIONS.get(result_code, 'The transaction failed.'),
+    }
+    if result_code == 0:
+        stk_callback['CallbackMetadata'] = {'Item': [
+            {'Name': 'Amount', 'Value': state['amount']},
+            {'Name': 'MpesaReceiptNumber', 'Value': secrets.token_hex(5).upper()},
+            {'Name': 'TransactionDate', 'Value': int(datetime.datetime.now().strftime('%Y%m%d%H%M%S'))},
+            {'Name': 'PhoneNumber', 'Value': int(state['phone_number'])},
+        ]}
+    return {'Body': {'stkCallback': stk_callback}}
+
+
+def oauth_generate():
+    error = simulate('oauth')
+    if error:
+        return error
+
+    auth = request.authorization
+    if request.args.get('grant_type') != 'client_credentials' or not auth or not auth.username:
+        return daraja_error(400, '400.008.01', 'Invalid Authentication passed')
+
+    simulator = get_simulator()
+    token = secrets.token_urlsafe(21)
+    with simulator.lock:
+        simulator.tokens.add(token)
+    return jsonify({'access_token': token, 'expires_in': str(simulator.token_ttl)})
+
+def stk_push_process_request():
+    error = simulate('stk') or bearer_token_error()
+    if error:
+        return error
+
+    data = request.get_json(silent=True) or {}
+    for field in ('BusinessShortCode', 'Password', 'Timestamp', 'TransactionType', 'Amount', 'PhoneNumber', 'CallBackURL'):
+        if not data.get(field):
+            return daraja_error(400, '400.002.02', f'Bad Request - Invalid {field}')
+    if not str(data['PhoneNumber']).isdigit():
+        return daraja_error(400, '400.002.02', 'Bad Request - Invalid PhoneNumber')
+
+    simulator = get_simulator()
+    checkout_request_id = f"ws_CO_{datetime.datetime.now().strftime('%d%m%Y%H%M%S')}{secrets.token_hex(6)}"
+    result_code = simulator.sample(lambda rng: rng.choices(*simulator.result_codes)[0])
+    state = {
+        'merchant_request_id': f"{simulator.sample(lambda rng: rng.randint(10000, 99999))}-{secrets.token_hex(4)}-1",
+        'checkout_request_id': checkout_request_id,
+        'amount': data['Amount'],
+        'phone_number': str(data['PhoneNumber']),
+        'result_code': result_code,
+        'completed': False,
+    }
+    simulator.remember(checkout_request_id, state)
+
+    def completed():
+        state['completed'] = True
+
+    simulator.callbacks.schedule(
+        simulator.sample(simulator.callback_delay),
+        simulator.callback_url or data['CallBackURL'],
+        callback_payload(state, result_code),
+        on_sent=completed
+    )
+
+    return jsonify({
+        'MerchantRequestID': state['merchant_request_id'],
+        'CheckoutRequestID': checkout_request_id,
+        'ResponseCode': '0',
+        'ResponseDescription': 'Success. Request accepted for processing',
+        'CustomerMessage': 'Success. Request accepted for processing',
+    })
+
+def stk_push_query():
+    error = simulate('query') or bearer_token_error()
+    if error:
+        return error
+
+    data = request.get_json(silent=True) or {}
+    state = get_simulator().lookup(data.get('CheckoutRequestID'))
+    if state is None:
+        return daraja_error(500, '500.001.1001', 'The transaction could not be found')
+    if not state['completed']:
+        return daraja_error(500, '500.001.1001', 'The transaction is being processed')
+
+    return jsonify({
+        'ResponseCode': '0',
+        'ResponseDescription': 'The service request has been accepted successsfully',
+        'MerchantRequestID': state['merchant_request_id'],
+        'CheckoutRequestID': state['checkout_request_id'],
+        'ResultCode': str(state['result_code']),
+        'ResultDesc': RESULT_DESCRIPTIONS.get(state['result_code'], 'The transaction failed.'),
+    })
+
+def simulator_stats():
+    return jsonify(get_simulator().stats())
+
+
+def create_simulator(test_config=None):
+    app = Flask(__name__)
+    if test_config is None:
+        app.config.from_object(SimulatorConfig)
+    else:
+        app.config.from_mapping(test_config)
+
+    app.extensions['daraja_simulator'] = DarajaSimulator(app.config)
+    app.add_url_rule('/oauth/v1/generate', view_func=oauth_generate, methods=['GET'])
+    app.add_url_rule('/mpesa/stkpush/v1/processrequest', view_func=stk_push_process_request, methods=['POST'])
+    app.add_url_rule('/mpesa/stkpushquery/v1/query', view_func=stk_push_query, methods=['POST'])
+    app.add_url_rule('/simulator/stats', view_func=simulator_stats, methods=['GET'])
+    return app
@@ -8,8 +8,40 @@ import pytest
 from backend.app import create_app, db
 from backend.app.models import Business, AdminUser, APIKeys, Transaction, Customer, Wallet, CommissionLedger
 from werkzeug.security import generate_password_hash
+import datetime
 
 
+# Shared helpers; test modules import them with `from conftest import ...`
+
+def add_pending(business_id, checkout_request_id, amount=10, phone_number='254712345678', age_seconds=0):
+    """Commits a pending transaction created `age_seconds` ago and returns its id."""
+    timestamp = datetime.datetime.utcnow() - datetime.timedelta(seconds=age_seconds)
+    transaction = Transaction(amount=amount, phone_number=phone_number, checkout_request_id=checkout_request_id,
+                              business_id=business_id, timestamp=timestamp)
+    db.session.add(transaction)
+    db.session.commit()
+    return transaction.id
+
+def callback_payload(checkout_request_id, result_code=0):
+    return {
+        "Body": {
+            "stkCallback": {
+                "MerchantRequestID": "29199-633004-1",
+                "CheckoutRequestID": checkout_request_id,
+                "ResultCode": result_code,
+                "ResultDesc": "The service request is processed successfully." if result_code == 0 else "Request cancelled by user",
+            }
+        }
+    }
+
+def stk_push_success(phone_number, amount, business_keys, account_reference, transaction_desc):
+    """Stands in for services.stk_push; the CheckoutRequestID is derived from the phone number."""
+    return {
+        "ResponseCode": "0",
+        "CheckoutRequestID": f"ws_CO_{phone_number}",
+        "CustomerMessage": "Success. Request accepted for processing"
+    }
+
 @pytest.fixture(scope='function')
 def app():
     # Use a test configuration
@@ -88,3 +120,28 @@ def new_business_with_keys(app):
         db.session.add(api_keys)
         db.session.commit()
         return business
+
+@pytest.fixture(scope='function')
+def active_business(app):
+    with app.app_context():
+        business = Business(phone_number='254700000000', email='active@business.com', is_active=True)
+        business.set_password('password')
+        db.session.add(business)
+        db.session.commit()
+
+        api_keys = APIKeys(
+            consumer_key='active_consumer_key',
+            consumer_secret='active_consumer_secret',
+            till_number='54321',
+            business_id=business.id
+        )
+        db.session.add(api_keys)
+        db.session.commit()
+        return business.id
+
+@pytest.fixture(scope='function')
+def business_headers(app, active_business):
+    from flask_jwt_extended import create_access_token
+    with app.app_context():
+        access_token = create_access_token(identity=f"business_{active_business}")
+    return {'Authorization': f'Bearer {access_token}'}
@@ -0,0 +1,42 @@
+from backend.app.models import Business, Customer, Transaction, TransactionDailyRollup
+from backend.benchmarks.runner import compare_results, percentile
+from backend.benchmarks.seed import seed_dataset
+
+
+def test_seed_dataset(app):
+    pending = seed_dataset(tenants=2, customers_per_tenant=3, transactions_per_customer=4, pending_per_tenant=5)
+
+    assert Business.query.count() == 2
+    assert Customer.query.count() == 6
+    assert Transaction.query.count() == 2 * 3 * 4 + 10
+    assert len(pending) == 10
+    assert Transaction.query.filter(Transaction.checkout_request_id.in_(pending)).filter_by(status='pending').count() == 10
+    for customer in Customer.query.all():
+        successful = [t for t in customer.transactions if t.status == 'success']
+        assert customer.transaction_count == len(successful)
+    assert sum(r.count for r in TransactionDailyRollup.query.all()) == Transaction.query.count()
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) is None
+
+def test_compare_results_flags_regressions():
+    baseline = {'scenarios': {
+        'stk_push': {'p95_ms': 100, 'p99_ms': 150, 'throughput_rps': 50, 'error_rate': 0, 'peak_rss_mb': 80},
+        'callback': {'p95_ms': 10, 'throughput_rps': 500},
+    }}
+    current = {'scenarios': {
+        'stk_push': {'p95_ms': 105, 'p99_ms': 200, 'throughput_rps': 40, 'error_rate': 0.02, 'peak_rss_mb': 82},
+        'callback': {'p95_ms': 9, 'throughput_rps': 520},
+    }}
+
+    regressions = compare_results(current, baseline, threshold=0.1)
+
+    assert {(r['scenario'], r['metric']) for r in regressions} == {
+        ('stk_push', 'p99_ms'), ('stk_push', 'throughput_rps'), ('stk_push', 'error_rate'),
+    }
+    assert compare_results(baseline, baseline, threshold=0.1) == []
@@ -0,0 +1,139 @@
+import pytest
+
+from backend.app import db
+from backend.app.callbacks import process_callback_inbox
+from backend.app.models import Transaction, Customer, ProcessedCallback, CallbackInbox
+from conftest import add_pending, callback_payload
+
+
+@pytest.fixture(autouse=True)
+def inbox_mode(app):
+    # These tests cover the inbox; inline is the default
+    app.config['CALLBACK_PROCESSING_MODE'] = 'inbox'
+
+def deliver(client, payload):
+    response = client.post('/callback', json=payload)
+    process_callback_inbox()
+    return response
+
+def test_callback_success_creates_customer_and_links_transaction(app, client, active_business):
+    transaction_id = add_pending(active_business, 'ws_CO_1')
+
+    response = deliver(client, callback_payload('ws_CO_1'))
+
+    assert response.status_code == 200
+    db.session.expire_all()
+    transaction = db.session.get(Transaction, transaction_id)
+    assert transaction.status == 'success'
+    assert transaction.customer_id is not None
+    customer = db.session.get(Customer, transaction.customer_id)
+    assert customer.total_amount_requested == 10
+    assert customer.transaction_count == 1
+    assert customer.last_transaction_date is not None
+
+def test_callback_redelivery_is_applied_once(app, client, active_business):
+    add_pending(active_business, 'ws_CO_1', amount=10)
+    add_pending(active_business, 'ws_CO_2', amount=25)
+
+    for _ in range(3):
+        deliver(client, callback_payload('ws_CO_1'))
+    deliver(client, callback_payload('ws_CO_2'))
+
+    customers = Customer.query.all()
+    assert len(customers) == 1
+    assert customers[0].total_amount_requested == 35
+    assert customers[0].transaction_count == 2
+    assert ProcessedCallback.query.count() == 2
+
+def test_callback_failure_does_not_touch_customers(app, client, active_business):
+    transaction_id = add_pending(active_business, 'ws_CO_FAIL')
+
+    deliver(client, callback_payload('ws_CO_FAIL', result_code=1032))
+
+    db.session.expire_all()
+    assert db.session.get(Transaction, transaction_id).status == 'failed'
+    assert Customer.query.count() == 0
+
+def test_callback_for_unknown_transaction_is_not_recorded(app, client, active_business):
+    response = deliver(client, callback_payload('ws_CO_UNKNOWN'))
+
+    assert response.status_code == 200
+    assert ProcessedCallback.query.count() == 0
+
+def test_callback_does_not_overwrite_final_status(app, client, active_business):
+    transaction_id = add_pending(active_business, 'ws_CO_1')
+    db.session.get(Transaction, transaction_id).status = 'failed'
+    db.session.commit()
+
+    deliver(client, callback_payload('ws_CO_1'))
+
+    db.session.expire_all()
+    assert db.session.get(Transaction, transaction_id).status == 'failed'
+    assert Customer.query.count() == 0
+
+def test_callback_intake_only_stores_the_payload(app, client, active_business):
+    transaction_id = add_pending(active_business, 'ws_CO_1')
+
+    response = client.post('/callback', json=callback_payload('ws_CO_1'))
+
+    assert response.status_code == 200
+    assert CallbackInbox.query.count() == 1
+    assert db.session.get(Transaction, transaction_id).status == 'pending'
+
+def test_inbox_batch_is_applied_in_one_pass(app, client, active_business):
+    for i in range(6):
+        add_pending(active_business, f'ws_CO_{i}', amount=10, phone_number=f'25470000000{i % 2}')
+    for i in range(6):
+        client.post('/callback', json=callback_payload(f'ws_CO_{i}', result_code=0 if i < 4 else 1032))
+    # A redelivery and a malformed body in the same batch
+    client.post('/callback', json=callback_payload('ws_CO_0'))
+    client.post('/callback', data='not json', content_type='application/json')
+
+    assert process_callback_inbox(batch_size=100) == 8
+    assert process_callback_inbox(batch_size=100) == 0
+
+    statuses = [t.status for t in Transaction.query.order_by(Transaction.id)]
+    assert statuses == ['success'] * 4 + ['failed'] * 2
+    totals = {c.phone_number: (c.total_amount_requested, c.transaction_count) for c in Customer.query}
+    assert totals == {'254700000000': (20, 2), '254700000001': (20, 2)}
+    assert CallbackInbox.query.filter(CallbackInbox.processed_at == None).count() == 0
+
+def test_inline_mode_applies_callback_in_request(app, client, active_business):
+    # The default, so a deployment without `flask process-callbacks` still applies callbacks
+    del app.config['CALLBACK_PROCESSING_MODE']
+    transaction_id = add_pending(active_business, 'ws_CO_1')
+
+    client.post('/callback', json=callback_payload('ws_CO_1'))
+
+    db.session.expire_all()
+    assert db.session.get(Transaction, transaction_id).status == 'success'
+    assert CallbackInbox.query.count() == 0
+
+def test_callback_that_overtakes_its_transaction_is_retried(app, client, active_business):
+    app.config['CALLBACK_UNMATCHED_RETRY_INTERVAL'] = 0
+    deliver(client, callback_payload('ws_CO_EARLY'))
+    entry = CallbackInbox.query.one()
+    assert entry.processed_at is None
+    assert entry.retry_at is not None
+
+    # The async worker commits the CheckoutRequestID after Daraja answered
+    transaction_id = add_pending(active_business, 'ws_CO_EARLY')
+    process_callback_inbox()
+
+    db.session.expire_all()
+    assert db.session.get(Transaction, transaction_id).status == 'success'
+    assert CallbackInbox.query.one().processed_at is not None
+
+def test_unmatched_callback_is_given_up_after_max_age(app, client, active_business):
+    import datetime
+
+    app.config['CALLBACK_UNMATCHED_MAX_AGE'] = 60
+    client.post('/callback', json=callback_payload('ws_CO_NEVER'))
+    entry = CallbackInbox.query.one()
+    entry.received_at = datetime.datetime.utcnow() - datetime.timedelta(minutes=5)
+    db.session.commit()
+
+    process_callback_inbox()
+
+    assert CallbackInbox.query.one().processed_at is not None
+    assert ProcessedCallback.query.count() == 0
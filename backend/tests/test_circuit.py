@@ -0,0 +1,146 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from backend.app import circuit
+from backend.app.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, get_breakers
+from backend.app.services import DarajaCredentials, get_mpesa_access_token, stk_push
+
+CREDENTIALS = DarajaCredentials('circuit_key', 'secret', '54321', None)
+
+
+def response(status_code, body=None):
+    return MagicMock(status_code=status_code, text='', json=lambda: body or {})
+
+def test_breaker_opens_on_failure_rate_and_recovers():
+    breaker = CircuitBreaker('stk_push:1', min_calls=4, failure_rate=0.5, open_seconds=0.05)
+    for failed in (False, True, False):
+        breaker.acquire()
+        breaker.record(0.01, failed)
+    assert breaker.state == CLOSED
+
+    breaker.acquire()
+    breaker.record(0.01, True)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+
+    # After open_seconds a single probe goes through
+    time.sleep(0.06)
+    breaker.acquire()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+    breaker.record(0.01, False)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()['calls'] == 0
+
+def test_breaker_opens_on_slow_calls_and_failed_probe_reopens():
+    breaker = CircuitBreaker('stk_push:1', min_calls=3, slow_call_seconds=1, slow_call_rate=0.6, open_seconds=0.05)
+    for duration in (2, 2, 0.1):
+        breaker.acquire()
+        breaker.record(duration, False)
+    assert breaker.state == OPEN
+
+    time.sleep(0.06)
+    breaker.acquire()
+    breaker.record(0.1, True)
+    assert breaker.state == OPEN
+
+@patch('backend.app.services.get_access_token', return_value={'access_token': 'token'})
+@patch('backend.app.services.transport.post', return_value=response(503))
+def test_stk_push_fails_fast_with_503_while_open(mock_post, mock_token, app, client, business_headers):
+    app.config['DARAJA_BREAKER_MIN_CALLS'] = 3
+    circuit.init_app(app)
+
+    for _ in range(3):
+        res = client.post('/stk-push', json={'phone_number': '254712345678', 'amount': 10}, headers=business_headers)
+        assert res.status_code == 400
+    assert mock_post.call_count == 3
+
+    res = client.post('/stk-push', json={'phone_number': '254712345678', 'amount': 10}, headers=business_headers)
+    assert res.status_code == 503
+    assert res.json['error']['error'] == 'circuit-open'
+    assert int(res.headers['Retry-After']) > 0
+    # Daraja was not called again
+    assert mock_post.call_count == 3
+
+@patch('backend.app.services.transport.get')
+def test_token_fetch_is_retried(mock_get, app):
+    app.config['DARAJA_RETRY_BACKOFF'] = 0.001
+    mock_get.side_effect = [
+        requests.exceptions.ReadTimeout('read timed out'),
+        response(503),
+        response(200, {'access_token': 'token', 'expires_in': '3599'}),
+    ]
+    assert get_mpesa_access_token('key', 'secret')['access_token'] == 'token'
+    assert mock_get.call_count == 3
+
+@patch('backend.app.services.get_access_token', return_value={'access_token': 'token'})
+@patch('backend.app.services.transport.post')
+def test_stk_push_is_only_retried_when_nothing_was_sent(mock_post, mock_token, app):
+    app.config['DARAJA_RETRY_BACKOFF'] = 0.001
+
+    # The push may have reached Daraja: resending could charge the customer twice
+    mock_post.side_effect = requests.exceptions.ReadTimeout('read timed out')
+    assert stk_push('254712345678', 10, CREDENTIALS, 'ref', 'desc')['error'] == 'timeout'
+    assert mock_post.call_count == 1
+
+    mock_post.reset_mock()
+    mock_post.side_effect = [
+        requests.exceptions.ConnectTimeout('connect timed out'),
+        response(200, {'ResponseCode': '0', 'CheckoutRequestID': 'ws_CO_1'}),
+    ]
+    assert stk_push('254712345678', 10, CREDENTIALS, 'ref', 'desc')['ResponseCode'] == '0'
+    assert mock_post.call_count == 2
+
+    mock_post.reset_mock()
+    mock_post.side_effect = None
+    mock_post.return_value = response(503)
+    stk_push('254712345678', 10, CREDENTIALS, 'ref', 'desc')
+    assert mock_post.call_count == 1
+
+def test_admin_can_read_breaker_state(app, admin_auth_client):
+    breaker = get_breakers().get('stk_push', '54321')
+    breaker.acquire()
+    breaker.record(0.01, True)
+
+    res = admin_auth_client.get('/admin/circuit-breakers')
+    assert res.status_code == 200
+    assert res.json['breakers'] == [{
+        'name': 'stk_push:54321', 'state': 'closed', 'calls': 1, 'failures': 1, 'slow_calls': 0, 'retry_after': None
+    }]
+
+@patch('backend.app.services.transport.get')
+def test_local_error_does_not_leak_half_open_probe(mock_get, app):
+    from backend.app.services import daraja_request
+
+    breaker = get_breakers().get('oauth', 'probe')
+    breaker.state, breaker.opened_at = OPEN, time.monotonic() - 60
+
+    def broken_send():
+        raise ValueError('bad payload')
+    with pytest.raises(ValueError):
+        daraja_request('oauth', 'probe', broken_send)
+    assert breaker.state == HALF_OPEN
+
+    # The probe slot is free again, so the next call still gets through
+    mock_get.return_value = response(200)
+    daraja_request('oauth', 'probe', lambda: mock_get('url'))
+    assert breaker.state == CLOSED
+
+@patch('backend.app.services.transport.get', return_value=response(503))
+def test_oauth_breakers_are_per_credentials(mock_get, app):
+    app.config['DARAJA_BREAKER_MIN_CALLS'] = 3
+    app.config['DARAJA_RETRY_ATTEMPTS'] = 0
+    circuit.init_app(app)
+
+    for _ in range(3):
+        get_mpesa_access_token('failing_key', 'secret')
+    assert get_mpesa_access_token('failing_key', 'secret')['error'] == 'circuit-open'
+
+    # Another tenant's credentials still reach Daraja
+    mock_get.return_value = response(200, {'access_token': 'token', 'expires_in': '3599'})
+    assert get_mpesa_access_token('healthy_key', 'secret')['access_token'] == 'token'
@@ -0,0 +1,44 @@
+import pytest
+
+from backend.benchmarks.runner import run_benchmarks
+
+# Every STK push waits this long on the simulated Daraja
+STK_LATENCY_MS = 250
+
+
+def stk_push_throughput(workdir, threads, extra_env=None):
+    results = run_benchmarks({
+        'tenants': 4,
+        'customers': 1,
+        'transactions': 1,
+        'pending': 0,
+        'seed': 0,
+        'requests': 32,
+        'export_requests': 0,
+        'concurrency': 16,
+        'workers': 1,
+        'threads': threads,
+        'simulator_latency': 'fixed:0',
+        'database_url': None,
+        'only': ['stk_push'],
+        'workdir': str(workdir),
+        'extra_env': {'DARAJA_SIM_STK_LATENCY': f'fixed:{STK_LATENCY_MS}', **(extra_env or {})},
+    })
+    stk_push = results['scenarios']['stk_push']
+    assert stk_push['errors'] == 0
+    return stk_push['throughput_rps']
+
+def test_stk_push_throughput_scales_with_threads(tmp_path):
+    single = stk_push_throughput(tmp_path / 'single', threads=1, extra_env={'GUNICORN_WORKER_CLASS': 'sync'})
+    threaded = stk_push_throughput(tmp_path / 'threaded', threads=16)
+
+    # One sync worker is bound by Daraja's latency; 16 threads overlap the waits
+    assert single <= 1000 / STK_LATENCY_MS * 1.2
+    assert threaded >= single * 4
+
+def test_stk_push_throughput_scales_with_gevent(tmp_path):
+    pytest.importorskip('gevent')
+    single = stk_push_throughput(tmp_path / 'single', threads=1, extra_env={'GUNICORN_WORKER_CLASS': 'sync'})
+    cooperative = stk_push_throughput(tmp_path / 'gevent', threads=1, extra_env={'GUNICORN_WORKER_CLASS': 'gevent'})
+
+    assert cooperative >= single * 4
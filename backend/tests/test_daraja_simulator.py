@@ -0,0 +1,110 @@
+import random
+import threading
+import time
+
+import pytest
+import requests
+from flask import Flask, request
+from werkzeug.serving import make_server
+
+from backend.app import db
+from backend.app.callbacks import process_callback_inbox
+from backend.app.models import Transaction
+from backend.app.services import DarajaCredentials, stk_push, stk_push_query
+from backend.simulator import create_simulator
+from backend.simulator.daraja import parse_latency
+
+
+def serve(wsgi_app):
+    server = make_server('127.0.0.1', 0, wsgi_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+@pytest.fixture
+def callback_receiver():
+    received = []
+    receiver = Flask('receiver')
+
+    @receiver.route('/callback', methods=['POST'])
+    def callback():
+        received.append(request.get_json())
+        return {'message': 'ok'}
+
+    server = serve(receiver)
+    yield f'http://127.0.0.1:{server.server_port}/callback', received
+    server.shutdown()
+
+def start_simulator(**config):
+    settings = {'DARAJA_SIM_CALLBACK_DELAY': 'fixed:0', 'DARAJA_SIM_RESULT_CODES': '0:1', 'DARAJA_SIM_SEED': 1}
+    settings.update(config)
+    server = serve(create_simulator(settings))
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+CREDENTIALS = DarajaCredentials('active_consumer_key', 'active_consumer_secret', '54321', None)
+
+def test_stk_push_round_trip_through_simulator(app, client, active_business, callback_receiver):
+    callback_url, received = callback_receiver
+    server, base_url = start_simulator()
+    app.config.update(MPESA_API_BASE_URL=base_url, MPESA_CALLBACK_URL=callback_url)
+
+    try:
+        result = stk_push('254712345678', 10, CREDENTIALS, 'ref', 'desc')
+        assert result['ResponseCode'] == '0'
+        db.session.add(Transaction(amount=10, phone_number='254712345678', checkout_request_id=result['CheckoutRequestID'], business_id=active_business))
+        db.session.commit()
+
+        wait_for(lambda: received)
+        stk_callback = received[0]['Body']['stkCallback']
+        assert stk_callback['CheckoutRequestID'] == result['CheckoutRequestID']
+        assert {item['Name'] for item in stk_callback['CallbackMetadata']['Item']} == {'Amount', 'MpesaReceiptNumber', 'TransactionDate', 'PhoneNumber'}
+
+        client.post('/callback', json=received[0])
+        process_callback_inbox()
+        assert Transaction.query.one().status == 'success'
+
+        wait_for(lambda: requests.get(f'{base_url}/simulator/stats').json()['callbacks_sent'] == 1)
+        query = stk_push_query(result['CheckoutRequestID'], CREDENTIALS)
+        assert query['ResultCode'] == '0'
+    finally:
+        server.shutdown()
+
+def test_simulator_injects_errors_and_throttles(app):
+    server, base_url = start_simulator(DARAJA_SIM_ERROR_RATE=1)
+    try:
+        response = requests.get(f'{base_url}/oauth/v1/generate?grant_type=client_credentials', auth=('key', 'secret'))
+        assert response.status_code == 500
+        assert response.json()['errorCode'] == '500.001.1001'
+    finally:
+        server.shutdown()
+
+    server, base_url = start_simulator(DARAJA_SIM_RATE_LIMIT=2)
+    try:
+        statuses = [
+            requests.get(f'{base_url}/oauth/v1/generate?grant_type=client_credentials', auth=('key', 'secret')).status_code
+            for _ in range(4)
+        ]
+        assert statuses.count(429) >= 1
+        assert requests.get(f'{base_url}/simulator/stats').json()['throttled'] == statuses.count(429)
+    finally:
+        server.shutdown()
+
+def test_simulator_rejects_unknown_tokens(app):
+    server, base_url = start_simulator()
+    try:
+        response = requests.post(f'{base_url}/mpesa/stkpush/v1/processrequest', headers={'Authorization': 'Bearer nope'}, json={})
+        assert response.status_code == 401
+    finally:
+        server.shutdown()
+
+def test_parse_latency():
+    rng = random.Random(0)
+    assert parse_latency('fixed:250')(rng) == 0.25
+    assert 0.02 <= parse_latency('uniform:20:80')(rng) <= 0.08
+    with pytest.raises(ValueError):
+        parse_latency('gamma:1')
@@ -0,0 +1,82 @@
+import datetime
+
+from backend.app import db
+from backend.app.directory import business_directory
+from backend.app.models import Business, Customer, Transaction
+from backend.app.profiler import assert_max_queries
+from backend.app.rollups import record_created, record_status_changes
+
+
+def add_transactions(business_id, statuses, amount=10, timestamp=None):
+    timestamp = timestamp or datetime.datetime(2026, 10, 1, 12, 0)
+    transactions = [
+        Transaction(amount=amount, phone_number='254711000000', status=status, business_id=business_id, timestamp=timestamp)
+        for status in statuses
+    ]
+    db.session.add_all(transactions)
+    record_created((business_id, timestamp, 'pending', amount) for _ in statuses)
+    record_status_changes((business_id, timestamp, 'pending', status, amount) for status in statuses)
+    db.session.commit()
+
+def add_businesses(count):
+    businesses = [Business(email=f'shop{i}@example.com', phone_number=f'25472000000{i}') for i in range(count)]
+    db.session.add_all(businesses)
+    db.session.commit()
+    return [business.id for business in businesses]
+
+def test_admin_businesses_include_aggregates(app, admin_auth_client, active_business):
+    add_transactions(active_business, ['success', 'success', 'failed', 'pending'], amount=25)
+    add_transactions(active_business, ['success'], amount=5, timestamp=datetime.datetime(2026, 10, 3, 8, 30))
+    db.session.add_all(Customer(phone_number=f'25471000000{i}', business_id=active_business) for i in range(2))
+    other = add_businesses(1)[0]
+    db.session.commit()
+
+    res = admin_auth_client.get('/admin/businesses')
+
+    assert res.status_code == 200
+    rows = {row['id']: row for row in res.json}
+    assert rows[active_business] == {
+        'id': active_business,
+        'phone_number': '254700000000',
+        'email': 'active@business.com',
+        'created_at': rows[active_business]['created_at'],
+        'is_active': True,
+        'transaction_count': 5,
+        'success_rate': 0.75,
+        'amount_collected': 55,
+        'last_activity': '2026-10-03 08:30:00',
+        'customer_count': 2,
+    }
+    assert rows[other]['transaction_count'] == 0
+    assert rows[other]['success_rate'] is None
+    assert rows[other]['last_activity'] is None
+    assert rows[other]['customer_count'] == 0
+
+def test_directory_is_one_query(app, active_business):
+    for business_id in [active_business] + add_businesses(5):
+        add_transactions(business_id, ['success', 'failed'])
+
+    with assert_max_queries(1):
+        businesses, _ = business_directory({})
+    assert len(businesses) == 6
+    assert all(business['transaction_count'] == 2 for business in businesses)
+
+def test_admin_businesses_paginate_and_search(app, admin_auth_client):
+    ids = add_businesses(5)
+
+    res = admin_auth_client.get('/admin/businesses?limit=2')
+    assert [row['id'] for row in res.json] == [ids[4], ids[3]]
+    cursor = res.headers['X-Next-Cursor']
+    assert 'cursor=' in res.headers['Link']
+
+    res = admin_auth_client.get(f'/admin/businesses?limit=2&cursor={cursor}')
+    assert [row['id'] for row in res.json] == [ids[2], ids[1]]
+
+    res = admin_auth_client.get('/admin/businesses?search=SHOP3@')
+    assert [row['email'] for row in res.json] == ['shop3@example.com']
+    res = admin_auth_client.get('/admin/businesses?search=254720000001')
+    assert [row['id'] for row in res.json] == [ids[1]]
+    # LIKE wildcards are matched literally
+    assert admin_auth_client.get('/admin/businesses?search=%25').json == []
+
+    assert admin_auth_client.get('/admin/businesses?cursor=abc').status_code == 400
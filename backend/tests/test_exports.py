@@ -0,0 +1,213 @@
+from io import BytesIO
+
+import openpyxl
+from unittest.mock import patch
+from backend.app import db
+from backend.app.models import Customer, Business, Transaction, ExportJob
+
+
+def seed_customers(business_id, count):
+    for i in range(count):
+        db.session.add(Customer(
+            name=f'Customer {i}',
+            phone_number=f'2547{i:08d}',
+            total_amount_requested=10 * i,
+            transaction_count=i,
+            business_id=business_id
+        ))
+    db.session.commit()
+
+def read_rows(response):
+    workbook = openpyxl.load_workbook(BytesIO(response.data), read_only=True)
+    return [list(row) for row in workbook.active.iter_rows(values_only=True)]
+
+def test_export_customers_excel(app, client, active_business, business_headers):
+    app.config['EXPORT_BATCH_SIZE'] = 7
+    seed_customers(active_business, 25)
+
+    response = client.get('/customers/export-excel', headers=business_headers)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    assert 'customers.xlsx' in response.headers['Content-Disposition']
+    rows = read_rows(response)
+    assert rows[0][0] == 'Name'
+    assert len(rows) == 26
+    assert rows[3][:4] == ['Customer 2', '254700000002', 20, 2]
+
+def test_export_customers_excel_spools_to_disk(app, client, active_business, business_headers):
+    app.config['EXPORT_SPOOL_MAX_SIZE'] = 1024
+    seed_customers(active_business, 200)
+
+    response = client.get('/customers/export-excel', headers=business_headers)
+
+    assert response.status_code == 200
+    assert len(read_rows(response)) == 201
+
+def test_export_all_customers_excel(app, admin_auth_client, active_business):
+    other = Business(email='other@business.com')
+    db.session.add(other)
+    db.session.commit()
+    seed_customers(active_business, 3)
+    seed_customers(other.id, 2)
+
+    response = admin_auth_client.get('/admin/customers/export-excel')
+
+    assert response.status_code == 200
+    rows = read_rows(response)
+    assert rows[0][0] == 'Business ID'
+    assert [row[0] for row in rows[1:]] == [active_business] * 3 + [other.id] * 2
+
+
+class InlineExecutor:
+    def submit(self, fn, *args):
+        fn(*args)
+
+@patch('backend.app.export_jobs.get_executor', return_value=InlineExecutor())
+def test_background_customer_export(mock_executor, app, client, active_business, business_headers, tmp_path):
+    app.config['EXPORT_DIR'] = str(tmp_path)
+    seed_customers(active_business, 12)
+
+    response = client.post('/exports', headers=business_headers, json={'kind': 'customers', 'format': 'csv'})
+    assert response.status_code == 202
+    job_id = response.json['id']
+
+    response = client.get(f'/exports/{job_id}', headers=business_headers)
+    assert response.json['status'] == 'completed'
+    assert response.json['rows_written'] == 12
+    assert response.json['total_rows'] == 12
+
+    response = client.get(f'/exports/{job_id}/download', headers=business_headers)
+    assert response.status_code == 200
+    lines = response.data.decode().splitlines()
+    assert lines[0].startswith('Name,Phone Number')
+    assert len(lines) == 13
+
+    response = client.get(f'/exports/{job_id}/download', headers={**business_headers, 'Range': 'bytes=0-3'})
+    assert response.status_code == 206
+    assert response.data == b'Name'
+
+@patch('backend.app.export_jobs.get_executor', return_value=InlineExecutor())
+def test_background_transaction_export_for_admin(mock_executor, app, admin_auth_client, active_business, tmp_path):
+    app.config['EXPORT_DIR'] = str(tmp_path)
+    db.session.add_all([
+        Transaction(amount=10, phone_number='254700000001', checkout_request_id='ws_1', business_id=active_business),
+        Transaction(amount=20, phone_number='254700000002', checkout_request_id='ws_2', business_id=active_business),
+    ])
+    db.session.commit()
+
+    response = admin_auth_client.post('/exports', json={'kind': 'transactions', 'format': 'xlsx'})
+    job_id = response.json['id']
+
+    response = admin_auth_client.get(f'/exports/{job_id}/download')
+    assert response.status_code == 200
+    rows = read_rows(response)
+    assert rows[0][0] == 'Business ID'
+    assert [row[5] for row in rows[1:]] == ['ws_1', 'ws_2']
+
+@patch('backend.app.export_jobs.get_executor', return_value=InlineExecutor())
+def test_exports_are_private_and_expire(mock_executor, app, client, admin_auth_client, active_business, business_headers, tmp_path):
+    import datetime
+    from backend.app.export_jobs import purge_expired_exports
+
+    app.config['EXPORT_DIR'] = str(tmp_path)
+    job_id = client.get('/customers/export-excel?background=true', headers=business_headers).json['id']
+
+    # Another identity cannot see the job
+    assert admin_auth_client.get(f'/exports/{job_id}').status_code == 404
+
+    job = db.session.get(ExportJob, job_id)
+    job.expires_at = datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+    db.session.commit()
+    assert client.get(f'/exports/{job_id}/download', headers=business_headers).status_code == 410
+
+    assert purge_expired_exports() == 1
+    assert list(tmp_path.iterdir()) == []
+
+def test_export_rejects_unknown_format(app, client, business_headers):
+    response = client.post('/exports', headers=business_headers, json={'kind': 'customers', 'format': 'pdf'})
+    assert response.status_code == 400
+
+def test_export_customers_csv(app, client, active_business, business_headers):
+    seed_customers(active_business, 3)
+
+    response = client.get('/customers/export-excel?format=csv', headers=business_headers)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert 'customers.csv' in response.headers['Content-Disposition']
+    lines = response.data.decode().splitlines()
+    assert lines[0] == 'Name,Phone Number,Total Amount Requested,Transaction Count,First Transaction Date,Last Transaction Date'
+    assert len(lines) == 4
+
+def test_export_transactions_ndjson_gzip(app, client, active_business, business_headers):
+    import gzip
+    import json
+
+    app.config['EXPORT_BATCH_SIZE'] = 2
+    db.session.add_all([
+        Transaction(amount=10 * i, phone_number='254700000001', checkout_request_id=f'ws_{i}', business_id=active_business)
+        for i in range(5)
+    ])
+    db.session.commit()
+
+    response = client.get('/transactions/export?format=ndjson', headers={**business_headers, 'Accept-Encoding': 'gzip'})
+
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    records = [json.loads(line) for line in gzip.decompress(response.data).decode().splitlines()]
+    assert [r['checkout_request_id'] for r in records] == [f'ws_{i}' for i in range(5)]
+    assert records[2]['amount'] == 20
+
+def test_export_all_transactions_defaults_to_csv(app, admin_auth_client, active_business):
+    db.session.add(Transaction(amount=10, phone_number='254700000001', checkout_request_id='ws_1', business_id=active_business))
+    db.session.commit()
+
+    response = admin_auth_client.get('/admin/transactions/export')
+
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    lines = response.data.decode().splitlines()
+    assert lines[0].startswith('Business ID,ID,Amount')
+    assert lines[1].startswith(f'{active_business},')
+
+def test_export_rejects_unknown_stream_format(app, client, business_headers):
+    assert client.get('/transactions/export?format=parquet', headers=business_headers).status_code == 400
+
+def test_background_export_is_rate_limited(app, client, business_headers, tmp_path):
+    from backend.app.ratelimit import parse_limit
+
+    app.config['EXPORT_DIR'] = str(tmp_path)
+    app.extensions['rate_limits']['exports'] = parse_limit('1/60')
+
+    with patch('backend.app.export_jobs.get_executor', return_value=InlineExecutor()):
+        assert client.post('/exports', headers=business_headers, json={'kind': 'customers', 'format': 'csv'}).status_code == 202
+        response = client.post('/exports', headers=business_headers, json={'kind': 'customers', 'format': 'csv'})
+    assert response.status_code == 429
+
+def test_admin_export_validates_business_id(app, admin_auth_client):
+    response = admin_auth_client.post('/exports', json={'kind': 'customers', 'business_id': 'abc'})
+    assert response.status_code == 400
+    response = admin_auth_client.post('/exports', json={'kind': 'customers', 'business_id': 9999})
+    assert response.status_code == 404
+
+def test_stale_export_jobs_are_failed(app, client, business_headers, tmp_path):
+    import datetime
+    from backend.app.export_jobs import purge_expired_exports, run_export_job
+
+    app.config['EXPORT_DIR'] = str(tmp_path)
+    with patch('backend.app.export_jobs.get_executor'):
+        # Accepted, but the worker holding it restarts before it runs
+        job_id = client.post('/exports', headers=business_headers, json={'kind': 'customers', 'format': 'csv'}).json['id']
+    job = db.session.get(ExportJob, job_id)
+    job.heartbeat_at = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+    db.session.commit()
+
+    purge_expired_exports()
+
+    response = client.get(f'/exports/{job_id}', headers=business_headers)
+    assert response.json['status'] == 'failed'
+    assert 'interrupted' in response.json['error']
+    # A late run of the lost job does nothing
+    run_export_job(job_id)
+    assert client.get(f'/exports/{job_id}', headers=business_headers).json['status'] == 'failed'
@@ -0,0 +1,114 @@
+import os
+import runpy
+from unittest.mock import MagicMock, patch
+
+from prometheus_client import REGISTRY
+
+from backend.app import db, metrics
+from backend.app.callbacks import process_callback_inbox
+from backend.app.models import Transaction
+from backend.app.services import DarajaCredentials, stk_push
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+def test_metrics_endpoint_reports_request_latency(app, client):
+    before = sample('http_request_duration_seconds_count', method='GET', route='/health', status='200')
+
+    client.get('/health')
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert b'http_request_duration_seconds_bucket' in response.data
+    assert sample('http_request_duration_seconds_count', method='GET', route='/health', status='200') == before + 1
+
+def test_metrics_token(app, client):
+    app.config['METRICS_AUTH_TOKEN'] = 'scrape-token'
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer scrape-token'}).status_code == 200
+
+@patch('backend.app.services.transport.post')
+@patch('backend.app.services.transport.get')
+def test_daraja_calls_are_measured(mock_get, mock_post, app):
+    mock_get.return_value = MagicMock(status_code=200, json=lambda: {'access_token': 'token', 'expires_in': '3599'})
+    mock_post.return_value = MagicMock(status_code=200, json=lambda: {'ResponseCode': '0', 'CheckoutRequestID': 'ws_CO_1'})
+    fetches = sample('mpesa_token_fetches_total', outcome='success')
+    accepted = sample('daraja_results_total', operation='stk_push', tenant='77001', result='0')
+
+    credentials = DarajaCredentials('metrics_key', 'secret', '77001', None)
+    stk_push('254712345678', 10, credentials, 'ref', 'desc')
+    stk_push('254712345678', 10, credentials, 'ref', 'desc')
+
+    # The second push reuses the cached token
+    assert sample('mpesa_token_fetches_total', outcome='success') == fetches + 1
+    assert sample('daraja_results_total', operation='stk_push', tenant='77001', result='0') == accepted + 2
+    assert sample('daraja_request_duration_seconds_count', operation='stk_push', tenant='77001') >= 2
+
+def test_tenant_label_is_bounded(app):
+    app.config['METRICS_MAX_TENANTS'] = 2
+    with patch.object(metrics, '_tenant_labels', set()):
+        assert metrics.tenant_label('1') == '1'
+        assert metrics.tenant_label('2') == '2'
+        assert metrics.tenant_label('3') == 'other'
+        assert metrics.tenant_label('1') == '1'
+        assert metrics.tenant_label(None) == 'none'
+
+def test_callback_lag_is_observed(app, client, active_business):
+    db.session.add(Transaction(amount=10, phone_number='254712345678', checkout_request_id='ws_CO_LAG', business_id=active_business))
+    db.session.commit()
+    lag = sample('callback_lag_seconds_count')
+    inbox_delay = sample('callback_inbox_delay_seconds_count')
+
+    app.config['CALLBACK_PROCESSING_MODE'] = 'inbox'
+    client.post('/callback', json={'Body': {'stkCallback': {'CheckoutRequestID': 'ws_CO_LAG', 'ResultCode': 0}}})
+    process_callback_inbox()
+
+    assert sample('callback_lag_seconds_count') == lag + 1
+    assert sample('callback_inbox_delay_seconds_count') == inbox_delay + 1
+
+def scraped_value(port, name):
+    from urllib.request import urlopen
+    from prometheus_client.parser import text_string_to_metric_families
+    body = urlopen(f'http://127.0.0.1:{port}/metrics').read().decode()
+    for family in text_string_to_metric_families(body):
+        for metric_sample in family.samples:
+            if metric_sample.name == name:
+                return metric_sample.value
+    return 0
+
+def test_cli_worker_serves_its_own_metrics(app, client, active_business):
+    app.config['WORKER_METRICS_PORT'] = 0 # any free port
+    server = metrics.start_worker_metrics_server(app)
+    try:
+        port = server.server_port
+        lag = scraped_value(port, 'callback_lag_seconds_count')
+        db.session.add(Transaction(amount=10, phone_number='254712345678', checkout_request_id='ws_CO_SCRAPE', business_id=active_business))
+        db.session.commit()
+
+        app.config['CALLBACK_PROCESSING_MODE'] = 'inbox'
+        client.post('/callback', json={'Body': {'stkCallback': {'CheckoutRequestID': 'ws_CO_SCRAPE', 'ResultCode': 0}}})
+        # What `flask process-callbacks` runs
+        process_callback_inbox()
+
+        assert scraped_value(port, 'callback_lag_seconds_count') == lag + 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_worker_metrics_server_is_off_by_default(app):
+    assert metrics.start_worker_metrics_server(app) is None
+
+def test_gunicorn_empties_the_multiproc_dir_on_start(tmp_path, monkeypatch):
+    conf = runpy.run_path(os.path.join(os.path.dirname(__file__), '..', 'gunicorn.conf.py'))
+    metrics_dir = tmp_path / 'metrics'
+    metrics_dir.mkdir()
+    (metrics_dir / 'counter_123.db').write_bytes(b'stale')
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(metrics_dir))
+    monkeypatch.setenv('WORKER_CONCURRENCY', '1')
+
+    conf['on_starting'](MagicMock(cfg=MagicMock(worker_class_str='sync', threads=1)))
+
+    assert os.listdir(metrics_dir) == []
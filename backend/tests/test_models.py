@@ -0,0 +1,22 @@
+from backend.app import db
+from backend.app.models import Transaction, Customer
+
+
+def query_plan(query):
+    # SQLite's EXPLAIN QUERY PLAN; each row's last column describes one step
+    sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    rows = db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}')).fetchall()
+    return ' | '.join(row[-1] for row in rows)
+
+def test_callback_lookup_uses_checkout_request_id_index(app):
+    plan = query_plan(Transaction.query.filter_by(checkout_request_id='ws_CO_1'))
+    assert 'USING INDEX ix_transaction_checkout_request_id' in plan
+
+def test_transaction_listing_uses_business_timestamp_index(app):
+    plan = query_plan(Transaction.query.filter_by(business_id=1).order_by(Transaction.timestamp.desc()))
+    assert 'USING INDEX ix_transaction_business_id_timestamp' in plan
+    assert 'TEMP B-TREE' not in plan
+
+def test_customer_lookup_uses_business_phone_index(app):
+    plan = query_plan(Customer.query.filter_by(phone_number='254712345678', business_id=1))
+    assert 'USING INDEX ix_customer_business_id_phone_number' in plan
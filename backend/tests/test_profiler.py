@@ -0,0 +1,55 @@
+import pytest
+
+from backend.app import db
+from backend.app.models import Customer, Transaction
+from backend.app.profiler import QueryBudgetExceeded, assert_max_queries, query_budget
+
+
+def add_customers_with_transactions(business_id, count):
+    for i in range(count):
+        customer = Customer(phone_number=f'25471000000{i}', business_id=business_id)
+        db.session.add(customer)
+        db.session.flush()
+        db.session.add(Transaction(amount=10, phone_number=customer.phone_number, business_id=business_id, customer_id=customer.id))
+    db.session.commit()
+    db.session.expire_all()
+
+def test_assert_max_queries_reports_repeated_statements(app, active_business):
+    add_customers_with_transactions(active_business, 4)
+
+    with pytest.raises(QueryBudgetExceeded) as excinfo:
+        with assert_max_queries(2):
+            for transaction in Transaction.query.all():
+                transaction.customer.phone_number
+
+    message = str(excinfo.value)
+    assert '5 queries' in message
+    assert 'x4: SELECT customer' in message
+
+def test_route_over_budget_fails(app, client, active_business):
+    add_customers_with_transactions(active_business, 3)
+
+    @query_budget(1)
+    def n_plus_one():
+        return {'phones': [t.customer.phone_number for t in Transaction.query.all()]}
+    app.add_url_rule('/n-plus-one', view_func=n_plus_one)
+
+    with pytest.raises(QueryBudgetExceeded):
+        client.get('/n-plus-one')
+
+def test_debug_headers(app, client, business_headers):
+    app.config['SQL_PROFILER_HEADERS'] = True
+
+    response = client.get('/transactions', headers=business_headers)
+
+    assert response.status_code == 200
+    assert int(response.headers['X-DB-Query-Count']) >= 1
+    assert float(response.headers['X-DB-Time-Ms']) >= 0
+    assert response.headers['X-DB-Repeated-Statements'] == '0'
+
+def test_slow_request_log(app, client, business_headers, capsys):
+    app.config['SQL_PROFILER_SLOW_QUERY_COUNT'] = 1
+
+    client.get('/transactions', headers=business_headers)
+
+    assert 'Slow Request: GET /transactions' in capsys.readouterr().out
@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from backend.app import ratelimit
+from backend.app.ratelimit import MemoryBuckets, RateLimit, RateLimitError, parse_limits, validate_overrides
+
+
+def test_parse_limits():
+    assert parse_limits('stk_push=60/60, default=600/60') == {
+        'stk_push': RateLimit(60, 60.0),
+        'default': RateLimit(600, 60.0),
+    }
+    with pytest.raises(RateLimitError):
+        parse_limits('stk_push=fast')
+    with pytest.raises(RateLimitError):
+        validate_overrides({'stk_push': '0/60'})
+    with pytest.raises(RateLimitError):
+        validate_overrides({'unknown_route': '1/60'})
+    assert validate_overrides({'stk_push': '5/1', 'stats': None}) == {'stk_push': '5/1'}
+
+def test_memory_bucket_refills():
+    buckets = MemoryBuckets()
+    limit = RateLimit(2, 0.1)
+    assert buckets.take('1:stk_push', limit).remaining == 1
+    assert buckets.take('1:stk_push', limit).allowed
+    denied = buckets.take('1:stk_push', limit)
+    assert not denied.allowed
+    assert denied.retry_after == 1
+    # Buckets are per key
+    assert buckets.take('2:stk_push', limit).allowed
+
+    time.sleep(0.06)
+    assert buckets.take('1:stk_push', limit).allowed
+
+def test_rate_limit_headers_and_429(app, client, business_headers):
+    app.config['RATE_LIMITS'] = 'stk_push_status=2/60,default=600/60'
+    app.config['SQL_PROFILER_HEADERS'] = True
+    ratelimit.init_app(app)
+
+    for remaining in ('1', '0'):
+        res = client.get('/stk-push/999', headers=business_headers)
+        assert res.status_code == 404
+        assert res.headers['X-RateLimit-Limit'] == '2'
+        assert res.headers['X-RateLimit-Remaining'] == remaining
+
+    res = client.get('/stk-push/999', headers=business_headers)
+    assert res.status_code == 429
+    assert int(res.headers['Retry-After']) > 0
+    # Rejected before any query: the tenant comes from the tenant cache
+    assert res.headers['X-DB-Query-Count'] == '0'
+
+    # Other routes have their own buckets
+    assert client.get('/transactions', headers=business_headers).headers['X-RateLimit-Limit'] == '600'
+
+def test_rejected_requests_skip_the_database_without_a_tenant_cache(app, client, business_headers):
+    app.config['TENANT_CACHE_TTL'] = 0
+    app.config['RATE_LIMITS'] = 'transactions=1/60,default=600/60'
+    app.config['SQL_PROFILER_HEADERS'] = True
+    ratelimit.init_app(app)
+
+    assert client.get('/transactions', headers=business_headers).status_code == 200
+    res = client.get('/transactions', headers=business_headers)
+    assert res.status_code == 429
+    assert res.headers['X-DB-Query-Count'] == '0'
+
+def test_admin_overrides_limits_per_business(app, client, admin_auth_client, active_business, business_headers):
+    app.config['RATE_LIMITS'] = 'default=600/60'
+    ratelimit.init_app(app)
+    admin_headers = {'Authorization': admin_auth_client.environ_base['HTTP_AUTHORIZATION']}
+
+    res = client.post(f'/admin/rate-limits/{active_business}', json={'stats': 'lots'}, headers=admin_headers)
+    assert res.status_code == 400
+
+    res = client.post(f'/admin/rate-limits/{active_business}', json={'stats': '1/60'}, headers=admin_headers)
+    assert res.json['overrides'] == {'stats': '1/60'}
+    res = client.get(f'/admin/rate-limits/{active_business}', headers=admin_headers)
+    assert res.json == {'defaults': {'default': '600/60'}, 'overrides': {'stats': '1/60'}}
+
+    assert client.get('/stats', headers=business_headers).status_code == 200
+    assert client.get('/stats', headers=business_headers).status_code == 429
+
+    # Back to the default
+    client.post(f'/admin/rate-limits/{active_business}', json={'stats': None}, headers=admin_headers)
+    res = client.get('/stats', headers=business_headers)
+    assert res.headers['X-RateLimit-Limit'] == '600'
@@ -0,0 +1,91 @@
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from backend.app import db
+from backend.app.models import Customer, Transaction, TransactionDailyRollup
+from backend.app.reconcile import TenantRateLimiter, query_result, reconcile_pending
+from backend.app.rollups import rebuild_rollups
+from backend.config import Config
+from conftest import add_pending
+
+
+def query_response(checkout_request_id, business_keys):
+    if checkout_request_id == 'ws_CO_PROCESSING':
+        return {'requestId': '1', 'errorCode': '500.001.1001', 'errorMessage': 'The transaction is being processed'}
+    result_code = '0' if checkout_request_id == 'ws_CO_PAID' else '1032'
+    return {'ResponseCode': '0', 'CheckoutRequestID': checkout_request_id, 'ResultCode': result_code}
+
+def statuses():
+    return {t.checkout_request_id: t.status for t in Transaction.query.all()}
+
+@patch('backend.app.reconcile.stk_push_query', side_effect=query_response)
+def test_reconcile_pending(mock_query, app, active_business):
+    add_pending(active_business, 'ws_CO_PAID', age_seconds=600)
+    add_pending(active_business, 'ws_CO_CANCELLED', age_seconds=600)
+    add_pending(active_business, 'ws_CO_PROCESSING', age_seconds=600)
+    add_pending(active_business, 'ws_CO_RECENT', age_seconds=5)
+    add_pending(active_business, 'ws_CO_ANCIENT', age_seconds=3 * 24 * 60 * 60)
+    rebuild_rollups()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        counts = reconcile_pending(executor, TenantRateLimiter(100), batch_size=2, older_than_seconds=120, expire_after_seconds=24 * 60 * 60)
+
+    assert counts == {'queried': 3, 'finalized': 2, 'expired': 1}
+    assert {call.args[0] for call in mock_query.call_args_list} == {'ws_CO_PAID', 'ws_CO_CANCELLED', 'ws_CO_PROCESSING'}
+    assert statuses() == {
+        'ws_CO_PAID': 'success',
+        'ws_CO_CANCELLED': 'failed',
+        'ws_CO_PROCESSING': 'pending',
+        'ws_CO_RECENT': 'pending',
+        'ws_CO_ANCIENT': 'expired',
+    }
+    assert Customer.query.one().transaction_count == 1
+
+    rollups = {}
+    for rollup in TransactionDailyRollup.query.all():
+        rollups[rollup.status] = rollups.get(rollup.status, 0) + rollup.count
+    assert rollups == {'success': 1, 'failed': 1, 'pending': 2, 'expired': 1}
+
+@patch('backend.app.reconcile.stk_push_query', side_effect=query_response)
+def test_pushes_past_the_default_cutoff_expire_without_a_query(mock_query, app, active_business):
+    add_pending(active_business, 'ws_CO_CANCELLED', age_seconds=5 * 60)
+    add_pending(active_business, 'ws_CO_TIMED_OUT', age_seconds=20 * 60)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        counts = reconcile_pending(executor, TenantRateLimiter(100), batch_size=10,
+                                   older_than_seconds=Config.RECONCILE_AFTER_SECONDS,
+                                   expire_after_seconds=Config.RECONCILE_EXPIRE_AFTER_SECONDS)
+
+    assert counts == {'queried': 1, 'finalized': 1, 'expired': 1}
+    assert [call.args[0] for call in mock_query.call_args_list] == ['ws_CO_CANCELLED']
+    assert statuses() == {'ws_CO_CANCELLED': 'failed', 'ws_CO_TIMED_OUT': 'expired'}
+
+def test_query_result():
+    assert query_result({'ResponseCode': '0', 'ResultCode': '0'}) == 0
+    assert query_result({'ResponseCode': '0', 'ResultCode': '1032'}) == 1032
+    assert query_result({'errorCode': '500.001.1001'}) is None
+    assert query_result({'error': 'timeout'}) is None
+    assert query_result(None) is None
+
+def test_tenant_rate_limiter_spaces_out_queries():
+    limiter = TenantRateLimiter(20)
+    started = time.monotonic()
+    for _ in range(25):
+        limiter.acquire(1)
+    limiter.acquire(2)
+    # 20 from the initial burst, then 5 more at 20 per second
+    assert time.monotonic() - started >= 0.2
+
+def test_stale_pending_uses_index(app):
+    now = datetime.datetime.utcnow()
+    sql = str(
+        db.select(Transaction.id)
+        .where(Transaction.status == 'pending', Transaction.timestamp < now, Transaction.timestamp >= now - datetime.timedelta(days=1))
+        .order_by(Transaction.timestamp, Transaction.id)
+        .compile(db.engine, compile_kwargs={'literal_binds': True})
+    )
+    plan = ' | '.join(row[-1] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}')))
+    assert 'ix_transaction_status_timestamp_id' in plan
+    assert 'TEMP B-TREE' not in plan
@@ -0,0 +1,89 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from backend.app import db
+from backend.app.callbacks import process_callback_inbox
+from backend.app.models import Transaction, TransactionDailyRollup
+from backend.app.rollups import rebuild_rollups
+from backend.app.stk_queue import enqueue_stk_push, process_queued_batch
+from conftest import callback_payload, stk_push_success
+
+
+def rollup_snapshot():
+    return sorted(
+        (r.business_id, r.day, r.status, r.count, r.amount)
+        for r in TransactionDailyRollup.query.all() if r.count
+    )
+
+@patch('backend.app.services.stk_push', side_effect=stk_push_success)
+def test_rollups_follow_transactions_through_callbacks(mock_stk_push, app, client, business_headers, active_business):
+    items = [{'phone_number': f'25470000000{i}', 'amount': 10 * (i + 1)} for i in range(3)]
+    client.post('/stk-push/bulk', headers=business_headers, json={'items': items})
+
+    client.post('/callback', json=callback_payload('ws_CO_254700000000'))
+    client.post('/callback', json=callback_payload('ws_CO_254700000001', result_code=1032))
+    # Redelivery must not move the rollups twice
+    client.post('/callback', json=callback_payload('ws_CO_254700000000'))
+    process_callback_inbox()
+
+    response = client.get('/stats', headers=business_headers)
+
+    assert response.status_code == 200
+    stats = response.json
+    assert stats['transaction_count'] == 3
+    assert stats['amount_requested'] == 60
+    assert stats['amount_collected'] == 10
+    assert stats['success_rate'] == 0.5
+    assert stats['by_status'] == {
+        'success': {'count': 1, 'amount': 10},
+        'failed': {'count': 1, 'amount': 20},
+        'pending': {'count': 1, 'amount': 30},
+    }
+
+def test_rollups_match_backfill(app, client, active_business):
+    with patch('backend.app.stk_queue.stk_push', side_effect=stk_push_success):
+        for i in range(4):
+            enqueue_stk_push(active_business, f'25471000000{i}', 5, 'ref', 'desc')
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            process_queued_batch(executor, 2)
+    client.post('/callback', json=callback_payload('ws_CO_254710000000'))
+    process_callback_inbox()
+
+    incremental = rollup_snapshot()
+    assert {status: count for _, _, status, count, _ in incremental} == {'queued': 2, 'pending': 1, 'success': 1}
+
+    rebuild_rollups()
+
+    assert rollup_snapshot() == incremental
+
+def test_stats_date_range(app, client, business_headers, active_business):
+    old = datetime.datetime.utcnow() - datetime.timedelta(days=60)
+    db.session.add(Transaction(amount=7, phone_number='254712345678', status='success', business_id=active_business, timestamp=old))
+    db.session.commit()
+    rebuild_rollups()
+
+    assert client.get('/stats', headers=business_headers).json['transaction_count'] == 0
+
+    day = old.date().isoformat()
+    stats = client.get(f'/stats?date_from={day}&date_to={day}', headers=business_headers).json
+    assert stats['transaction_count'] == 1
+    assert stats['daily'] == [{'date': day, 'status': 'success', 'count': 1, 'amount': 7}]
+
+    assert client.get('/stats?date_from=2026-02-01&date_to=2026-01-01', headers=business_headers).status_code == 400
+    assert client.get('/stats?date_from=yesterday', headers=business_headers).status_code == 400
+
+def test_admin_stats_cover_all_businesses(app, admin_auth_client, active_business):
+    now = datetime.datetime.utcnow()
+    db.session.add(Transaction(amount=3, phone_number='254712345678', status='pending', business_id=active_business, timestamp=now))
+    db.session.commit()
+    rebuild_rollups()
+
+    response = admin_auth_client.get('/admin/stats')
+    assert response.status_code == 200
+    assert response.json['transaction_count'] == 1
+
+    response = admin_auth_client.get(f'/admin/stats?business_id={active_business + 1}')
+    assert response.json['transaction_count'] == 0
+
+    assert admin_auth_client.get('/admin/stats?business_id=abc').status_code == 400
@@ -14,7 +14,7 @@ def mock_business_keys():
     mock_keys.paybill_number = None
     return mock_keys
 
-@patch('requests.get')
+@patch('app.services.transport.get')
 def test_get_mpesa_access_token_success(mock_get, app):
     mock_response = MagicMock()
     mock_response.status_code = 200
@@ -26,7 +26,7 @@ def test_get_mpesa_access_token_success(mock_get, app):
     assert token_response.get('access_token') == 'mock_access_token'
     mock_get.assert_called_once()
 
-@patch('requests.get')
+@patch('app.services.transport.get')
 def test_get_mpesa_access_token_failure(mock_get, app):
     mock_response = MagicMock()
     mock_response.status_code = 400
@@ -39,7 +39,7 @@ def test_get_mpesa_access_token_failure(mock_get, app):
     mock_get.assert_called_once()
 
 @patch('app.services.get_mpesa_access_token')
-@patch('requests.post')
+@patch('app.services.transport.post')
 def test_stk_push_success_till(mock_post, mock_get_token, app, mock_business_keys):
     mock_get_token.return_value = {'access_token': 'mock_access_token'}
     mock_post_response = MagicMock()
@@ -60,7 +60,7 @@ def test_stk_push_success_till(mock_post, mock_get_token, app, mock_business_key
     mock_post.assert_called_once()
     
 @patch('app.services.get_mpesa_access_token')
-@patch('requests.post')
+@patch('app.services.transport.post')
 def test_stk_push_success_paybill(mock_post, mock_get_token, app, mock_business_keys):
     mock_business_keys.till_number = None
     mock_business_keys.paybill_number = '600123' # Set paybill number
@@ -83,7 +83,7 @@ def test_stk_push_success_paybill(mock_post, mock_get_token, app, mock_business_
     mock_post.assert_called_once()
 
 @patch('app.services.get_mpesa_access_token')
-@patch('requests.post')
+@patch('app.services.transport.post')
 def test_stk_push_no_access_token(mock_post, mock_get_token, app, mock_business_keys):
     mock_get_token.return_value = {'error': 'token_error'} # Simulate no access token
     
@@ -95,7 +95,7 @@ def test_stk_push_no_access_token(mock_post, mock_get_token, app, mock_business_
     mock_post.assert_not_called()
 
 @patch('app.services.get_mpesa_access_token')
-@patch('requests.post')
+@patch('app.services.transport.post')
 def test_stk_push_mpesa_api_failure(mock_post, mock_get_token, app, mock_business_keys):
     mock_get_token.return_value = {'access_token': 'mock_access_token'}
     mock_post_response = MagicMock()
@@ -111,7 +111,7 @@ def test_stk_push_mpesa_api_failure(mock_post, mock_get_token, app, mock_busines
     mock_post.assert_called_once()
 
 @patch('app.services.get_mpesa_access_token')
-@patch('requests.post')
+@patch('app.services.transport.post')
 def test_stk_push_no_shortcode_configured(mock_post, mock_get_token, app):
     mock_keys = MagicMock()
     mock_keys.consumer_key = 'mock_consumer_key'
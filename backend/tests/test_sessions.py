@@ -0,0 +1,71 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+from backend.app import db
+from backend.app.models import RefreshToken
+from backend.app.passwords import PasswordChecker, PasswordCheckBusy
+
+
+def login(client):
+    res = client.post('/login', json={'email': 'active@business.com', 'password': 'password'})
+    assert res.status_code == 200
+    return res.json
+
+def refresh(client, refresh_token):
+    return client.post('/token/refresh', headers={'Authorization': f'Bearer {refresh_token}'})
+
+def test_refresh_rotates_tokens(app, client, active_business):
+    tokens = login(client)
+
+    res = refresh(client, tokens['refresh_token'])
+    assert res.status_code == 200
+    assert res.json['refresh_token'] != tokens['refresh_token']
+    assert client.get('/dashboard', headers={'Authorization': f"Bearer {res.json['access_token']}"}).status_code == 200
+
+    # Access tokens cannot be used to refresh
+    assert refresh(client, tokens['access_token']).status_code == 422
+
+    # A refresh right after (two tabs at once) is rejected without ending the session
+    assert refresh(client, tokens['refresh_token']).status_code == 401
+    assert refresh(client, res.json['refresh_token']).status_code == 200
+
+def test_reused_refresh_token_revokes_the_session(app, client, active_business):
+    app.config['REFRESH_TOKEN_REUSE_GRACE'] = 0
+    stolen = login(client)['refresh_token']
+    current = refresh(client, stolen).json['refresh_token']
+    other_session = login(client)['refresh_token']
+
+    assert refresh(client, stolen).status_code == 401
+    assert refresh(client, current).status_code == 401
+    # Only the session the leaked token belonged to is revoked
+    assert refresh(client, other_session).status_code == 200
+
+def test_logout_and_suspension_revoke_refresh_tokens(app, client, admin_auth_client, active_business):
+    tokens = login(client)
+    assert client.post('/logout', headers={'Authorization': f"Bearer {tokens['refresh_token']}"}).status_code == 200
+    assert refresh(client, tokens['refresh_token']).status_code == 401
+
+    tokens = login(client)
+    admin_auth_client.post(f'/admin/suspend/{active_business}')
+    assert refresh(client, tokens['refresh_token']).status_code == 401
+    assert RefreshToken.query.filter(RefreshToken.revoked_at == None).count() == 1 # the admin's own session
+
+def test_password_checker_is_bounded():
+    checker = PasswordChecker(workers=1, max_pending=1, wait=0.01)
+    password_hash = generate_password_hash('password')
+    assert checker.check(password_hash, 'password')
+    assert not checker.check(password_hash, 'wrong')
+    assert not checker.check(None, 'password')
+
+    checker.slots.acquire()
+    with pytest.raises(PasswordCheckBusy):
+        checker.check(password_hash, 'password')
+
+def test_login_answers_503_when_password_checks_are_saturated(app, client, active_business):
+    checker = PasswordChecker(workers=1, max_pending=1, wait=0.01)
+    checker.slots.acquire()
+    app.extensions['password_checker'] = checker
+
+    res = client.post('/login', json={'email': 'active@business.com', 'password': 'password'})
+    assert res.status_code == 503
+    assert res.headers['Retry-After'] == '1'
@@ -0,0 +1,160 @@
+from unittest.mock import patch
+from backend.app.models import Transaction
+from conftest import stk_push_success
+
+
+@patch('backend.app.services.stk_push', side_effect=stk_push_success)
+def test_bulk_stk_push_success(mock_stk_push, app, client, business_headers):
+    items = [{'phone_number': f'2547000000{i:02d}', 'amount': 10 + i} for i in range(20)]
+
+    response = client.post('/stk-push/bulk', headers=business_headers, json={'items': items})
+
+    assert response.status_code == 200
+    assert response.json['sent'] == 20
+    assert response.json['failed'] == 0
+    assert [r['index'] for r in response.json['results']] == list(range(20))
+    assert mock_stk_push.call_count == 20
+    assert Transaction.query.count() == 20
+    transaction = Transaction.query.filter_by(checkout_request_id='ws_CO_254700000005').first()
+    assert transaction.amount == 15
+    assert transaction.status == 'pending'
+    assert transaction.timestamp is not None
+
+@patch('backend.app.services.stk_push')
+def test_bulk_stk_push_partial_failure(mock_stk_push, app, client, business_headers):
+    mock_stk_push.side_effect = lambda phone_number, *args: (
+        {"ResponseCode": "0", "CheckoutRequestID": f"ws_CO_{phone_number}"}
+        if phone_number == '254700000001' else {"errorCode": "500.001.1001", "errorMessage": "Unable to lock subscriber"}
+    )
+    items = [{'phone_number': '254700000001', 'amount': 10}, {'phone_number': '254700000002', 'amount': 10}]
+
+    response = client.post('/stk-push/bulk', headers=business_headers, json={'items': items})
+
+    assert response.status_code == 200
+    assert [r['status'] for r in response.json['results']] == ['sent', 'failed']
+    assert response.json['results'][1]['error']['errorCode'] == '500.001.1001'
+    assert Transaction.query.count() == 1
+
+@patch('backend.app.services.stk_push')
+def test_bulk_stk_push_rejects_invalid_items_up_front(mock_stk_push, app, client, business_headers):
+    items = [
+        {'phone_number': '254700000001', 'amount': 10},
+        {'phone_number': 'not-a-phone', 'amount': 10},
+        {'phone_number': '254700000003', 'amount': -5},
+        {'amount': 10},
+    ]
+
+    response = client.post('/stk-push/bulk', headers=business_headers, json={'items': items})
+
+    assert response.status_code == 400
+    assert [e['index'] for e in response.json['errors']] == [1, 2, 3]
+    mock_stk_push.assert_not_called()
+
+@patch('backend.app.services.stk_push')
+def test_bulk_stk_push_enforces_max_items(mock_stk_push, app, client, business_headers):
+    app.config['BULK_STK_PUSH_MAX_ITEMS'] = 2
+    items = [{'phone_number': '254700000001', 'amount': 10}] * 3
+
+    response = client.post('/stk-push/bulk', headers=business_headers, json={'items': items})
+
+    assert response.status_code == 400
+    mock_stk_push.assert_not_called()
+
+@patch('backend.app.stk_queue.stk_push', side_effect=stk_push_success)
+def test_async_stk_push_is_queued_then_submitted(mock_stk_push, app, client, business_headers):
+    from concurrent.futures import ThreadPoolExecutor
+    from backend.app.stk_queue import process_queued_batch
+
+    app.config['STK_PUSH_MODE'] = 'async'
+
+    response = client.post('/stk-push', headers=business_headers, json={'phone_number': '254712345678', 'amount': 10})
+
+    assert response.status_code == 202
+    transaction_id = response.json['transaction_id']
+    assert response.json['status'] == 'queued'
+    mock_stk_push.assert_not_called()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert process_queued_batch(executor, 10) == 1
+        assert process_queued_batch(executor, 10) == 0
+
+    response = client.get(f'/stk-push/{transaction_id}', headers=business_headers)
+    assert response.status_code == 200
+    assert response.json['status'] == 'pending'
+    assert response.json['checkout_request_id'] == 'ws_CO_254712345678'
+    assert response.json['attempts'] == 1
+    mock_stk_push.assert_called_once()
+
+@patch('backend.app.stk_queue.stk_push', return_value={"errorCode": "400.002.02", "errorMessage": "Bad Request - Invalid Amount"})
+def test_async_stk_push_failure_is_recorded(mock_stk_push, app, client, business_headers):
+    from concurrent.futures import ThreadPoolExecutor
+    from backend.app.stk_queue import process_queued_batch
+
+    app.config['STK_PUSH_MODE'] = 'async'
+    response = client.post('/stk-push', headers=business_headers, json={'phone_number': '254712345678', 'amount': 10})
+    transaction_id = response.json['transaction_id']
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        process_queued_batch(executor, 10)
+
+    response = client.get(f'/stk-push/{transaction_id}', headers=business_headers)
+    assert response.json['status'] == 'failed'
+    assert response.json['error']['errorCode'] == '400.002.02'
+
+def test_claim_skips_rows_already_claimed(app, active_business):
+    from backend.app.stk_queue import enqueue_stk_push, claim_queued_transactions
+
+    for i in range(3):
+        enqueue_stk_push(active_business, f'25470000000{i}', 10, 'Ref', 'Desc')
+
+    assert len(claim_queued_transactions(2)) == 2
+    assert len(claim_queued_transactions(2)) == 1
+    assert claim_queued_transactions(2) == []
+
+def test_stk_push_status_is_scoped_to_business(app, client, business_headers):
+    from backend.app import db
+    from backend.app.models import Business
+
+    other = Business(email='other@business.com')
+    db.session.add(other)
+    db.session.commit()
+    transaction = Transaction(amount=10, phone_number='254700000001', business_id=other.id)
+    db.session.add(transaction)
+    db.session.commit()
+
+    response = client.get(f'/stk-push/{transaction.id}', headers=business_headers)
+    assert response.status_code == 404
+
+@patch('backend.app.stk_queue.get_tenant', side_effect=RuntimeError('database went away'))
+def test_submission_error_fails_the_claimed_row(mock_get_tenant, app, active_business):
+    from concurrent.futures import ThreadPoolExecutor
+    from backend.app import db
+    from backend.app.stk_queue import enqueue_stk_push, process_queued_batch
+
+    transaction_id = enqueue_stk_push(active_business, '254712345678', 10, 'Ref', 'Desc').id
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        process_queued_batch(executor, 10)
+
+    transaction = db.session.get(Transaction, transaction_id)
+    db.session.refresh(transaction)
+    assert transaction.status == 'failed'
+    assert 'database went away' in transaction.error
+
+def test_stale_claims_are_failed_not_resent(app, active_business):
+    import datetime
+    from backend.app import db
+    from backend.app.models import TransactionDailyRollup
+    from backend.app.stk_queue import claim_queued_transactions, enqueue_stk_push, expire_stale_claims
+
+    for i in range(2):
+        enqueue_stk_push(active_business, f'25470000000{i}', 10, 'Ref', 'Desc')
+    stale_id, fresh_id = claim_queued_transactions(2)
+    # The worker holding the first claim died long ago
+    db.session.get(Transaction, stale_id).claimed_at = datetime.datetime.utcnow() - datetime.timedelta(minutes=10)
+    db.session.commit()
+
+    assert expire_stale_claims(300) == 1
+    assert db.session.get(Transaction, stale_id).status == 'failed'
+    assert db.session.get(Transaction, fresh_id).status == 'submitting'
+    assert {r.status: r.count for r in TransactionDailyRollup.query.all() if r.count} == {'queued': 1, 'failed': 1}
+    assert claim_queued_transactions(2) == []
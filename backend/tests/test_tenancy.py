@@ -0,0 +1,72 @@
+import itertools
+
+from unittest.mock import patch
+from sqlalchemy import event
+from backend.app import db
+from backend.app.models import Business
+from backend.app.tenancy import get_tenant, invalidate_tenant
+
+checkout_ids = itertools.count()
+
+def count_queries(fn):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return len(statements)
+
+def test_tenant_snapshot_is_cached(app, active_business):
+    tenant = get_tenant(active_business)
+    assert tenant.is_active
+    assert tenant.shortcode == '54321'
+    assert tenant.credentials.consumer_key == 'active_consumer_key'
+
+    assert count_queries(lambda: get_tenant(active_business)) == 0
+
+    invalidate_tenant(active_business)
+    assert count_queries(lambda: get_tenant(active_business)) == 1
+
+def test_tenant_cache_can_be_disabled(app, active_business):
+    # Without a shared cache another process would not see invalidate_tenant
+    app.config['TENANT_CACHE_TTL'] = 0
+    get_tenant(active_business)
+    assert count_queries(lambda: get_tenant(active_business)) == 1
+
+    db.session.execute(db.update(Business).where(Business.id == active_business).values(is_active=False))
+    db.session.commit()
+    assert not get_tenant(active_business).is_active
+
+@patch('backend.app.routes.stk_push', side_effect=lambda *args: {"ResponseCode": "0", "CheckoutRequestID": f"ws_CO_{next(checkout_ids)}"})
+def test_suspension_takes_effect_immediately(mock_stk_push, app, client, admin_auth_client, active_business, business_headers):
+    payload = {'phone_number': '254712345678', 'amount': 10}
+    admin_headers = {'Authorization': admin_auth_client.environ_base['HTTP_AUTHORIZATION']}
+
+    assert client.post('/stk-push', headers=business_headers, json=payload).status_code == 200
+
+    assert client.post(f'/admin/suspend/{active_business}', headers=admin_headers).status_code == 200
+    assert client.post('/stk-push', headers=business_headers, json=payload).status_code == 403
+
+    assert client.post(f'/admin/reactivate/{active_business}', headers=admin_headers).status_code == 200
+    assert client.post('/stk-push', headers=business_headers, json=payload).status_code == 200
+
+@patch('backend.app.routes.stk_push', return_value={"ResponseCode": "1"})
+def test_settings_update_refreshes_credentials(mock_stk_push, app, client, active_business, business_headers):
+    get_tenant(active_business)
+
+    response = client.post('/settings/update', headers=business_headers, json={
+        'consumer_key': 'new_key', 'consumer_secret': 'new_secret', 'paybill_number': '600100'
+    })
+
+    assert response.status_code == 200
+    tenant = get_tenant(active_business)
+    assert tenant.credentials.consumer_key == 'new_key'
+    assert tenant.shortcode == '600100'
+    assert client.get('/settings', headers=business_headers).json['consumer_key'] == 'new_key'
+
+def test_admin_token_is_rejected_on_business_routes(app, admin_auth_client):
+    response = admin_auth_client.get('/transactions')
+    assert response.status_code == 403
+    assert response.json['message'] == 'Only businesses can view transactions'
@@ -0,0 +1,114 @@
+import threading
+import time
+
+from unittest.mock import MagicMock, patch
+from backend.app.cache import MemoryStore
+from backend.app.services import DarajaCredentials, stk_push
+from backend.app.token_cache import AccessTokenCache
+
+
+def test_token_is_fetched_once_and_reused():
+    cache = AccessTokenCache()
+    fetch = MagicMock(return_value={'access_token': 'token_1', 'expires_in': '3599'})
+
+    first = cache.get('key', 'secret', 'http://test.com', fetch)
+    second = cache.get('key', 'secret', 'http://test.com', fetch)
+
+    assert first['access_token'] == 'token_1'
+    assert second['access_token'] == 'token_1'
+    fetch.assert_called_once_with('key', 'secret')
+
+def test_tokens_are_keyed_by_base_url():
+    cache = AccessTokenCache()
+    fetch = MagicMock(return_value={'access_token': 'token_1', 'expires_in': '3599'})
+
+    cache.get('key', 'secret', 'http://sandbox.test', fetch)
+    cache.get('key', 'secret', 'http://live.test', fetch)
+
+    assert fetch.call_count == 2
+
+def test_token_is_refreshed_before_expiry():
+    cache = AccessTokenCache(refresh_margin=60)
+    # Expires inside the refresh margin, so it is never served from the cache
+    fetch = MagicMock(return_value={'access_token': 'short_lived', 'expires_in': '30'})
+
+    cache.get('key', 'secret', 'http://test.com', fetch)
+    cache.get('key', 'secret', 'http://test.com', fetch)
+
+    assert fetch.call_count == 2
+
+def test_error_responses_are_not_cached():
+    cache = AccessTokenCache()
+    fetch = MagicMock(side_effect=[
+        {'errorCode': '400.008.01', 'errorMessage': 'Invalid Authentication passed'},
+        {'access_token': 'token_1', 'expires_in': '3599'},
+    ])
+
+    error = cache.get('key', 'secret', 'http://test.com', fetch)
+    token = cache.get('key', 'secret', 'http://test.com', fetch)
+
+    assert 'access_token' not in error
+    assert token['access_token'] == 'token_1'
+
+def test_concurrent_misses_trigger_a_single_fetch():
+    cache = AccessTokenCache()
+    calls = []
+
+    def slow_fetch(consumer_key, consumer_secret):
+        calls.append(consumer_key)
+        time.sleep(0.1)
+        return {'access_token': 'token_1', 'expires_in': '3599'}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get('key', 'secret', 'http://test.com', slow_fetch)))
+        for _ in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert [r['access_token'] for r in results] == ['token_1'] * 10
+
+def test_shared_store_is_used_across_caches():
+    shared = MemoryStore()
+    fetch = MagicMock(return_value={'access_token': 'token_1', 'expires_in': '3599'})
+
+    AccessTokenCache(shared_store=shared).get('key', 'secret', 'http://test.com', fetch)
+    # A second worker with its own local LRU picks the token up from the shared store
+    result = AccessTokenCache(shared_store=shared).get('key', 'secret', 'http://test.com', fetch)
+
+    assert result['access_token'] == 'token_1'
+    fetch.assert_called_once()
+
+def test_key_locks_are_dropped_when_unused():
+    store = MemoryStore(max_entries=2)
+    for i in range(100):
+        with store.lock(f'key-{i}'):
+            pass
+    assert store._key_locks == {}
+
+@patch('backend.app.services.transport.post')
+@patch('backend.app.services.transport.get')
+def test_rejected_token_is_evicted_and_request_retried_once(mock_get, mock_post, app):
+    mock_get.side_effect = [
+        MagicMock(status_code=200, json=lambda: {'access_token': 'revoked', 'expires_in': '3599'}),
+        MagicMock(status_code=200, json=lambda: {'access_token': 'fresh', 'expires_in': '3599'}),
+    ]
+    mock_post.side_effect = [
+        MagicMock(status_code=404, json=lambda: {'errorCode': '404.001.03', 'errorMessage': 'Invalid Access Token'}),
+        MagicMock(status_code=200, json=lambda: {'ResponseCode': '0', 'CheckoutRequestID': 'ws_CO_1'}),
+    ]
+    credentials = DarajaCredentials('rejected_key', 'secret', '54321', None)
+
+    assert stk_push('254712345678', 10, credentials, 'ref', 'desc')['ResponseCode'] == '0'
+    assert mock_get.call_count == 2
+    assert mock_post.call_args.kwargs['headers']['Authorization'] == 'Bearer fresh'
+
+    # The fresh token is cached; a second rejection is returned rather than retried again
+    mock_post.side_effect = [MagicMock(status_code=401, json=lambda: {}), MagicMock(status_code=401, json=lambda: {})]
+    mock_get.side_effect = [MagicMock(status_code=200, json=lambda: {'access_token': 'fresh_2', 'expires_in': '3599'})]
+    stk_push('254712345678', 10, credentials, 'ref', 'desc')
+    assert mock_post.call_count == 4
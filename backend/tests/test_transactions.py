@@ -0,0 +1,74 @@
+import datetime
+
+from backend.app import db
+from backend.app.models import Transaction
+
+
+def seed_transactions(business_id, count, start=datetime.datetime(2026, 1, 1, 8, 0, 0)):
+    for i in range(count):
+        db.session.add(Transaction(
+            amount=i + 1,
+            phone_number=f'25470000000{i % 3}',
+            status='success' if i % 2 else 'failed',
+            checkout_request_id=f'ws_CO_{business_id}_{i}',
+            # Pairs of rows share a timestamp to exercise the id tie-breaker
+            timestamp=start + datetime.timedelta(hours=i // 2),
+            business_id=business_id
+        ))
+    db.session.commit()
+
+def test_transactions_are_paginated_with_cursor(app, client, active_business, business_headers):
+    seed_transactions(active_business, 25)
+
+    seen = []
+    response = client.get('/transactions?limit=10', headers=business_headers)
+    while True:
+        assert response.status_code == 200
+        seen.extend(t['id'] for t in response.json)
+        next_cursor = response.headers.get('X-Next-Cursor')
+        if not next_cursor:
+            break
+        assert 'rel="next"' in response.headers['Link']
+        response = client.get(f'/transactions?limit=10&cursor={next_cursor}', headers=business_headers)
+
+    assert len(seen) == 25
+    assert len(set(seen)) == 25
+    expected = [t.id for t in Transaction.query.order_by(Transaction.timestamp.desc(), Transaction.id.desc())]
+    assert seen == expected
+
+def test_transactions_filters(app, client, active_business, business_headers):
+    seed_transactions(active_business, 10)
+
+    response = client.get('/transactions?status=success', headers=business_headers)
+    assert {t['status'] for t in response.json} == {'success'}
+    assert len(response.json) == 5
+
+    response = client.get('/transactions?phone_number=254700000000', headers=business_headers)
+    assert {t['phone_number'] for t in response.json} == {'254700000000'}
+
+    response = client.get('/transactions?date_from=2026-01-01T10:00:00&date_to=2026-01-01T11:00:00', headers=business_headers)
+    assert len(response.json) == 4
+
+    response = client.get('/transactions?date_to=2026-01-01', headers=business_headers)
+    assert len(response.json) == 10
+
+def test_transactions_rejects_bad_parameters(app, client, business_headers):
+    assert client.get('/transactions?cursor=garbage', headers=business_headers).status_code == 400
+    assert client.get('/transactions?limit=0', headers=business_headers).status_code == 400
+    assert client.get('/transactions?date_from=yesterday', headers=business_headers).status_code == 400
+
+def test_admin_transactions_are_paginated(app, admin_auth_client, active_business):
+    seed_transactions(active_business, 7)
+
+    response = admin_auth_client.get('/admin/transactions?limit=5')
+    assert response.status_code == 200
+    assert len(response.json) == 5
+    next_cursor = response.headers['X-Next-Cursor']
+
+    response = admin_auth_client.get(f'/admin/transactions?limit=5&cursor={next_cursor}')
+    assert len(response.json) == 2
+    assert 'X-Next-Cursor' not in response.headers
+
+    response = admin_auth_client.get(f'/admin/transactions?business_id={active_business + 1}')
+    assert response.json == []
+    assert admin_auth_client.get('/admin/transactions?business_id=abc').status_code == 400
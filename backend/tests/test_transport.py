@@ -0,0 +1,45 @@
+import requests
+
+from unittest.mock import patch, MagicMock
+from backend.app import transport
+from backend.app.services import get_mpesa_access_token
+
+
+def test_session_is_created_once_per_process(app):
+    with app.app_context():
+        assert transport.get_session() is transport.get_session()
+        assert transport.get_session('daraja') is not transport.get_session('other')
+
+def test_session_is_dropped_after_fork(app):
+    with app.app_context():
+        parent_session = transport.get_session()
+        transport._reset_after_fork()
+        assert transport.get_session() is not parent_session
+
+def test_requests_use_configured_timeouts(app):
+    app.config['MPESA_HTTP_CONNECT_TIMEOUT'] = 2
+    app.config['MPESA_HTTP_READ_TIMEOUT'] = 7
+    with app.app_context():
+        with patch.object(transport.get_session(), 'request') as mock_request:
+            transport.get('http://test.com/ping')
+    mock_request.assert_called_once_with('GET', 'http://test.com/ping', timeout=(2, 7))
+
+def test_pinned_session_verifies_tls_against_the_host_header(app):
+    with app.app_context():
+        adapter = transport.get_session('webhooks').get_adapter('https://93.184.216.34/hooks')
+    request = requests.Request('POST', 'https://93.184.216.34/hooks', headers={'Host': 'tenant.example.com'}).prepare()
+
+    host_params, pool_kwargs = adapter.build_connection_pool_key_attributes(request, True)
+
+    assert host_params['host'] == '93.184.216.34'
+    assert pool_kwargs['server_hostname'] == 'tenant.example.com'
+    assert pool_kwargs['assert_hostname'] == 'tenant.example.com'
+
+@patch('backend.app.services.transport.get')
+def test_token_fetch_timeout_returns_error(mock_get, app):
+    mock_get.side_effect = requests.exceptions.ConnectTimeout('connect timed out')
+
+    with app.app_context():
+        error_response = get_mpesa_access_token('key', 'secret')
+    assert error_response['error'] == 'timeout'
+    assert 'access_token' not in error_response
@@ -0,0 +1,183 @@
+import datetime
+import json
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from backend.app import db
+from backend.app.callbacks import process_stk_callback
+from backend.app.models import Business, WebhookEvent
+from backend.app.reconcile import expire_stale
+from backend.app.webhooks import backoff_seconds, claim_due_events, pinned_url, process_due_events, sign, valid_webhook_url
+from conftest import add_pending
+
+
+@pytest.fixture(autouse=True)
+def public_dns():
+    # tenant.example.com resolves to a public address without a network lookup
+    with patch('backend.app.webhooks.resolve_host', return_value={'93.184.216.34'}) as mock_resolve:
+        yield mock_resolve
+
+def set_webhook(business_id, url='https://tenant.example.com/hooks', secret='s3cret'):
+    business = db.session.get(Business, business_id)
+    business.webhook_url = url
+    business.webhook_secret = secret
+    db.session.commit()
+
+def response(status_code):
+    mock = MagicMock(status_code=status_code, text='')
+    return mock
+
+def test_webhook_settings(client, business_headers):
+    assert client.get('/settings/webhook', headers=business_headers).status_code == 404
+    assert client.post('/settings/webhook', json={'webhook_url': 'ftp://nope'}, headers=business_headers).status_code == 400
+
+    res = client.post('/settings/webhook', json={'webhook_url': 'https://tenant.example.com/hooks'}, headers=business_headers)
+    assert res.status_code == 200
+    secret = res.json['webhook_secret']
+    assert len(secret) == 64
+
+    # Changing the URL keeps the secret unless asked to rotate it
+    res = client.post('/settings/webhook', json={'webhook_url': 'https://tenant.example.com/v2'}, headers=business_headers)
+    assert 'webhook_secret' not in res.json
+    res = client.post('/settings/webhook', json={'webhook_url': 'https://tenant.example.com/v2', 'rotate_secret': True}, headers=business_headers)
+    assert res.json['webhook_secret'] != secret
+
+    assert client.get('/settings/webhook', headers=business_headers).json == {'webhook_url': 'https://tenant.example.com/v2'}
+    assert client.delete('/settings/webhook', headers=business_headers).status_code == 200
+    assert client.get('/settings/webhook', headers=business_headers).status_code == 404
+
+def test_finalized_transactions_go_to_the_outbox(app, active_business):
+    add_pending(active_business, 'ws_CO_NO_HOOK')
+    process_stk_callback({'CheckoutRequestID': 'ws_CO_NO_HOOK', 'ResultCode': 0})
+    assert WebhookEvent.query.count() == 0
+
+    set_webhook(active_business)
+    add_pending(active_business, 'ws_CO_PAID', amount=25)
+    add_pending(active_business, 'ws_CO_CANCELLED')
+    process_stk_callback({'CheckoutRequestID': 'ws_CO_PAID', 'ResultCode': 0})
+    process_stk_callback({'CheckoutRequestID': 'ws_CO_CANCELLED', 'ResultCode': 1032})
+    # A redelivered callback does not produce a second event
+    process_stk_callback({'CheckoutRequestID': 'ws_CO_PAID', 'ResultCode': 0})
+
+    events = WebhookEvent.query.order_by(WebhookEvent.id).all()
+    assert [event.event_type for event in events] == ['transaction.success', 'transaction.failed']
+    payload = json.loads(events[0].payload)
+    assert payload['checkout_request_id'] == 'ws_CO_PAID'
+    assert payload['amount'] == 25
+    assert payload['status'] == 'success'
+
+def test_expired_transactions_go_to_the_outbox(app, active_business):
+    set_webhook(active_business)
+    add_pending(active_business, 'ws_CO_ANCIENT', age_seconds=3 * 24 * 60 * 60)
+    assert expire_stale(datetime.datetime.utcnow() - datetime.timedelta(days=1), 10) == 1
+    event = WebhookEvent.query.one()
+    assert event.event_type == 'transaction.expired'
+    assert json.loads(event.payload)['status'] == 'expired'
+
+@patch('backend.app.webhooks.transport.post', return_value=response(200))
+def test_delivery_batches_and_signs_events(mock_post, app, active_business):
+    app.config['WEBHOOK_BATCH_SIZE'] = 2
+    set_webhook(active_business)
+    for i in range(3):
+        add_pending(active_business, f'ws_CO_{i}')
+        process_stk_callback({'CheckoutRequestID': f'ws_CO_{i}', 'ResultCode': 0})
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert process_due_events(executor, 10) == 3
+
+    assert mock_post.call_count == 2
+    sizes = []
+    for call in mock_post.call_args_list:
+        # Sent to the address that was checked, not resolved again
+        assert call.args[0] == 'https://93.184.216.34/hooks'
+        body = call.kwargs['data']
+        headers = call.kwargs['headers']
+        assert headers['Host'] == 'tenant.example.com'
+        assert headers['X-Webhook-Signature'] == f"sha256={sign('s3cret', headers['X-Webhook-Timestamp'], body)}"
+        sizes.append(len(json.loads(body)['events']))
+    assert sorted(sizes) == [1, 2]
+
+    assert {event.status for event in WebhookEvent.query.all()} == {'delivered'}
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert process_due_events(executor, 10) == 0
+
+@patch('backend.app.webhooks.transport.post', return_value=response(500))
+def test_failed_delivery_backs_off_then_gives_up(mock_post, app, active_business):
+    app.config['WEBHOOK_MAX_ATTEMPTS'] = 2
+    set_webhook(active_business)
+    add_pending(active_business, 'ws_CO_PAID')
+    process_stk_callback({'CheckoutRequestID': 'ws_CO_PAID', 'ResultCode': 0})
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        process_due_events(executor, 10)
+        event = WebhookEvent.query.one()
+        assert (event.status, event.attempts) == ('pending', 1)
+        assert event.next_attempt_at > datetime.datetime.utcnow()
+        assert event.last_error.startswith('HTTP 500')
+
+        # Not due yet
+        assert process_due_events(executor, 10) == 0
+        event.next_attempt_at = datetime.datetime.utcnow()
+        db.session.commit()
+        process_due_events(executor, 10)
+
+    event = WebhookEvent.query.one()
+    assert (event.status, event.attempts) == ('failed', 2)
+    assert mock_post.call_count == 2
+
+def test_claimed_events_are_leased(app, active_business):
+    set_webhook(active_business)
+    add_pending(active_business, 'ws_CO_PAID')
+    process_stk_callback({'CheckoutRequestID': 'ws_CO_PAID', 'ResultCode': 0})
+
+    assert len(claim_due_events(10, lease_seconds=300)) == 1
+    assert claim_due_events(10, lease_seconds=300) == []
+
+    # A worker that died mid-delivery gives the event back when its lease runs out
+    event = WebhookEvent.query.one()
+    event.next_attempt_at = datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+    db.session.commit()
+    assert len(claim_due_events(10, lease_seconds=300)) == 1
+    assert WebhookEvent.query.one().attempts == 2
+
+def test_backoff_grows_and_is_capped():
+    assert 15 <= backoff_seconds(1, 30, 3600) <= 30
+    assert 60 <= backoff_seconds(3, 30, 3600) <= 120
+    assert backoff_seconds(20, 30, 3600) <= 3600
+
+def test_webhook_urls_must_be_public_https(app, client, business_headers):
+    for url in ['http://tenant.example.com/hooks', 'https://localhost/hooks', 'https://127.0.0.1/hooks',
+                'https://169.254.169.254/latest/meta-data', 'https://10.0.0.5/hooks', 'https://[::1]/hooks',
+                'https://[::ffff:192.168.1.1]/hooks', 'https://tenant.example.com:99999/hooks']:
+        assert not valid_webhook_url(url), url
+    assert valid_webhook_url('https://tenant.example.com/hooks')
+    assert valid_webhook_url('https://93.184.216.34:8443/hooks')
+
+    res = client.post('/settings/webhook', json={'webhook_url': 'https://169.254.169.254/'}, headers=business_headers)
+    assert res.status_code == 400
+
+    app.config['WEBHOOK_ALLOW_PRIVATE_URLS'] = True
+    assert valid_webhook_url('http://localhost:5001/hooks')
+
+@patch('backend.app.webhooks.transport.post', return_value=response(200))
+def test_delivery_refuses_hosts_resolving_to_private_addresses(mock_post, app, active_business, public_dns):
+    public_dns.return_value = {'93.184.216.34', '10.0.0.5'}
+    set_webhook(active_business)
+    add_pending(active_business, 'ws_CO_REBOUND')
+    process_stk_callback({'CheckoutRequestID': 'ws_CO_REBOUND', 'ResultCode': 0})
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        process_due_events(executor, 10)
+
+    event = WebhookEvent.query.one()
+    assert event.status == 'pending'
+    assert 'non-public address' in event.last_error
+    mock_post.assert_not_called()
+
+def test_pinned_url_keeps_the_port_and_host_header():
+    assert pinned_url('https://tenant.example.com:8443/hooks?v=1', '93.184.216.34') == \
+        ('https://93.184.216.34:8443/hooks?v=1', 'tenant.example.com:8443')
+    assert pinned_url('https://tenant.example.com/hooks', '2606:2800::1') == \
+        ('https://[2606:2800::1]/hooks', 'tenant.example.com')
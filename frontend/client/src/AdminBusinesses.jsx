@@ -1,40 +1,56 @@
 import React, { useState, useEffect } from 'react';
+import { authFetch } from './auth';
 
 const AdminBusinesses = () => {
     const [businesses, setBusinesses] = useState([]);
     const [loading, setLoading] = useState(true);
+    const [searchTerm, setSearchTerm] = useState('');
+    const [nextCursor, setNextCursor] = useState(null);
 
-    useEffect(() => {
-        const fetchBusinesses = async () => {
-            const token = localStorage.getItem('token');
-            try {
-                const response = await fetch(`${import.meta.env.VITE_API_BASE_URL}/admin/businesses`, {
-                    headers: { 'Authorization': `Bearer ${token}` }
-                });
-                if (response.ok) {
-                    const data = await response.json();
-                    setBusinesses(data);
-                } else {
-                    console.error('Failed to fetch businesses:', response.status, response.statusText);
-                    // Optionally, show a user-friendly error message
-                }
-            } catch (error) {
-                console.error('Network error fetching businesses:', error);
+    // Each page comes with its totals from the server; `cursor` appends the next page
+    const fetchBusinesses = async (search, cursor = null) => {
+        const params = new URLSearchParams();
+        if (search) params.set('search', search);
+        if (cursor) params.set('cursor', cursor);
+        try {
+            const response = await authFetch(`/admin/businesses?${params}`);
+            if (response.ok) {
+                const data = await response.json();
+                setBusinesses(previous => cursor ? [...previous, ...data] : data);
+                setNextCursor(response.headers.get('X-Next-Cursor'));
+            } else {
+                console.error('Failed to fetch businesses:', response.status, response.statusText);
                 // Optionally, show a user-friendly error message
-            } finally {
-                setLoading(false);
             }
-        };
-        fetchBusinesses();
-    }, []);
-    
+        } catch (error) {
+            console.error('Network error fetching businesses:', error);
+            // Optionally, show a user-friendly error message
+        } finally {
+            setLoading(false);
+        }
+    };
+
+    useEffect(() => {
+        const timer = setTimeout(() => fetchBusinesses(searchTerm.trim()), 300);
+        return () => clearTimeout(timer);
+    }, [searchTerm]);
+
     if (loading) {
         return <div>Loading...</div>;
     }
 
     return (
         <div>
-            <h2 className="text-3xl font-bold text-neutral-800 mb-6">Manage Businesses</h2>
+            <div className="flex flex-col md:flex-row justify-between items-center mb-6 gap-4">
+                <h2 className="text-3xl font-bold text-neutral-800">Manage Businesses</h2>
+                <input
+                    type="text"
+                    placeholder="Search email or phone..."
+                    className="input-base w-full md:w-64"
+                    value={searchTerm}
+                    onChange={e => setSearchTerm(e.target.value)}
+                />
+            </div>
             <div className="card-base overflow-hidden">
                 <div className="overflow-x-auto">
                     <table className="table-base"> {/* Apply the new table-base class */}
@@ -44,6 +60,11 @@ const AdminBusinesses = () => {
                                 <th>Phone Number</th>
                                 <th>Email</th>
                                 <th>Created At</th>
+                                <th>Transactions</th>
+                                <th>Success Rate</th>
+                                <th>Collected (KES)</th>
+                                <th>Customers</th>
+                                <th>Last Activity</th>
                                 <th>Status</th>
                                 {/* Add actions column header if suspension/reactivation is done here */}
                             </tr>
@@ -56,10 +77,15 @@ const AdminBusinesses = () => {
                                         <td>{business.phone_number}</td>
                                         <td>{business.email}</td>
                                         <td>{new Date(business.created_at).toLocaleDateString()}</td>
+                                        <td>{business.transaction_count}</td>
+                                        <td>{business.success_rate === null ? '-' : `${(business.success_rate * 100).toFixed(1)}%`}</td>
+                                        <td>{business.amount_collected.toLocaleString()}</td>
+                                        <td>{business.customer_count}</td>
+                                        <td>{business.last_activity ? new Date(business.last_activity).toLocaleString() : '-'}</td>
                                         <td>
                                             <span className={`px-2 py-1 rounded-full text-xs font-medium ${
-                                                business.is_active 
-                                                    ? 'bg-success-100 text-success-800' 
+                                                business.is_active
+                                                    ? 'bg-success-100 text-success-800'
                                                     : 'bg-error-100 text-error-800'
                                             }`}>
                                                 {business.is_active ? 'Active' : 'Suspended'}
@@ -70,13 +96,20 @@ const AdminBusinesses = () => {
                                 ))
                             ) : (
                                 <tr>
-                                    <td colSpan="5" className="text-center p-8 text-neutral-500">No businesses found.</td>
+                                    <td colSpan="10" className="text-center p-8 text-neutral-500">No businesses found.</td>
                                 </tr>
                             )}
                         </tbody>
                     </table>
                 </div>
             </div>
+            {nextCursor && (
+                <div className="flex justify-center mt-4">
+                    <button className="btn-secondary" onClick={() => fetchBusinesses(searchTerm.trim(), nextCursor)}>
+                        Load more
+                    </button>
+                </div>
+            )}
         </div>
     );
 };
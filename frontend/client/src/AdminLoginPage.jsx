@@ -1,5 +1,6 @@
 import React, { useState } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
+import { saveSession } from './auth';
 
 const AdminLoginPage = () => {
     const [email, setEmail] = useState('');
@@ -19,7 +20,7 @@ const AdminLoginPage = () => {
 
         if (response.ok) {
             const data = await response.json();
-            localStorage.setItem('token', data.access_token);
+            saveSession(data);
             navigate('/dashboard');
         } else {
             setError('Admin login failed. Please check your credentials.');
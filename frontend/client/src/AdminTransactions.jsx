@@ -1,32 +1,49 @@
 import React, { useState, useEffect } from 'react';
+import { authFetch } from './auth';
+
+const STATUSES = ['queued', 'pending', 'success', 'failed', 'expired'];
+const EMPTY_FILTERS = { status: '', phone_number: '', business_id: '', date_from: '', date_to: '' };
 
 const AdminTransactions = () => {
     const [transactions, setTransactions] = useState([]);
     const [loading, setLoading] = useState(true);
+    const [filters, setFilters] = useState(EMPTY_FILTERS);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [error, setError] = useState('');
 
-    useEffect(() => {
-        const fetchTransactions = async () => {
-            const token = localStorage.getItem('token');
-            try {
-                const response = await fetch(`${import.meta.env.VITE_API_BASE_URL}/admin/transactions`, {
-                    headers: { 'Authorization': `Bearer ${token}` }
-                });
-                if (response.ok) {
-                    const data = await response.json();
-                    setTransactions(data);
-                } else {
-                    console.error('Failed to fetch transactions:', response.status, response.statusText);
-                    // Optionally, show a user-friendly error message
-                }
-            } catch (error) {
-                console.error('Network error fetching transactions:', error);
-                // Optionally, show a user-friendly error message
-            } finally {
-                setLoading(false);
+    // The API returns one page at a time; `cursor` appends the next page to the list
+    const fetchTransactions = async (cursor = null) => {
+        const params = new URLSearchParams();
+        Object.entries(filters).forEach(([name, value]) => {
+            if (value.trim()) params.set(name, value.trim());
+        });
+        if (cursor) params.set('cursor', cursor);
+        try {
+            const response = await authFetch(`/admin/transactions?${params}`);
+            if (response.ok) {
+                const data = await response.json();
+                setTransactions(previous => cursor ? [...previous, ...data] : data);
+                setNextCursor(response.headers.get('X-Next-Cursor'));
+                setError('');
+            } else {
+                const data = await response.json().catch(() => ({}));
+                setError(data.message || 'Failed to fetch transactions.');
+                console.error('Failed to fetch transactions:', response.status, response.statusText);
             }
-        };
-        fetchTransactions();
-    }, []);
+        } catch (error) {
+            console.error('Network error fetching transactions:', error);
+            // Optionally, show a user-friendly error message
+        } finally {
+            setLoading(false);
+        }
+    };
+
+    useEffect(() => {
+        const timer = setTimeout(() => fetchTransactions(), 300);
+        return () => clearTimeout(timer);
+    }, [filters]);
+
+    const updateFilter = (name) => (e) => setFilters({ ...filters, [name]: e.target.value });
 
     if (loading) {
         return <div>Loading...</div>;
@@ -35,6 +52,32 @@ const AdminTransactions = () => {
     return (
         <div>
             <h2 className="text-3xl font-bold text-neutral-800 mb-6">All Transactions</h2>
+            <div className="flex flex-col md:flex-row flex-wrap gap-4 mb-6">
+                <select className="input-base w-full md:w-40" value={filters.status} onChange={updateFilter('status')}>
+                    <option value="">All statuses</option>
+                    {STATUSES.map(status => <option key={status} value={status}>{status}</option>)}
+                </select>
+                <input
+                    type="text"
+                    placeholder="Phone number"
+                    className="input-base w-full md:w-48"
+                    value={filters.phone_number}
+                    onChange={updateFilter('phone_number')}
+                />
+                <input
+                    type="number"
+                    placeholder="Business ID"
+                    className="input-base w-full md:w-32"
+                    value={filters.business_id}
+                    onChange={updateFilter('business_id')}
+                />
+                <input type="date" className="input-base w-full md:w-44" value={filters.date_from} onChange={updateFilter('date_from')} />
+                <input type="date" className="input-base w-full md:w-44" value={filters.date_to} onChange={updateFilter('date_to')} />
+                <button className="btn-secondary" onClick={() => setFilters(EMPTY_FILTERS)}>
+                    Clear
+                </button>
+            </div>
+            {error && <p className="bg-error-500 text-white p-3 rounded-lg mb-4">{error}</p>}
             <div className="card-base overflow-hidden">
                 <div className="overflow-x-auto">
                     <table className="table-base"> {/* Apply the new table-base class */}
@@ -77,6 +120,13 @@ const AdminTransactions = () => {
                     </table>
                 </div>
             </div>
+            {nextCursor && (
+                <div className="flex justify-center mt-4">
+                    <button className="btn-secondary" onClick={() => fetchTransactions(nextCursor)}>
+                        Load more
+                    </button>
+                </div>
+            )}
         </div>
     );
 };
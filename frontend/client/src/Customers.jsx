@@ -1,4 +1,5 @@
 import React, { useState, useEffect } from 'react';
+import { authFetch } from './auth';
 
 const Customers = () => {
     const [customers, setCustomers] = useState([]);
@@ -6,12 +7,9 @@ const Customers = () => {
 
     useEffect(() => {
         const fetchCustomers = async () => {
-            const token = localStorage.getItem('token');
             // Error handling for fetch
             try {
-                const response = await fetch(`${import.meta.env.VITE_API_BASE_URL}/customers`, {
-                    headers: { 'Authorization': `Bearer ${token}` }
-                });
+                const response = await authFetch('/customers');
                 if (response.ok) {
                     const data = await response.json();
                     setCustomers(data);
@@ -33,11 +31,8 @@ const Customers = () => {
     );
 
     const handleExport = async () => {
-        const token = localStorage.getItem('token');
         try {
-            const response = await fetch(`${import.meta.env.VITE_API_BASE_URL}/customers/export-excel`, {
-                headers: { 'Authorization': `Bearer ${token}` }
-            });
+            const response = await authFetch('/customers/export-excel');
 
             if (response.ok) {
                 const blob = await response.blob();
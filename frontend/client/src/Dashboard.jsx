@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Outlet, useNavigate, Link, useLocation } from 'react-router-dom';
+import { authFetch, clearSession } from './auth';
 
 // Simple SVG icons for navigation
 const HomeIcon = ({ className }) => <svg xmlns="http://www.w3.org/2000/svg" className={className} fill="none" viewBox="0 0 24 24" stroke="currentColor"><path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M3 12l2-2m0 0l7-7 7 7M5 10v10a1 1 0 001 1h3m10-11l2 2m-2-2v10a1 1 0 01-1 1h-3m-6 0a1 1 0 001-1v-4a1 1 0 011-1h2a1 1 0 011 1v4a1 1 0 001 1m-6 0h6" /></svg>;
@@ -41,27 +42,25 @@ const Dashboard = () => {
 
     useEffect(() => {
         const fetchUserData = async () => {
-            const token = localStorage.getItem('token');
-            if (!token) {
+            if (!localStorage.getItem('token')) {
                 navigate('/login');
                 return;
             }
 
             try {
-                const response = await fetch(`${import.meta.env.VITE_API_BASE_URL}/dashboard`, {
-                    headers: { 'Authorization': `Bearer ${token}` }
-                });
+                // An expired access token is renewed without asking for the password again
+                const response = await authFetch('/dashboard');
 
                 if (response.ok) {
                     const data = await response.json();
                     setUser(data);
                 } else {
-                    localStorage.removeItem('token');
+                    await clearSession();
                     navigate('/login');
                 }
             } catch (error) {
                 console.error("Failed to fetch user data:", error);
-                localStorage.removeItem('token');
+                await clearSession();
                 navigate('/login');
             }
         };
@@ -69,8 +68,8 @@ const Dashboard = () => {
         fetchUserData();
     }, [navigate, location.pathname]);
 
-    const handleLogout = () => {
-        localStorage.removeItem('token');
+    const handleLogout = async () => {
+        await clearSession();
         navigate('/login');
     };
 
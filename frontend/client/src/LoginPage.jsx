@@ -1,5 +1,6 @@
 import React, { useState } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
+import { saveSession } from './auth';
 
 const LoginPage = () => {
     const [email, setEmail] = useState('');
@@ -19,7 +20,7 @@ const LoginPage = () => {
 
         if (response.ok) {
             const data = await response.json();
-            localStorage.setItem('token', data.access_token);
+            saveSession(data);
             navigate('/dashboard');
         } else if (response.status === 404) {
             navigate('/signup', { state: { email: email } });
@@ -1,4 +1,5 @@
 import React, { useState, useEffect } from 'react';
+import { authFetch } from './auth';
 
 const SendStkPush = () => {
     const [phone, setPhone] = useState('');
@@ -30,14 +31,8 @@ const SendStkPush = () => {
     };
 
     const pollTransactionStatus = async (id) => {
-        const token = localStorage.getItem('token');
         try {
-            const response = await fetch(`${import.meta.env.VITE_API_BASE_URL}/transaction-status/${id}`, {
-                method: 'GET',
-                headers: {
-                    'Authorization': `Bearer ${token}`
-                }
-            });
+            const response = await authFetch(`/transaction-status/${id}`);
 
             if (response.ok) {
                 const data = await response.json();
@@ -75,14 +70,10 @@ const SendStkPush = () => {
         setCheckoutRequestID(null); // Reset for new transaction
         setNotification({ message: '', type: '' }); // Clear previous notification
 
-        const token = localStorage.getItem('token');
         try {
-            const response = await fetch(`${import.meta.env.VITE_API_BASE_URL}/stk-push`, {
+            const response = await authFetch('/stk-push', {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'Authorization': `Bearer ${token}`
-                },
+                headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ phone_number: phone, amount: Number(amount) }),
             });
 
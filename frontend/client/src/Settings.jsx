@@ -1,4 +1,5 @@
 import React, { useState, useEffect } from 'react';
+import { authFetch } from './auth';
 
 const Settings = () => {
     const [consumerKey, setConsumerKey] = useState('');
@@ -15,11 +16,8 @@ const Settings = () => {
 
     useEffect(() => {
         const fetchSettings = async () => {
-            const token = localStorage.getItem('token');
             try {
-                const response = await fetch(`${import.meta.env.VITE_API_BASE_URL}/settings`, {
-                    headers: { 'Authorization': `Bearer ${token}` }
-                });
+                const response = await authFetch('/settings');
                 if (response.ok) {
                     const data = await response.json();
                     setConsumerKey(data.consumer_key || '');
@@ -42,14 +40,10 @@ const Settings = () => {
 
     const handleUpdateSettings = async (e) => {
         e.preventDefault();
-        const token = localStorage.getItem('token');
         try {
-            const response = await fetch(`${import.meta.env.VITE_API_BASE_URL}/settings/update`, {
+            const response = await authFetch('/settings/update', {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'Authorization': `Bearer ${token}`
-                },
+                headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
                     consumer_key: consumerKey,
                     consumer_secret: consumerSecret,
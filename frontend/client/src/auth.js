@@ -0,0 +1,59 @@
+const API_BASE_URL = import.meta.env.VITE_API_BASE_URL;
+
+export const saveSession = (data) => {
+    localStorage.setItem('token', data.access_token);
+    if (data.refresh_token) {
+        localStorage.setItem('refresh_token', data.refresh_token);
+    }
+};
+
+// Swaps the stored refresh token for a new pair instead of sending the user back to /login.
+// Returns the new access token, or null when the session has ended.
+export const refreshSession = async () => {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (!refreshToken) {
+        return null;
+    }
+    const response = await fetch(`${API_BASE_URL}/token/refresh`, {
+        method: 'POST',
+        headers: { 'Authorization': `Bearer ${refreshToken}` }
+    });
+    if (!response.ok) {
+        // Another tab may have refreshed first and stored a new pair
+        return localStorage.getItem('refresh_token') !== refreshToken ? localStorage.getItem('token') : null;
+    }
+    const data = await response.json();
+    saveSession(data);
+    return data.access_token;
+};
+
+// fetch() for the API with the stored access token. An expired token is renewed through
+// refreshSession and the request is sent once more; a 401 response means the session has ended.
+export const authFetch = async (path, options = {}) => {
+    const send = (token) => fetch(`${API_BASE_URL}${path}`, {
+        ...options,
+        headers: { ...options.headers, 'Authorization': `Bearer ${token}` }
+    });
+    const response = await send(localStorage.getItem('token'));
+    if (response.status !== 401) {
+        return response;
+    }
+    const token = await refreshSession();
+    return token ? send(token) : response;
+};
+
+export const clearSession = async () => {
+    const refreshToken = localStorage.getItem('refresh_token');
+    localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
+    if (refreshToken) {
+        try {
+            await fetch(`${API_BASE_URL}/logout`, {
+                method: 'POST',
+                headers: { 'Authorization': `Bearer ${refreshToken}` }
+            });
+        } catch (error) {
+            console.error("Failed to revoke session:", error);
+        }
+    }
+};